@@ -4,13 +4,31 @@ Flask backend for Real Estate Price Prediction
 Provides REST API endpoints for geocoding and price prediction.
 """
 
+import time
+_started_at = time.monotonic()  # time-to-first-request is measured from here (or from fork)
+
 import os
-from flask import Flask, request, jsonify, render_template
+import json
+import math
+import numpy as np
+from flask import Flask, Response, g, request, jsonify, render_template
 from flask_cors import CORS
 import requests
 from dotenv import load_dotenv
 import logging
-from ml.inference import get_predictor
+from ml.registry import get_registry
+from services.geocoding import (NOT_FOUND, geocode_cache_from_env, locality_hint, normalize_query, parse_fields,
+                                select_fields)
+from services import heatmap
+from services.cache import LRUCache
+from services.prediction_cache import prediction_cache_from_env, quantize_features
+from services.rate_limit import DEFAULT_THROTTLE_SECONDS, rate_limiter_from_env
+from services.scoring_jobs import UploadTooLarge, scoring_jobs_from_env
+from services.suggest import SuggestIndex, here_suggestions
+from services import metrics
+from services.responses import FastJSONProvider, compress_response
+from services.here_client import (HERE_AUTOSUGGEST_URL, HERE_GEOCODE_URL, CircuitBreaker, CircuitOpenError,
+                                  HereAPIError, HereClient, QuotaExhaustedError)
 
 # Load environment variables
 load_dotenv()
@@ -20,21 +38,261 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
 
 # Configuration
 HERE_API_KEY = os.getenv('HERE_API_KEY')
 HERE_MAPS_JS_KEY = os.getenv('HERE_MAPS_JS_KEY')
+MAX_BATCH_ROWS = int(os.getenv('MAX_BATCH_ROWS', '50000'))
+HEATMAP_MAX_AGE = int(os.getenv('HEATMAP_MAX_AGE', '300'))
+MAX_SUGGESTIONS = 10
+MAX_COMPARABLES = 50
+MAX_COMPARABLES_RADIUS_M = 50000
+SCORING_JOBS_FOLLOW_TIMEOUT = float(os.getenv('SCORING_JOBS_FOLLOW_TIMEOUT', '600'))
 if not HERE_API_KEY:
     logger.warning("HERE_API_KEY not found in environment variables")
 
-# Initialize predictor
+# Geocode results are cached in-process and in a SQLite file shared by all workers
+geocode_cache = geocode_cache_from_env()
+
+# Heatmap tiles and grids, keyed on area, property profile and model version
+heatmap_cache = heatmap.heatmap_cache_from_env()
+
+# Single predictions, keyed on model version and quantized features
+prediction_cache = prediction_cache_from_env()
+
+# Locality autosuggest over the training data's locations plus every cached geocode
 try:
-    predictor = get_predictor()
-    logger.info("Model predictor initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize predictor: {e}")
-    predictor = None
+    suggest_index = SuggestIndex.from_csv(os.getenv('SUGGEST_DATA_PATH', 'Data/household.csv'))
+except (OSError, ValueError) as e:
+    logger.warning(f"Suggest index starts empty: {e}")
+    suggest_index = SuggestIndex()
+suggest_index.add_geocodes(geocode_cache.items(limit=int(os.getenv('SUGGEST_GEOCODE_SEED', '20000'))))
+
+# HERE Autosuggest answers for queries the local index cannot match
+here_suggest_cache = LRUCache(maxsize=1024, ttl=float(os.getenv('SUGGEST_CACHE_TTL', '3600')))
+
+# Per-client-IP request limits and the daily HERE quota, in token buckets shared by all workers
+rate_limiter = rate_limiter_from_env()
+
+# Shared HERE client: keep-alive pool, coalesced identical lookups, circuit breaker, quota budget
+here_client = HereClient(
+    HERE_API_KEY,
+    geocode_url=os.getenv('HERE_GEOCODE_URL', HERE_GEOCODE_URL),
+    autosuggest_url=os.getenv('HERE_AUTOSUGGEST_URL', HERE_AUTOSUGGEST_URL),
+    read_timeout=float(os.getenv('HERE_TIMEOUT', '10')),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv('HERE_BREAKER_THRESHOLD', '5')),
+        reset_timeout=float(os.getenv('HERE_BREAKER_RESET', '30'))
+    ),
+    rate_limiter=rate_limiter
+)
+
+# Initialize predictor; the registry swaps in newly published models without a restart
+model_registry = get_registry()
+predictor = model_registry.predictor
+if predictor is not None:
+    logger.info(f"Model predictor initialized successfully (version {model_registry.version})")
+else:
+    logger.error(f"Failed to initialize predictor: {model_registry.last_error or 'no trained model found'}")
+
+def activate_predictor(new_predictor):
+    """Swap in a newly loaded model; requests already running keep the one they hold"""
+    global predictor
+    predictor = new_predictor
+
+model_registry.add_listener(activate_predictor)
+model_registry.start()
+
+# Asynchronous scoring of large uploads in a local process pool; interrupted jobs are
+# resumed per worker by gunicorn's post_worker_init (or below when run directly)
+scoring_jobs = scoring_jobs_from_env(model_registry.artifacts_dir)
+
+logger.info(f"App initialized in {time.monotonic() - _started_at:.3f}s")
+_first_request_pending = True
+
+def _reset_startup_clock():
+    """A forked (preloaded) worker measures time-to-first-request from its own start"""
+    global _started_at, _first_request_pending
+    _started_at = time.monotonic()
+    _first_request_pending = True
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_startup_clock)
+
+def validate_features(data):
+    """
+    Validate a single prediction payload
+    
+    Returns:
+        Tuple of (features dict, None) on success or (None, error message) on failure
+    """
+    if not isinstance(data, dict):
+        return None, 'Each row must be a JSON object'
+    
+    # Validate required fields
+    required_fields = ['bhk', 'sqft', 'bath', 'lat', 'lng']
+    missing_fields = [field for field in required_fields if field not in data]
+    if missing_fields:
+        return None, f'Missing required fields: {missing_fields}'
+    
+    # Validate field types and ranges
+    try:
+        lat = float(data['lat'])
+        lng = float(data['lng'])
+    except (ValueError, TypeError):
+        return None, 'Invalid field types. BHK and bath must be integers, sqft/lat/lng must be numbers'
+    
+    features, error = validate_profile(data)
+    if error:
+        return None, error
+    region = heatmap.REGION_BOUNDS
+    if not (region['south'] <= lat <= region['north']) or not (region['west'] <= lng <= region['east']):
+        return None, 'Coordinates must be within Bangalore region'
+    
+    features['lat'] = lat
+    features['lng'] = lng
+    # Optional locality name (e.g. from /api/geocode) used to resolve the location feature
+    if isinstance(data.get('locality'), str) and data['locality'].strip():
+        features['locality'] = data['locality']
+    # Optional area type (e.g. "Super built-up Area") selecting a segment model
+    if isinstance(data.get('area_type'), str) and data['area_type'].strip():
+        features['area_type'] = data['area_type']
+    return features, None
+
+def validate_profile(data):
+    """
+    Validate the property profile (bhk, sqft, bath) shared by predictions and heatmaps
+    
+    Returns:
+        Tuple of (profile dict, None) on success or (None, error message) on failure
+    """
+    missing_fields = [field for field in ['bhk', 'sqft', 'bath'] if field not in data]
+    if missing_fields:
+        return None, f'Missing required fields: {missing_fields}'
+    
+    try:
+        bhk = int(data['bhk'])
+        sqft = float(data['sqft'])
+        bath = int(data['bath'])
+    except (ValueError, TypeError):
+        return None, 'Invalid field types. BHK and bath must be integers, sqft/lat/lng must be numbers'
+    
+    if bhk < 1 or bhk > 10:
+        return None, 'BHK must be between 1 and 10'
+    if sqft < 100 or sqft > 10000:
+        return None, 'Square feet must be between 100 and 10000'
+    if bath < 1 or bath > 10:
+        return None, 'Bathrooms must be between 1 and 10'
+    
+    return {'bhk': bhk, 'sqft': sqft, 'bath': bath}, None
+
+def parse_batch_rows(req):
+    """
+    Parse a batch request body as a JSON array or NDJSON
+    
+    Returns:
+        List where each entry is either a parsed row or a ValueError for unparseable NDJSON lines
+    """
+    content_type = (req.mimetype or '').lower()
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+        rows = []
+        for line in req.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                rows.append(ValueError('Invalid JSON line'))
+        return rows
+    
+    data = req.get_json(silent=True)
+    if isinstance(data, dict) and isinstance(data.get('rows'), list):
+        return data['rows']
+    if isinstance(data, list):
+        return data
+    raise ValueError('Request body must be a JSON array, {"rows": [...]}, or NDJSON')
+
+@app.before_request
+def start_request_timer():
+    global _first_request_pending
+    g.request_start = time.perf_counter()
+    if _first_request_pending:
+        _first_request_pending = False
+        logger.info(f"Time to first request: {time.monotonic() - _started_at:.3f}s (pid {os.getpid()})")
+    
+    # Queue time as reported by a fronting proxy (nginx: X-Request-Start: t=<seconds>)
+    request_start = request.headers.get('X-Request-Start')
+    if request_start:
+        try:
+            started = float(request_start.lstrip('t='))
+            if started > 1e12:
+                started /= 1e6  # microseconds
+            elif started > 1e10:
+                started /= 1e3  # milliseconds
+            metrics.HTTP_QUEUE_SECONDS.observe(max(time.time() - started, 0.0))
+        except ValueError:
+            pass
+
+@app.after_request
+def record_request_metrics(response):
+    start = getattr(g, 'request_start', None)
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint, request.method)
+        metrics.HTTP_REQUESTS.inc(endpoint, response.status_code)
+    return response
+
+@app.after_request
+def compress(response):
+    """Negotiated brotli/gzip compression of JSON and text bodies"""
+    accept_encoding = request.headers.get('Accept-Encoding')
+    if not accept_encoding:
+        response.vary.add('Accept-Encoding')
+        return response
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    with metrics.STAGE_SECONDS.time(endpoint, 'compress'):
+        return compress_response(response, accept_encoding)
+
+def client_rate_limited(endpoint):
+    """429 response when the calling IP has used up its request bucket, else None"""
+    retry_after = rate_limiter.check_client(request.remote_addr or 'unknown')
+    if not retry_after:
+        return None
+    metrics.RATE_LIMITED.inc(endpoint, 'client')
+    response = jsonify({'error': 'Too many requests, please slow down'})
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response, 429
+
+def local_geocode(query):
+    """
+    Best-effort geocode from local data while HERE is over budget or unavailable
+    
+    Uses the suggest index entry with exactly this normalized name if it carries
+    coordinates (an earlier geocode), then the centroid of a training locality with
+    exactly this name. Prefix matches are never used: they may be a different place.
+    Returns None if neither matches.
+    """
+    entry = suggest_index.lookup(query)
+    if entry is not None:
+        return {'lat': entry['lat'], 'lng': entry['lng'], 'label': entry['label'], 'locality': entry['label'],
+                'raw': None}
+    model = predictor
+    locality_index = model.locality_index if model is not None else None
+    position = locality_index.centroid(query) if locality_index is not None else None
+    if position is None:
+        return None
+    return {'lat': position[0], 'lng': position[1], 'label': query, 'locality': query, 'raw': None}
+
+def degraded_geocode(query, fields, error_response):
+    """Answer from local data (uncached) while HERE cannot be called, else return error_response"""
+    result = local_geocode(query)
+    if result is None:
+        return error_response
+    response = jsonify(select_fields(result, fields))
+    response.headers['X-Geocode-Source'] = 'local'
+    return response
 
 @app.route('/')
 def index():
@@ -46,10 +304,19 @@ def geocode():
     """
     Geocode an address using HERE API
     
-    Request JSON: { "q": "address string" }
-    Response JSON: { "lat": float, "lng": float, "raw": {...} }
+    Request JSON: { "q": "address string", "fields": "lat,lng,label" (optional, also ?fields=) }
+    Response JSON: { "lat": float, "lng": float, "label": str, "locality": str | null }
+                   by default; "raw" (the full HERE item) only when requested in fields
+    
+    Limited per client IP (429). When the HERE quota budget is spent, HERE throttles us
+    or its circuit is open, known localities are answered from local data with an
+    X-Geocode-Source: local header; other queries get a 503 with Retry-After.
     """
     try:
+        limited = client_rate_limited('/api/geocode')
+        if limited:
+            return limited
+        
         if not HERE_API_KEY:
             return jsonify({
                 'error': 'HERE API key not configured'
@@ -67,43 +334,69 @@ def geocode():
                 'error': 'Address query cannot be empty'
             }), 400
         
-        # Call HERE Geocoding API
-        url = "https://geocode.search.hereapi.com/v1/geocode"
-        params = {
-            'apiKey': HERE_API_KEY,
-            'q': address_query,
-            'limit': 1
-        }
+        try:
+            fields = parse_fields(request.args.get('fields', data.get('fields')))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        response = requests.get(url, params=params, timeout=10)
-        if not response.ok:
-            logger.error(f"HERE geocode error {response.status_code}: {response.text}")
-            try:
-                err_json = response.json()
-            except Exception:
-                err_json = {'message': response.text}
+        with metrics.STAGE_SECONDS.time('/api/geocode', 'cache_lookup'):
+            cached = geocode_cache.get(address_query)
+        metrics.CACHE_LOOKUPS.inc('geocode', 'miss' if cached is None else 'hit')
+        if cached == NOT_FOUND:
             return jsonify({
-                'error': 'Geocoding failed',
-                'details': err_json,
-                'status_code': response.status_code
-            }), 503
-        response.raise_for_status()
+                'error': 'Address not found'
+            }), 404
+        if cached is not None:
+            return jsonify(select_fields(cached, fields))
         
-        geocode_data = response.json()
+        # Call HERE Geocoding API (pooled, coalesced, circuit-broken)
+        try:
+            geocode_data = here_client.geocode(address_query)
+        except (QuotaExhaustedError, HereAPIError) as e:
+            if isinstance(e, HereAPIError) and e.status_code != 429:
+                logger.error(f"HERE geocode error {e.status_code}: {e.details}")
+                return jsonify({
+                    'error': 'Geocoding failed',
+                    'details': e.details,
+                    'status_code': e.status_code
+                }), 503
+            logger.warning(f"Geocoding over HERE quota: {e}")
+            metrics.RATE_LIMITED.inc('/api/geocode', 'here_quota')
+            response = jsonify({
+                'error': 'Geocoding quota exhausted, please try again later'
+            })
+            response.headers['Retry-After'] = str(math.ceil(e.retry_after or DEFAULT_THROTTLE_SECONDS))
+            return degraded_geocode(address_query, fields, (response, 503))
+        except CircuitOpenError as e:
+            logger.warning(f"Geocoding short-circuited: {e}")
+            response = jsonify({
+                'error': 'Geocoding service temporarily unavailable'
+            })
+            response.headers['Retry-After'] = str(int(e.retry_after))
+            return degraded_geocode(address_query, fields, (response, 503))
         
         if not geocode_data.get('items'):
+            geocode_cache.set_not_found(address_query)
             return jsonify({
                 'error': 'Address not found'
             }), 404
         
         # Extract coordinates from first result
-        location = geocode_data['items'][0]['position']
+        item = geocode_data['items'][0]
+        location = item['position']
         
-        return jsonify({
+        # The full result is cached so any later field selection can be served from it
+        result = {
             'lat': location['lat'],
             'lng': location['lng'],
-            'raw': geocode_data['items'][0]
-        })
+            'label': item.get('title') or (item.get('address') or {}).get('label'),
+            'locality': locality_hint(item),
+            'raw': item
+        }
+        geocode_cache.set(address_query, result)
+        suggest_index.add_geocode(address_query, result)
+        
+        return jsonify(select_fields(result, fields))
         
     except requests.exceptions.RequestException as e:
         logger.error(f"HERE API request failed: {e}")
@@ -116,86 +409,414 @@ def geocode():
             'error': 'Internal server error'
         }), 500
 
+@app.route('/api/suggest')
+def suggest():
+    """
+    Locality suggestions for a partial address, e.g. while the user types
+    
+    Query: q, limit (default 5, at most 10)
+    Response JSON: { "query": str, "source": "local" | "here",
+                     "suggestions": [{ "label": str, "source": str, "lat"?: float, "lng"?: float,
+                                       "fuzzy"?: true }, ...] }
+    
+    Served from the in-memory index; HERE Autosuggest is only called when nothing
+    matches locally, and its failures (or a spent HERE quota) degrade to an empty list.
+    Limited per client IP (429).
+    """
+    limited = client_rate_limited('/api/suggest')
+    if limited:
+        return limited
+    query = request.args.get('q', '').strip()
+    limit = request.args.get('limit', 5, type=int)
+    if not query:
+        return jsonify({'error': 'Missing required parameter: q'}), 400
+    if not limit or not (1 <= limit <= MAX_SUGGESTIONS):
+        return jsonify({'error': f'limit must be between 1 and {MAX_SUGGESTIONS}'}), 400
+    
+    with metrics.STAGE_SECONDS.time('/api/suggest', 'local'):
+        suggestions = suggest_index.suggest(query, limit)
+    if suggestions or len(normalize_query(query)) < 3 or not HERE_API_KEY:
+        return jsonify({'query': query, 'suggestions': suggestions, 'source': 'local'})
+    
+    key = f"{limit}|{normalize_query(query)}"
+    suggestions = here_suggest_cache.get(key)
+    metrics.CACHE_LOOKUPS.inc('suggest', 'miss' if suggestions is None else 'hit')
+    if suggestions is None:
+        try:
+            with metrics.STAGE_SECONDS.time('/api/suggest', 'here'):
+                suggestions = here_suggestions(here_client.autosuggest(query, limit), limit)
+        except QuotaExhaustedError as e:
+            logger.warning(f"HERE autosuggest skipped: {e}")
+            metrics.RATE_LIMITED.inc('/api/suggest', 'here_quota')
+            return jsonify({'query': query, 'suggestions': [], 'source': 'local'})
+        except (CircuitOpenError, HereAPIError, requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"HERE autosuggest unavailable: {e}")
+            return jsonify({'query': query, 'suggestions': [], 'source': 'local'})
+        here_suggest_cache.set(key, suggestions)
+    return jsonify({'query': query, 'suggestions': suggestions, 'source': 'here'})
+
 @app.route('/api/predict', methods=['POST'])
 def predict():
     """
     Predict house price based on features
     
-    Request JSON: { "bhk": int, "sqft": float, "bath": int, "lat": float, "lng": float }
-    Response JSON: { "price_crore": float, "features_used": {...} }
+    Request JSON: { "bhk": int, "sqft": float, "bath": int, "lat": float, "lng": float,
+                    "locality": str (optional), "area_type": str (optional) }
+    Response JSON: { "price_crore": float, "features_used": {...}, "model_version": str }
+    
+    Features are rounded to about 10 m and 1 sqft, and repeat payloads for the same
+    model version are answered from the prediction cache.
     """
     try:
-        if not predictor:
+        model = predictor  # one model version for the whole request, even across a hot swap
+        if not model:
             return jsonify({
                 'error': 'Prediction model not available. Please train the model first.'
             }), 503
         
-        data = request.get_json()
+        with metrics.STAGE_SECONDS.time('/api/predict', 'parse'):
+            data = request.get_json(silent=True)
         if not data:
             return jsonify({
                 'error': 'Request body must be JSON'
             }), 400
         
-        # Validate required fields
-        required_fields = ['bhk', 'sqft', 'bath', 'lat', 'lng']
-        missing_fields = [field for field in required_fields if field not in data]
-        if missing_fields:
+        with metrics.STAGE_SECONDS.time('/api/predict', 'validate'):
+            features, error = validate_features(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        features = quantize_features(features)
+        key = prediction_cache.key(heatmap.model_version(model), features)
+        with metrics.STAGE_SECONDS.time('/api/predict', 'cache_lookup'):
+            result = prediction_cache.get(key)
+        metrics.CACHE_LOOKUPS.inc('prediction', 'miss' if result is None else 'hit')
+        if result is None:
+            with metrics.STAGE_SECONDS.time('/api/predict', 'predict'):
+                result = model.predict(features)
+            prediction_cache.set(key, result)
+        
+        return jsonify(result)
+        
+    except Exception as e:
+        logger.error(f"Prediction error: {e}")
+        return jsonify({
+            'error': 'Prediction failed'
+        }), 500
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Predict house prices for many properties in one request
+    
+    Request: JSON array of predict payloads, { "rows": [...] }, or NDJSON (application/x-ndjson);
+             ?explain=1 adds per-feature contributions
+    Response JSON: { "results": [{ "index": int, "price_crore": float, "price_low_crore": float,
+                                   "price_high_crore": float, "contributions_crore": {...} }
+                                 | { "index": int, "error": str }],
+                     "count": int, "succeeded": int, "failed": int, "model_version": str }
+    """
+    try:
+        model = predictor
+        if not model:
             return jsonify({
-                'error': f'Missing required fields: {missing_fields}'
-            }), 400
+                'error': 'Prediction model not available. Please train the model first.'
+            }), 503
         
-        # Validate field types and ranges
         try:
-            bhk = int(data['bhk'])
-            sqft = float(data['sqft'])
-            bath = int(data['bath'])
-            lat = float(data['lat'])
-            lng = float(data['lng'])
-            
-            # Basic validation
-            if bhk < 1 or bhk > 10:
-                return jsonify({'error': 'BHK must be between 1 and 10'}), 400
-            if sqft < 100 or sqft > 10000:
-                return jsonify({'error': 'Square feet must be between 100 and 10000'}), 400
-            if bath < 1 or bath > 10:
-                return jsonify({'error': 'Bathrooms must be between 1 and 10'}), 400
-            if not (10 <= lat <= 15) or not (75 <= lng <= 80):
-                return jsonify({'error': 'Coordinates must be within Bangalore region'}), 400
-                
-        except (ValueError, TypeError) as e:
+            rows = parse_batch_rows(request)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not rows:
+            return jsonify({'error': 'Batch must contain at least one row'}), 400
+        if len(rows) > MAX_BATCH_ROWS:
+            return jsonify({'error': f'Batch too large: at most {MAX_BATCH_ROWS} rows allowed'}), 413
+        
+        # Validate each row, keeping per-row errors instead of failing the whole batch
+        results = [None] * len(rows)
+        valid_indices = []
+        valid_rows = []
+        for i, row in enumerate(rows):
+            if isinstance(row, ValueError):
+                results[i] = {'index': i, 'error': str(row)}
+                continue
+            features, error = validate_features(row)
+            if error:
+                results[i] = {'index': i, 'error': error}
+            else:
+                valid_indices.append(i)
+                valid_rows.append(features)
+        
+        model_version = None
+        if valid_rows:
+            explain = request.args.get('explain', '').lower() in ('1', 'true', 'yes')
+            batch = model.predict_batch(valid_rows, explain=True) if explain else model.predict_batch(valid_rows)
+            model_version = batch.get('model_version')
+            for i, price in zip(valid_indices, np.asarray(batch['price_crore']).tolist()):
+                results[i] = {'index': i, 'price_crore': price}
+            if 'price_low_crore' in batch:
+                for i, low, high in zip(valid_indices, batch['price_low_crore'].tolist(),
+                                        batch['price_high_crore'].tolist()):
+                    if math.isfinite(low):  # NaN when the row's segment model has no range
+                        results[i]['price_low_crore'] = low
+                        results[i]['price_high_crore'] = high
+            if 'contributions_crore' in batch:
+                names = batch['feature_names']
+                for i, row, baseline in zip(valid_indices, batch['contributions_crore'].tolist(),
+                                            np.asarray(batch['baseline_crore']).tolist()):
+                    results[i]['contributions_crore'] = dict(zip(names, row), baseline=baseline)
+        
+        return jsonify({
+            'results': results,
+            'count': len(rows),
+            'succeeded': len(valid_rows),
+            'failed': len(rows) - len(valid_rows),
+            'model_version': model_version
+        })
+        
+    except Exception as e:
+        logger.error(f"Batch prediction error: {e}")
+        return jsonify({
+            'error': 'Batch prediction failed'
+        }), 500
+
+def _heatmap_response(compute):
+    """Run compute(model, profile) for the query-string profile and wrap it in a cacheable response"""
+    model = predictor
+    if not model:
+        return jsonify({
+            'error': 'Prediction model not available. Please train the model first.'
+        }), 503
+    
+    profile, error = validate_profile(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    with metrics.STAGE_SECONDS.time(request.url_rule.rule, 'predict'):
+        result, hit = compute(model, profile)
+    metrics.CACHE_LOOKUPS.inc('heatmap', 'hit' if hit else 'miss')
+    
+    response = jsonify(result)
+    response.headers['Cache-Control'] = f'public, max-age={HEATMAP_MAX_AGE}'
+    return response
+
+@app.route('/api/heatmap/tiles/<int:z>/<int:x>/<int:y>')
+def heatmap_tile(z, x, y):
+    """
+    Predicted prices over web-mercator map tile z/x/y for one property profile
+    
+    Query: bhk, sqft, bath, size (cells per tile side, default 32)
+    Response JSON: { "z", "x", "y", "size", "bounds": {...}, "model_version": str,
+                     "prices": [[float | null, ...], ...] (north to south), "min", "max" }
+    """
+    try:
+        if not (0 <= z <= heatmap.MAX_ZOOM) or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return jsonify({'error': 'Tile coordinates out of range'}), 400
+        size = request.args.get('size', heatmap.DEFAULT_TILE_SIZE, type=int)
+        if size is None or not (1 <= size <= heatmap.MAX_TILE_SIZE):
+            return jsonify({'error': f'size must be between 1 and {heatmap.MAX_TILE_SIZE}'}), 400
+        
+        return _heatmap_response(
+            lambda model, profile: heatmap.tile_heatmap(model, heatmap_cache, z, x, y, profile, size))
+        
+    except Exception as e:
+        logger.error(f"Heatmap tile error: {e}")
+        return jsonify({
+            'error': 'Heatmap computation failed'
+        }), 500
+
+@app.route('/api/heatmap')
+def heatmap_grid():
+    """
+    Predicted prices over a lat/lng bounding box split into rows x cols cells
+    
+    Query: south, west, north, east, rows, cols (default 32 x 32), bhk, sqft, bath
+    Response JSON: { "rows", "cols", "bounds": {...}, "model_version": str,
+                     "prices": [[float | null, ...], ...] (north to south), "min", "max" }
+    """
+    try:
+        bounds = {k: request.args.get(k, type=float) for k in ('south', 'west', 'north', 'east')}
+        if any(v is None for v in bounds.values()):
+            return jsonify({'error': 'south, west, north and east are required numbers'}), 400
+        if bounds['south'] >= bounds['north'] or bounds['west'] >= bounds['east']:
+            return jsonify({'error': 'Bounding box must have south < north and west < east'}), 400
+        rows = request.args.get('rows', heatmap.DEFAULT_TILE_SIZE, type=int)
+        cols = request.args.get('cols', heatmap.DEFAULT_TILE_SIZE, type=int)
+        if not rows or not cols or rows < 1 or cols < 1 or rows * cols > heatmap.MAX_GRID_CELLS:
+            return jsonify({'error': f'rows x cols must be between 1 and {heatmap.MAX_GRID_CELLS} cells'}), 400
+        
+        return _heatmap_response(
+            lambda model, profile: heatmap.grid_heatmap(model, heatmap_cache, bounds, rows, cols, profile))
+        
+    except Exception as e:
+        logger.error(f"Heatmap grid error: {e}")
+        return jsonify({
+            'error': 'Heatmap computation failed'
+        }), 500
+
+@app.route('/api/comparables')
+def comparables():
+    """
+    Nearest training listings to a point, optionally with the same bhk and a sqft range
+    
+    Query: lat, lng, k (default 10, at most 50), bhk, sqft_min, sqft_max, radius_m (default 10000)
+    Response JSON: { "comparables": [{ "price_crore", "sqft", "bhk", "bath", "lat", "lng",
+                                       "distance_m", "locality"? }, ...] (nearest first),
+                     "count": int, "model_version": str }
+    """
+    try:
+        model = predictor
+        store = getattr(model, 'comparables', None) if model else None
+        if store is None:
             return jsonify({
-                'error': 'Invalid field types. BHK and bath must be integers, sqft/lat/lng must be numbers'
-            }), 400
+                'error': 'Comparable listings not available. Please retrain the model.'
+            }), 503
         
-        # Make prediction
-        features = {
-            'bhk': bhk,
-            'sqft': sqft,
-            'bath': bath,
-            'lat': lat,
-            'lng': lng
-        }
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        if lat is None or lng is None:
+            return jsonify({'error': 'lat and lng are required numbers'}), 400
+        region = heatmap.REGION_BOUNDS
+        if not (region['south'] <= lat <= region['north']) or not (region['west'] <= lng <= region['east']):
+            return jsonify({'error': 'Coordinates must be within Bangalore region'}), 400
+        k = request.args.get('k', 10, type=int)
+        if not k or not (1 <= k <= MAX_COMPARABLES):
+            return jsonify({'error': f'k must be between 1 and {MAX_COMPARABLES}'}), 400
+        radius_m = request.args.get('radius_m', 10000, type=float)
+        if not radius_m or not (0 < radius_m <= MAX_COMPARABLES_RADIUS_M):
+            return jsonify({'error': f'radius_m must be between 0 and {MAX_COMPARABLES_RADIUS_M}'}), 400
+        bhk = request.args.get('bhk', type=int)
+        sqft_min = request.args.get('sqft_min', type=float)
+        sqft_max = request.args.get('sqft_max', type=float)
+        sqft_range = None
+        if sqft_min is not None or sqft_max is not None:
+            sqft_range = (sqft_min or 0.0, sqft_max if sqft_max is not None else float('inf'))
+            if sqft_range[0] > sqft_range[1]:
+                return jsonify({'error': 'sqft_min must not exceed sqft_max'}), 400
         
-        result = predictor.predict(features)
+        with metrics.STAGE_SECONDS.time('/api/comparables', 'knn'):
+            listings = store.query(lat, lng, k, bhk=bhk, sqft_range=sqft_range, max_radius_m=radius_m)
         
-        return jsonify(result)
+        return jsonify({
+            'comparables': listings,
+            'count': len(listings),
+            'model_version': getattr(model, 'version', None)
+        })
         
     except Exception as e:
-        logger.error(f"Prediction error: {e}")
+        logger.error(f"Comparables error: {e}")
         return jsonify({
-            'error': 'Prediction failed'
+            'error': 'Comparables lookup failed'
         }), 500
 
+@app.route('/api/jobs', methods=['POST'])
+def create_scoring_job():
+    """
+    Queue an asynchronous scoring job for a large CSV or Parquet upload
+    
+    Request: the file as a multipart "file" field, or as the raw body (text/csv, or
+             application/vnd.apache.parquet / ?filename=<name>.parquet for Parquet).
+             Columns: bhk, sqft, bath, lat, lng, and optionally locality and area_type.
+    Response JSON (202): the job, as returned by GET /api/jobs/<id>
+    """
+    try:
+        model = predictor
+        if not model:
+            return jsonify({
+                'error': 'Prediction model not available. Please train the model first.'
+            }), 503
+        
+        max_bytes = scoring_jobs.max_upload_bytes
+        if max_bytes is not None and (request.content_length or 0) > max_bytes:
+            return jsonify({'error': f'Upload too large: at most {max_bytes} bytes allowed'}), 413
+        
+        upload = request.files.get('file')
+        if upload is not None:
+            stream, filename, content_type = upload.stream, upload.filename, upload.mimetype
+        else:
+            stream, filename, content_type = request.stream, request.args.get('filename'), request.mimetype
+        
+        try:
+            job = scoring_jobs.create(stream, filename, content_type, model_version=model.version)
+        except UploadTooLarge as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        response = jsonify(job)
+        response.status_code = 202
+        response.headers['Location'] = f"/api/jobs/{job['id']}"
+        return response
+        
+    except Exception as e:
+        logger.error(f"Scoring job creation error: {e}")
+        return jsonify({
+            'error': 'Could not create scoring job'
+        }), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET', 'DELETE'])
+def scoring_job(job_id):
+    """
+    Poll a scoring job, or delete a finished one
+    
+    Response JSON: { "id", "status": "queued" | "running" | "completed" | "failed",
+                     "progress": 0..1, "rows_total", "rows_done", "rows_failed",
+                     "chunks_done", "model_version", "error", "created_at", ... }
+    """
+    if request.method == 'DELETE':
+        deleted = scoring_jobs.delete(job_id)
+        if deleted is None:
+            return jsonify({'error': 'Job not found'}), 404
+        if not deleted:
+            return jsonify({'error': 'Job is still being scored'}), 409
+        return '', 204
+    
+    job = scoring_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/results')
+def scoring_job_results(job_id):
+    """
+    Stream a job's scored rows as CSV (row, price_crore, price_low_crore, price_high_crore, error)
+    
+    Rows are returned as their chunks finish. ?follow=1 keeps the response open until the
+    job completes (at most SCORING_JOBS_FOLLOW_TIMEOUT seconds).
+    """
+    follow = request.args.get('follow', '').lower() in ('1', 'true', 'yes')
+    job = scoring_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    stream = scoring_jobs.results(job_id, follow=follow, timeout=SCORING_JOBS_FOLLOW_TIMEOUT)
+    response = Response(stream, mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename="{job_id}.csv"'
+    response.headers['X-Job-Status'] = job['status']
+    return response
+
 @app.route('/health')
 def health():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
         'model_loaded': predictor is not None,
+        'model': model_registry.stats(),
         'here_api_configured': HERE_API_KEY is not None,
-        'here_maps_js_configured': HERE_MAPS_JS_KEY is not None
+        'here_maps_js_configured': HERE_MAPS_JS_KEY is not None,
+        'geocode_cache': geocode_cache.stats(),
+        'heatmap_cache': heatmap_cache.stats(),
+        'prediction_cache': prediction_cache.stats(),
+        'suggest_index': suggest_index.stats(),
+        'here_client': here_client.stats(),
+        'rate_limit': rate_limiter.stats()
     })
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus-style metrics, aggregated across worker processes"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain', content_type=metrics.CONTENT_TYPE)
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
@@ -207,6 +828,7 @@ def internal_error(error):
 if __name__ == '__main__':
     # Create artifacts directory if it doesn't exist
     os.makedirs('artifacts', exist_ok=True)
+    scoring_jobs.resume()
     
     # Run the app
     debug_mode = os.getenv('FLASK_ENV') == 'development'
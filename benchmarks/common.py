@@ -0,0 +1,73 @@
+"""
+Shared helpers for the benchmark scripts
+Latency summaries and machine-readable result files that can be diffed between commits.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import time
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def summarize(latencies_s: Iterable[float], wall_time_s: float = None) -> Dict[str, float]:
+    """Summarize per-request latencies (seconds) as throughput and percentile milliseconds"""
+    latencies = np.asarray(list(latencies_s), dtype=np.float64)
+    if len(latencies) == 0:
+        return {'count': 0}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    summary = {
+        'count': int(len(latencies)),
+        'mean_ms': round(float(latencies.mean() * 1000), 4),
+        'p50_ms': round(float(p50), 4),
+        'p95_ms': round(float(p95), 4),
+        'p99_ms': round(float(p99), 4),
+        'max_ms': round(float(latencies.max() * 1000), 4),
+    }
+    if wall_time_s:
+        summary['throughput_rps'] = round(len(latencies) / wall_time_s, 2)
+    return summary
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+def write_results(path: str, suite: str, results: List[Dict], config: Dict = None):
+    """Write a benchmark result document: environment metadata plus one entry per case"""
+    document = {
+        'suite': suite,
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'config': config or {},
+        'results': results,
+    }
+    if path == '-':
+        print(json.dumps(document, indent=2))
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"Results written to {path}")
+
+
+def print_table(results: List[Dict]):
+    """Print one line per benchmark case"""
+    for r in results:
+        parts = [f"{r['name']:<34}"]
+        for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'errors', 'rejected', 'throttled'):
+            if key in r:
+                parts.append(f"{key}={r[key]}")
+        print('  '.join(parts))
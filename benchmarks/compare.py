@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark result files case by case.
+
+Usage: python benchmarks/compare.py bench/before.json bench/after.json
+"""
+
+import argparse
+import json
+
+# Metrics where a larger value is an improvement
+HIGHER_IS_BETTER = {'throughput_rps', 'rows_per_s'}
+METRICS = ['throughput_rps', 'rows_per_s', 'p50_ms', 'p95_ms', 'p99_ms', 'mean_us', 'p99_us', 'best_s']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Diff two benchmark result files')
+    parser.add_argument('before', type=str)
+    parser.add_argument('after', type=str)
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"{before['suite']}: {before['commit']} -> {after['commit']}")
+    baseline = {r['name']: r for r in before['results']}
+    for result in after['results']:
+        old = baseline.get(result['name'])
+        if old is None:
+            print(f"{result['name']:<34} (new)")
+            continue
+        changes = []
+        for metric in METRICS:
+            if metric in result and metric in old and old[metric]:
+                delta = (result[metric] - old[metric]) / old[metric] * 100
+                better = delta > 0 if metric in HIGHER_IS_BETTER else delta < 0
+                marker = '+' if better else '-' if abs(delta) >= 1 else ' '
+                changes.append(f"{metric} {old[metric]} -> {result[metric]} ({delta:+.1f}%{marker})")
+        print(f"{result['name']:<34} " + '; '.join(changes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Local HERE Geocoding API stub with configurable latency
+Answers /v1/geocode with a deterministic position derived from the query, so load tests
+can exercise /api/geocode without network access or quota.
+
+Usage: python benchmarks/here_stub.py --port 8765 --latency-ms 80
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class HereStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query).get('q', [''])[0]
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+        if server.latency_s:
+            time.sleep(server.latency_s)
+
+        digest = hashlib.md5(query.encode()).digest()
+        lat = 12.85 + digest[0] / 255 * 0.3
+        lng = 77.45 + digest[1] / 255 * 0.3
+        body = json.dumps({'items': [{
+            'title': query,
+            'address': {'label': query, 'district': query.split()[-1] if query else ''},
+            'position': {'lat': round(lat, 6), 'lng': round(lng, 6)}
+        }]}).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(host: str = '127.0.0.1', port: int = 0, latency_ms: float = 0.0) -> ThreadingHTTPServer:
+    """Start the stub in a daemon thread; server.geocode_url is the endpoint to use"""
+    server = ThreadingHTTPServer((host, port), HereStubHandler)
+    server.daemon_threads = True
+    server.latency_s = latency_ms / 1000.0
+    server.request_count = 0
+    server.lock = threading.Lock()
+    bound_host, bound_port = server.server_address
+    server.geocode_url = f'http://{bound_host}:{bound_port}/v1/geocode'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local HERE geocode stub')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Added latency per request')
+    args = parser.parse_args()
+
+    server = start_stub(args.host, args.port, args.latency_ms)
+    print(f"HERE stub listening at {server.geocode_url} (latency {args.latency_ms}ms)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+API load test
+Drives /api/predict, /api/geocode (against the local HERE stub) and /health at several
+concurrency levels, either in-process through Flask's test client or over HTTP against a
+running server or a gunicorn instance spawned for the run. Reports throughput and
+p50/p95/p99 latency per endpoint and concurrency level, plus 5xx errors and 4xx
+rejections (429s counted separately), so a throttled run cannot pass as a fast one.
+The in-process and gunicorn modes turn the per-IP and HERE quota limits off and keep
+their buckets in a temporary file.
+
+Usage:
+    python benchmarks/load_test.py --mode inprocess --concurrency 1 8 --requests 2000
+    python benchmarks/load_test.py --mode gunicorn --workers 4 --here-latency-ms 80 --output bench/load.json
+    python benchmarks/load_test.py --mode url --url http://localhost:5000
+"""
+
+import argparse
+import itertools
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.common import REPO_ROOT, print_table, summarize, write_results
+from benchmarks.here_stub import start_stub
+
+LOCALITIES = ['Whitefield', 'Hebbal', 'Jayanagar', 'Koramangala', 'Indiranagar', 'Electronic City',
+              'Marathahalli', 'Yelahanka', 'HSR Layout', 'Banashankari', 'Uttarahalli', 'Sarjapur Road']
+
+
+def payload_factory(endpoint: str, distinct_queries: int):
+    """Return a function producing (method, path, json body) for request number i"""
+    rng = random.Random(42)
+    if endpoint == 'predict':
+        bodies = [{
+            'bhk': rng.randint(1, 5), 'sqft': rng.randint(500, 3500), 'bath': rng.randint(1, 4),
+            'lat': round(rng.uniform(12.85, 13.15), 5), 'lng': round(rng.uniform(77.45, 77.75), 5)
+        } for _ in range(512)]
+        return lambda i: ('POST', '/api/predict', bodies[i % len(bodies)])
+    if endpoint == 'geocode':
+        def geocode_body(i):
+            # distinct_queries=0 makes every query unique (all cache misses)
+            n = i if distinct_queries == 0 else i % distinct_queries
+            return 'POST', '/api/geocode', {'q': f"{LOCALITIES[n % len(LOCALITIES)]} block {n}"}
+        return geocode_body
+    if endpoint == 'health':
+        return lambda i: ('GET', '/health', None)
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+def run_load(send, make_request, total: int, concurrency: int):
+    """
+    Issue total requests from concurrency threads
+
+    Returns latencies, wall time and status counts: errors (5xx), rejected (4xx) and
+    throttled (429, also counted in rejected).
+    """
+    counter = itertools.count()
+    latencies = []
+    counts = {'errors': 0, 'rejected': 0, 'throttled': 0}
+    lock = threading.Lock()
+
+    def worker():
+        local_latencies = []
+        local_counts = dict.fromkeys(counts, 0)
+        sender = send()
+        while True:
+            i = next(counter)
+            if i >= total:
+                break
+            method, path, body = make_request(i)
+            start = time.perf_counter()
+            status = sender(method, path, body)
+            local_latencies.append(time.perf_counter() - start)
+            if status >= 500:
+                local_counts['errors'] += 1
+            elif status >= 400:
+                local_counts['rejected'] += 1
+                local_counts['throttled'] += status == 429
+        with lock:
+            latencies.extend(local_latencies)
+            for key, value in local_counts.items():
+                counts[key] += value
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return latencies, counts, time.perf_counter() - start
+
+
+def inprocess_sender_factory(stub):
+    """Senders backed by the Flask test client, with the HERE client pointed at the stub"""
+    import app as app_module
+    from services.geocoding import GeocodeCache
+    from services.rate_limit import RateLimiter
+
+    app_module.HERE_API_KEY = 'bench'
+    app_module.here_client.api_key = 'bench'
+    app_module.here_client.geocode_url = stub.geocode_url
+    app_module.geocode_cache = GeocodeCache(disk_path=None)
+    # Every request comes from one address; measure the app, not the per-IP limit or HERE quota
+    limiter = RateLimiter(os.path.join(tempfile.mkdtemp(prefix='bench-cache-'), 'rate_limit.bin'),
+                          client_rate=0, here_daily_quota=0)
+    app_module.rate_limiter = limiter
+    app_module.here_client.rate_limiter = limiter
+    flask_app = app_module.app
+
+    def factory():
+        client = flask_app.test_client()
+
+        def send(method, path, body):
+            if method == 'GET':
+                return client.get(path).status_code
+            return client.post(path, json=body).status_code
+        return send
+    return factory
+
+
+def http_sender_factory(base_url: str):
+    """Senders issuing real HTTP requests over a per-thread keep-alive session"""
+    def factory():
+        session = requests.Session()
+
+        def send(method, path, body):
+            try:
+                response = session.request(method, base_url + path, json=body, timeout=30)
+                return response.status_code
+            except requests.exceptions.RequestException:
+                return 599
+        return send
+    return factory
+
+
+def spawn_gunicorn(stub, workers: int, threads: int, port: int):
+    """Start gunicorn for the app with the HERE client pointed at the stub"""
+    cache_dir = tempfile.mkdtemp(prefix='bench-cache-')
+    env = dict(os.environ,
+               HERE_API_KEY='bench',
+               HERE_GEOCODE_URL=stub.geocode_url,
+               GEOCODE_CACHE_PATH=os.path.join(cache_dir, 'geocode.sqlite'),
+               RATE_LIMIT_PATH=os.path.join(cache_dir, 'rate_limit.bin'),
+               RATE_LIMIT_PER_IP='0',
+               HERE_DAILY_QUOTA='0')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-w', str(workers), '-k', 'gthread', '--threads', str(threads),
+         '-b', f'127.0.0.1:{port}', 'app:app'],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if requests.get(base_url + '/health', timeout=1).ok:
+                return process, base_url
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('gunicorn did not become healthy within 30s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the Flask API')
+    parser.add_argument('--mode', choices=['inprocess', 'gunicorn', 'url'], default='inprocess')
+    parser.add_argument('--url', type=str, default='http://127.0.0.1:5000', help='Server for --mode url')
+    parser.add_argument('--endpoints', nargs='+', default=['predict', 'geocode', 'health'])
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint and concurrency level')
+    parser.add_argument('--here-latency-ms', type=float, default=50.0, help='Latency of the HERE stub')
+    parser.add_argument('--geocode-distinct', type=int, default=50,
+                       help='Distinct geocode queries to cycle through (0 = every query unique)')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers for --mode gunicorn')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--port', type=int, default=5055, help='Port for the spawned gunicorn')
+    parser.add_argument('--output', type=str, default=None, help="JSON results path ('-' for stdout)")
+    args = parser.parse_args()
+
+    stub = start_stub(latency_ms=args.here_latency_ms)
+    process = None
+    try:
+        if args.mode == 'inprocess':
+            factory = inprocess_sender_factory(stub)
+        elif args.mode == 'gunicorn':
+            process, base_url = spawn_gunicorn(stub, args.workers, args.threads, args.port)
+            factory = http_sender_factory(base_url)
+        else:
+            factory = http_sender_factory(args.url.rstrip('/'))
+
+        results = []
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                upstream_before = stub.request_count
+                latencies, counts, wall = run_load(
+                    factory, payload_factory(endpoint, args.geocode_distinct), args.requests, concurrency)
+                result = {'name': f'{endpoint}@c{concurrency}', 'endpoint': endpoint,
+                          'concurrency': concurrency, **counts}
+                result.update(summarize(latencies, wall))
+                if endpoint == 'geocode':
+                    result['upstream_calls'] = stub.request_count - upstream_before
+                results.append(result)
+
+        print_table(results)
+        if args.output:
+            write_results(args.output, 'load_test', results, vars(args))
+    finally:
+        if process is not None:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=10)
+        stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
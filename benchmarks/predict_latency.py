@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Per-call latency microbenchmark for RealEstatePricePredictor.predict
+Compares the folded w . x + b fast path with the sklearn scaler + model path, and
+measures predict_batch throughput against a per-row loop.
+
+Usage: python benchmarks/predict_latency.py [--artifacts-dir artifacts] [--calls 20000] [--output bench/predict.json]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.common import write_results
+from ml.inference import RealEstatePricePredictor
+
+SAMPLE = {'bhk': 3, 'sqft': 1450, 'bath': 2, 'lat': 12.9716, 'lng': 77.5946}
+
+
+def sklearn_equivalents(predictor):
+    """Build a fitted StandardScaler + LinearRegression matching the predictor's parameters"""
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import StandardScaler
+
+    n_features = len(predictor.feature_names)
+    scaler = StandardScaler()
+    scaler.mean_ = np.array(predictor.scaler.mean_, dtype=np.float64)
+    scaler.scale_ = np.array(predictor.scaler.scale_, dtype=np.float64)
+    scaler.var_ = scaler.scale_ ** 2
+    scaler.n_features_in_ = n_features
+    model = LinearRegression()
+    model.coef_ = np.array(predictor.model.coef_, dtype=np.float64)
+    model.intercept_ = float(predictor.model.intercept_)
+    model.n_features_in_ = n_features
+    return model, scaler
+
+
+def time_calls(fn, calls: int) -> np.ndarray:
+    """Return per-call latencies in microseconds"""
+    for _ in range(min(calls, 500)):
+        fn()
+    latencies = np.empty(calls)
+    for i in range(calls):
+        start = time.perf_counter()
+        fn()
+        latencies[i] = time.perf_counter() - start
+    return latencies * 1e6
+
+
+def report(name: str, latencies: np.ndarray) -> dict:
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"{name:<14} mean={latencies.mean():8.2f}us  p50={p50:8.2f}us  p95={p95:8.2f}us  p99={p99:8.2f}us")
+    return {'name': name, 'mean_us': round(float(latencies.mean()), 3), 'p50_us': round(float(p50), 3),
+            'p95_us': round(float(p95), 3), 'p99_us': round(float(p99), 3)}
+
+
+def batch_throughput(predictor, n_rows: int) -> dict:
+    """Compare predict_batch with a per-row predict loop over n_rows properties"""
+    rng = np.random.default_rng(0)
+    rows = [{'bhk': int(rng.integers(1, 5)), 'sqft': float(rng.uniform(500, 3000)),
+             'bath': int(rng.integers(1, 4)), 'lat': float(rng.normal(12.97, 0.05)),
+             'lng': float(rng.normal(77.59, 0.05))} for _ in range(n_rows)]
+    start = time.perf_counter()
+    predictor.predict_batch(rows)
+    batch_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for row in rows:
+        predictor.predict(row)
+    loop_s = time.perf_counter() - start
+    print(f"batch x{n_rows:<7} batch={n_rows / batch_s:12.0f} rows/s  loop={n_rows / loop_s:10.0f} rows/s")
+    return {'name': f'predict_batch@{n_rows}', 'throughput_rps': round(n_rows / batch_s, 1),
+            'loop_throughput_rps': round(n_rows / loop_s, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmark predictor latency')
+    parser.add_argument('--artifacts-dir', type=str, default='artifacts')
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--batch-rows', type=int, default=10000)
+    parser.add_argument('--output', type=str, default=None, help="JSON results path ('-' for stdout)")
+    args = parser.parse_args()
+
+    predictor = RealEstatePricePredictor(args.artifacts_dir)
+    results = []
+    if not predictor.fast_path:
+        print("Model cannot be folded; only the sklearn path is available")
+        results.append(report('sklearn path', time_calls(lambda: predictor.predict(SAMPLE), args.calls)))
+    else:
+        results.append(report('fast path', time_calls(lambda: predictor.predict(SAMPLE), args.calls)))
+
+        # Rebuild genuine sklearn objects from the same parameters for the comparison
+        model, scaler = sklearn_equivalents(predictor)
+        fast_model, fast_scaler, weights = predictor.model, predictor.scaler, predictor._weights
+        predictor.model, predictor.scaler, predictor._weights = model, scaler, None
+        results.append(report('sklearn path', time_calls(lambda: predictor.predict(SAMPLE), args.calls)))
+        predictor.model, predictor.scaler, predictor._weights = fast_model, fast_scaler, weights
+
+    results.append(batch_throughput(predictor, args.batch_rows))
+    if args.output:
+        write_results(args.output, 'predict_latency', results, vars(args))
+
+
+if __name__ == '__main__':
+    main()
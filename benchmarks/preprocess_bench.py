@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Preprocessing microbenchmark
+Times train_model.load_and_preprocess_data on scaled-up copies of Data/household.csv.
+
+Usage: python benchmarks/preprocess_bench.py --scales 1 10 50 --output bench/preprocess.json
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.common import REPO_ROOT, print_table, write_results
+from ml.train_model import load_and_preprocess_data
+
+
+def scaled_copy(data_path: str, scale: int, directory: str) -> str:
+    """Write data_path repeated scale times and return the new path"""
+    path = os.path.join(directory, f'household_x{scale}.csv')
+    if not os.path.exists(path):
+        df = pd.read_csv(data_path)
+        pd.concat([df] * scale, ignore_index=True).to_csv(path, index=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark load_and_preprocess_data')
+    parser.add_argument('--data-path', type=str, default=os.path.join(REPO_ROOT, 'Data', 'household.csv'))
+    parser.add_argument('--scales', nargs='+', type=int, default=[1, 10, 50])
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per scale (best is reported)')
+    parser.add_argument('--memory', action='store_true', help='Also record peak Python heap (slower)')
+    parser.add_argument('--output', type=str, default=None, help="JSON results path ('-' for stdout)")
+    args = parser.parse_args()
+
+    logging.getLogger('ml.train_model').setLevel(logging.WARNING)
+    results = []
+    with tempfile.TemporaryDirectory(prefix='bench-preprocess-') as directory:
+        for scale in args.scales:
+            path = scaled_copy(args.data_path, scale, directory)
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                df, _ = load_and_preprocess_data(path)
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            result = {
+                'name': f'load_and_preprocess_data@x{scale}',
+                'scale': scale,
+                'rows_out': int(len(df)),
+                'best_s': round(best, 4),
+                'rows_per_s': round(len(df) / best, 1),
+            }
+            if args.memory:
+                tracemalloc.start()
+                load_and_preprocess_data(path)
+                result['peak_heap_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+                tracemalloc.stop()
+            results.append(result)
+            print(f"{result['name']:<34} best={result['best_s']}s  rows/s={result['rows_per_s']}"
+                  + (f"  peak_heap={result['peak_heap_mb']}MB" if args.memory else ''))
+
+    if args.output:
+        write_results(args.output, 'preprocess', results, vars(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Gunicorn configuration
+With preload_app the master imports app.py, and so loads the model, once. Workers are
+then forked with the model already in memory and share its pages copy-on-write instead
+of each re-importing and re-loading it. The memory-mapped bundle arrays are shared
+either way. Every setting can be overridden with a GUNICORN_* environment variable.
+"""
+
+import gc
+import os
+import sys
+import time
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', '4'))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') != '0'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+
+_config_loaded = time.monotonic()
+
+
+def when_ready(server):
+    server.log.info(f"Master ready in {time.monotonic() - _config_loaded:.3f}s "
+                    f"(preload_app={preload_app}, workers={workers})")
+    if preload_app:
+        # Move everything allocated during preload out of the GC's generations, so
+        # collections in the workers do not write to (and un-share) those pages
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    worker.log.info(f"Worker {worker.pid} ready {time.monotonic() - _config_loaded:.3f}s after master start")
+    # Scoring jobs interrupted by a restart are resumed from a worker, never the master,
+    # whose child reaping would break the process pool; the job lock lets one worker win
+    app_module = sys.modules.get('app')
+    if app_module is not None and hasattr(app_module, 'scoring_jobs'):
+        app_module.scoring_jobs.resume()
@@ -0,0 +1,174 @@
+"""
+Model Artifact Bundles
+Versioned, pickle-free artifact format: a JSON manifest plus raw .npy arrays per bundle,
+with a CURRENT pointer file naming the active version. Arrays are memory-mapped on load
+so every gunicorn worker shares the same pages.
+
+Layout:
+    artifacts/CURRENT                      -> "<version>"
+    artifacts/bundles/<version>/manifest.json
+    artifacts/bundles/<version>/<array>.npy
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+FORMAT_VERSION = 1
+POINTER_FILE = 'CURRENT'
+BUNDLES_DIR = 'bundles'
+MANIFEST_FILE = 'manifest.json'
+
+
+class LinearModel:
+    """Array-backed linear model exposing the sklearn attributes inference relies on"""
+
+    def __init__(self, coef: np.ndarray, intercept: float):
+        self.coef_ = coef
+        self.intercept_ = float(intercept)
+
+    def predict(self, X) -> np.ndarray:
+        return np.asarray(X, dtype=np.float64) @ self.coef_ + self.intercept_
+
+
+class StandardScalerArrays:
+    """Array-backed stand-in for a fitted StandardScaler"""
+
+    def __init__(self, mean: np.ndarray, scale: np.ndarray):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X) -> np.ndarray:
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+
+class LabelClasses:
+    """Array-backed stand-in for a fitted LabelEncoder (classes_ is sorted)"""
+
+    def __init__(self, classes: np.ndarray):
+        self.classes_ = classes
+
+    def transform(self, labels) -> np.ndarray:
+        labels = np.asarray(labels, dtype=str)
+        codes = np.searchsorted(self.classes_, labels)
+        known = (codes < len(self.classes_)) & (self.classes_[np.minimum(codes, len(self.classes_) - 1)] == labels)
+        if not known.all():
+            raise ValueError(f"y contains previously unseen labels: {labels[~known][:5].tolist()}")
+        return codes
+
+
+def has_bundle(artifacts_dir: str) -> bool:
+    """True if artifacts_dir contains a bundle pointer"""
+    return os.path.isfile(os.path.join(artifacts_dir, POINTER_FILE))
+
+
+def current_version(artifacts_dir: str) -> Optional[str]:
+    """Return the active bundle version named by the CURRENT pointer, if any"""
+    try:
+        with open(os.path.join(artifacts_dir, POINTER_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def bundle_dir(artifacts_dir: str, version: str) -> str:
+    return os.path.join(artifacts_dir, BUNDLES_DIR, version)
+
+
+def _version_id(arrays: Dict[str, np.ndarray]) -> str:
+    digest = hashlib.sha256()
+    for name in sorted(arrays):
+        digest.update(name.encode())
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{digest.hexdigest()[:8]}"
+
+
+def set_current(artifacts_dir: str, version: str):
+    """Atomically point CURRENT at version"""
+    fd, tmp_path = tempfile.mkstemp(dir=artifacts_dir, prefix='.CURRENT-')
+    with os.fdopen(fd, 'w') as f:
+        f.write(version + '\n')
+    os.replace(tmp_path, os.path.join(artifacts_dir, POINTER_FILE))
+
+
+def write_bundle(artifacts_dir: str, manifest: Dict, arrays: Dict[str, np.ndarray],
+                 write_extra: Optional[Callable[[str], None]] = None, activate: bool = True) -> str:
+    """
+    Write a new bundle and (by default) make it current
+
+    The bundle is assembled in a temporary directory and renamed into place, so readers
+    never observe a half-written version. write_extra(path) may add files or directories
+    (e.g. a POI store) before the rename.
+
+    Returns:
+        The new bundle version id
+    """
+    os.makedirs(os.path.join(artifacts_dir, BUNDLES_DIR), exist_ok=True)
+    version = _version_id(arrays)
+    tmp_dir = tempfile.mkdtemp(dir=os.path.join(artifacts_dir, BUNDLES_DIR), prefix='.tmp-')
+    try:
+        array_index = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), array, allow_pickle=False)
+            array_index[name] = {'file': f'{name}.npy', 'dtype': array.dtype.str, 'shape': list(array.shape)}
+
+        if write_extra is not None:
+            write_extra(tmp_dir)
+
+        full_manifest = dict(manifest)
+        full_manifest.update({
+            'format_version': FORMAT_VERSION,
+            'version': version,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'arrays': array_index,
+        })
+        # Identical arrays written within the same second get a distinguishing suffix
+        target, suffix = bundle_dir(artifacts_dir, version), 1
+        while os.path.exists(target):
+            suffix += 1
+            target = bundle_dir(artifacts_dir, f'{version}.{suffix}')
+        version = os.path.basename(target)
+        full_manifest['version'] = version
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(full_manifest, f, indent=2)
+        os.rename(tmp_dir, target)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    if activate:
+        set_current(artifacts_dir, version)
+    return version
+
+
+def read_bundle(artifacts_dir: str, version: Optional[str] = None,
+                mmap: bool = True) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """
+    Read a bundle's manifest and arrays (memory-mapped read-only by default)
+
+    Returns:
+        Tuple of (manifest, arrays)
+    """
+    version = version or current_version(artifacts_dir)
+    if not version:
+        raise FileNotFoundError(f"No artifact bundle pointer found in {artifacts_dir}")
+    path = bundle_dir(artifacts_dir, version)
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format version: {manifest.get('format_version')}")
+
+    mmap_mode = 'r' if mmap else None
+    arrays = {
+        name: np.load(os.path.join(path, spec['file']), mmap_mode=mmap_mode, allow_pickle=False)
+        for name, spec in manifest['arrays'].items()
+    }
+    manifest['path'] = path
+    return manifest, arrays
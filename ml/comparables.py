@@ -0,0 +1,246 @@
+"""
+Comparable Listings Store
+Columnar arrays of the training listings (price, sqft, bhk, bath, lat/lng, locality code)
+behind a GridIndex, built at training time and memory-mapped at serve time, so
+"similar listings nearby" is a k-nearest search over a few grid cells rather than a
+pandas frame per worker.
+
+Listings are stored in grid-cell order, so the candidates of one query are contiguous
+runs of each column and touch only a handful of pages.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ml.spatial import ARRAY_NAMES as GRID_ARRAYS
+from ml.spatial import GridIndex
+
+STORE_FILE = 'comparables.json'
+COLUMN_DTYPES = {
+    'price': np.float32,  # lakhs
+    'sqft': np.float32,
+    'bhk': np.int16,
+    'bath': np.int16,
+    'location_code': np.int32,
+}
+
+# Raw per-row spill files written by ComparablesBuilder, in arrival order
+SPILL_DTYPES = dict(COLUMN_DTYPES, lat=np.float64, lng=np.float64, cell_key=np.int64)
+
+DEFAULT_CELL_SIZE_M = 500.0
+DEFAULT_MAX_RADIUS_M = 10000.0
+
+
+class ComparablesStore:
+    """k-nearest training listings to a point, filtered by bhk and sqft"""
+
+    def __init__(self, index: GridIndex, columns: Dict[str, np.ndarray], location_classes: Optional[np.ndarray] = None):
+        self.index = index
+        self.columns = columns
+        self.location_classes = location_classes
+
+    @classmethod
+    def from_columns(cls, price, sqft, bhk, bath, lat, lng, location_code=None,
+                     location_classes=None, cell_size_m: float = DEFAULT_CELL_SIZE_M) -> 'ComparablesStore':
+        """Build from equal-length listing columns (rows with missing values are dropped)"""
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        if location_code is None:
+            location_code = np.full(len(lat), -1)
+        raw = {'price': price, 'sqft': sqft, 'bhk': bhk, 'bath': bath, 'location_code': location_code}
+        raw = {name: np.asarray(values, dtype=np.float64) for name, values in raw.items()}
+        valid = np.isfinite(lat) & np.isfinite(lng)
+        for values in raw.values():
+            valid &= np.isfinite(values)
+
+        grid = GridIndex(lat[valid], lng[valid], cell_size_m)
+        columns = {name: values[valid][grid.order].astype(COLUMN_DTYPES[name]) for name, values in raw.items()}
+        # Columns now follow the grid's cell order, so sorted positions are the row ids
+        grid.order = np.arange(len(grid), dtype=np.int64)
+        classes = None if location_classes is None else np.asarray(location_classes, dtype=str)
+        return cls(grid, columns, classes)
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.index.save(os.path.join(directory, 'grid'))
+        for name, values in self.columns.items():
+            np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(values), allow_pickle=False)
+        self.save_meta(directory)
+
+    def save_meta(self, directory: str):
+        """Write the locality names and metadata file, for columns already written in place"""
+        if self.location_classes is not None:
+            np.save(os.path.join(directory, 'location_classes.npy'), self.location_classes, allow_pickle=False)
+        with open(os.path.join(directory, STORE_FILE), 'w') as f:
+            json.dump({'n_listings': len(self), 'columns': list(self.columns),
+                       'has_locations': self.location_classes is not None}, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'ComparablesStore':
+        with open(os.path.join(directory, STORE_FILE)) as f:
+            meta = json.load(f)
+        mmap_mode = 'r' if mmap else None
+        columns = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+                   for name in meta['columns']}
+        classes = None
+        if meta.get('has_locations'):
+            classes = np.load(os.path.join(directory, 'location_classes.npy'), allow_pickle=False)
+        return cls(GridIndex.load(os.path.join(directory, 'grid'), mmap=mmap), columns, classes)
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.isfile(os.path.join(directory, STORE_FILE))
+
+    def __len__(self):
+        return len(self.index)
+
+    def query(self, lat: float, lng: float, k: int = 10, bhk: Optional[int] = None,
+              sqft_range: Optional[Tuple[float, float]] = None,
+              max_radius_m: float = DEFAULT_MAX_RADIUS_M) -> List[Dict]:
+        """
+        The k nearest listings to (lat, lng), nearest first
+
+        Args:
+            bhk: Only listings with exactly this many bedrooms
+            sqft_range: Only listings with min <= sqft <= max
+            max_radius_m: Listings further away are never returned
+        """
+        bhk_column, sqft_column = self.columns['bhk'], self.columns['sqft']
+
+        def where(rows):
+            keep = np.ones(len(rows), dtype=bool)
+            if bhk is not None:
+                keep &= bhk_column[rows] == bhk
+            if sqft_range is not None:
+                sqft = sqft_column[rows]
+                keep &= (sqft >= sqft_range[0]) & (sqft <= sqft_range[1])
+            return keep
+
+        filtered = bhk is not None or sqft_range is not None
+        indices, distances = self.index.nearest(lat, lng, k, max_radius_m, where if filtered else None)
+        found = indices[0] >= 0
+        rows, distances = indices[0][found], distances[0][found]
+
+        columns = {name: values[rows].tolist() for name, values in self.columns.items()}
+        listings = []
+        for i, row in enumerate(rows.tolist()):
+            listing = {
+                'price_crore': round(columns['price'][i] / 100, 3),
+                'sqft': round(columns['sqft'][i], 1),
+                'bhk': columns['bhk'][i],
+                'bath': columns['bath'][i],
+                'lat': round(float(self.index.lat[row]), 6),
+                'lng': round(float(self.index.lng[row]), 6),
+                'distance_m': round(float(distances[i]), 1),
+            }
+            code = columns['location_code'][i]
+            if self.location_classes is not None and 0 <= code < len(self.location_classes):
+                listing['locality'] = str(self.location_classes[code])
+            listings.append(listing)
+        return listings
+
+
+class ComparablesBuilder:
+    """
+    Out-of-core ComparablesStore construction for chunked (streaming) training
+
+    add() appends each chunk's columns and grid cell keys to raw spill files in directory
+    and tallies rows per cell. build() then places every row at its cell's next free slot
+    in memory-mapped output arrays (a counting sort), so memory depends on the number of
+    grid cells and the chunk size, not on the number of listings.
+    """
+
+    def __init__(self, directory: str, location_classes=None, cell_size_m: float = DEFAULT_CELL_SIZE_M):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.location_classes = None if location_classes is None else np.asarray(location_classes, dtype=str)
+        self._grid = GridIndex(np.empty(0), np.empty(0), cell_size_m)
+        self._spill = {name: open(os.path.join(directory, f'{name}.spill'), 'wb') for name in SPILL_DTYPES}
+        self._chunk_sizes = []
+        self._cell_counts = {}
+
+    def add(self, price, sqft, bhk, bath, lat, lng, location_code=None):
+        """Append one chunk of listing columns (rows with missing values are dropped)"""
+        if location_code is None:
+            location_code = np.full(len(np.atleast_1d(lat)), -1)
+        raw = {'price': price, 'sqft': sqft, 'bhk': bhk, 'bath': bath, 'location_code': location_code,
+               'lat': lat, 'lng': lng}
+        raw = {name: np.asarray(values, dtype=np.float64).reshape(-1) for name, values in raw.items()}
+        valid = np.ones(len(raw['lat']), dtype=bool)
+        for values in raw.values():
+            valid &= np.isfinite(values)
+        raw = {name: values[valid] for name, values in raw.items()}
+        raw['cell_key'] = self._grid.cell_of(raw['lat'], raw['lng'])
+
+        for name, f in self._spill.items():
+            f.write(raw[name].astype(SPILL_DTYPES[name]).tobytes())
+        cells, counts = np.unique(raw['cell_key'], return_counts=True)
+        for cell, count in zip(cells.tolist(), counts.tolist()):
+            self._cell_counts[cell] = self._cell_counts.get(cell, 0) + count
+        self._chunk_sizes.append(int(valid.sum()))
+
+    def build(self) -> ComparablesStore:
+        """Write the cell-ordered store under directory/store and return it memory-mapped"""
+        for f in self._spill.values():
+            f.close()
+        n = sum(self._chunk_sizes)
+        store_dir = os.path.join(self.directory, 'store')
+        grid_dir = os.path.join(store_dir, 'grid')
+        os.makedirs(grid_dir, exist_ok=True)
+
+        cell_keys = np.array(sorted(self._cell_counts), dtype=np.int64)
+        counts = np.array([self._cell_counts[cell] for cell in cell_keys.tolist()], dtype=np.int64)
+        cell_starts = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        np.save(os.path.join(grid_dir, 'cell_keys.npy'), cell_keys)
+        np.save(os.path.join(grid_dir, 'cell_starts.npy'), cell_starts)
+
+        def output(directory, name, dtype):
+            return np.lib.format.open_memmap(os.path.join(directory, f'{name}.npy'), mode='w+', dtype=dtype,
+                                             shape=(n,))
+
+        columns = {name: output(store_dir, name, dtype) for name, dtype in COLUMN_DTYPES.items()}
+        coords = {name: output(grid_dir, name, np.float64) for name in ('lat', 'lng')}
+        # Columns follow the grid's cell order, so sorted positions are the row ids
+        order = output(grid_dir, 'order', np.int64)
+
+        next_free = cell_starts[:-1].copy()
+        start = 0
+        for size in self._chunk_sizes:
+            if size == 0:
+                continue
+            spilled = {name: np.fromfile(os.path.join(self.directory, f'{name}.spill'), dtype=dtype, count=size,
+                                         offset=start * np.dtype(dtype).itemsize)
+                       for name, dtype in SPILL_DTYPES.items()}
+            slot = np.searchsorted(cell_keys, spilled['cell_key'])
+            # Stable within a cell: a row's rank among the chunk's rows in the same cell
+            by_slot = np.argsort(slot, kind='stable')
+            sorted_slot = slot[by_slot]
+            rank = np.arange(size) - np.searchsorted(sorted_slot, sorted_slot, side='left')
+            dest = np.empty(size, dtype=np.int64)
+            dest[by_slot] = next_free[sorted_slot] + rank
+            next_free += np.bincount(slot, minlength=len(cell_keys))
+
+            for name, values in columns.items():
+                values[dest] = spilled[name]
+            for name, values in coords.items():
+                values[dest] = spilled[name]
+            order[start:start + size] = np.arange(start, start + size)
+            start += size
+
+        for array in (*columns.values(), *coords.values(), order):
+            array.flush()
+        del columns, coords, order
+        for name in SPILL_DTYPES:
+            os.remove(os.path.join(self.directory, f'{name}.spill'))
+
+        def load(directory, names):
+            return {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in names}
+
+        grid = GridIndex.from_arrays(load(grid_dir, GRID_ARRAYS), {'cell_size_m': self._grid.cell_size_m,
+                                                                   'ref_lat': self._grid.ref_lat})
+        grid.save_meta(grid_dir)
+        ComparablesStore(grid, load(store_dir, COLUMN_DTYPES), self.location_classes).save_meta(store_dir)
+        return ComparablesStore.load(store_dir)
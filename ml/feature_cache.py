@@ -0,0 +1,159 @@
+"""
+Preprocessed Feature Cache
+Content-addressed store for the cleaned training frame, keyed by a digest of the input
+files, the seed and the preprocessing version, so repeat training runs and image rebuilds
+skip CSV parsing and cleaning when nothing changed.
+
+Entries are columnar: one .npy file per numeric column, and codes plus categories for each
+categorical column.
+
+Layout:
+    cache/features/<key>/frame.json
+    cache/features/<key>/<column>.npy | <column>.codes.npy + <column>.categories.npy
+    cache/features/<key>/index.npy, rows.npy, location_classes.npy
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = 'cache/features'
+FRAME_FILE = 'frame.json'
+DIGESTS_FILE = 'digests.json'
+
+
+def _hash_file(path: str, digest, block_size: int = 1 << 20):
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+
+
+class FeatureCache:
+    """Directory of preprocessed frames addressed by a hash of their inputs"""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_entries: int = 8):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    # Keys
+
+    def digest(self, path: Optional[str]) -> Optional[str]:
+        """
+        SHA-256 of a file, or of every file under a directory (None if path is unset or missing)
+
+        Digests are memoized by (path, size, mtime) so unchanged multi-GB inputs are not re-read.
+        """
+        if not path or not os.path.exists(path):
+            return None
+        files = [path] if os.path.isfile(path) else sorted(
+            os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        stamp = [[os.path.relpath(f, path), os.path.getsize(f), os.stat(f).st_mtime_ns] for f in files]
+        memo_key = os.path.abspath(path)
+        memo = self._read_digests()
+        cached = memo.get(memo_key)
+        if cached and cached['stamp'] == stamp:
+            return cached['sha256']
+
+        digest = hashlib.sha256()
+        for f in files:
+            digest.update(os.path.relpath(f, path).encode())
+            _hash_file(f, digest)
+        memo[memo_key] = {'stamp': stamp, 'sha256': digest.hexdigest()}
+        self._write_digests(memo)
+        return memo[memo_key]['sha256']
+
+    def _read_digests(self) -> Dict:
+        try:
+            with open(os.path.join(self.directory, DIGESTS_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_digests(self, memo: Dict):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.digests-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(memo, f)
+        os.replace(tmp_path, os.path.join(self.directory, DIGESTS_FILE))
+
+    @staticmethod
+    def key(**inputs) -> str:
+        """Cache key for a set of JSON-serializable inputs (file digests, seed, version, ...)"""
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()[:24]
+
+    # Entries
+
+    def load(self, key: str) -> Optional[Tuple[pd.DataFrame, LabelEncoder, np.ndarray]]:
+        """Return (frame, location_encoder, prepared row positions) or None on a miss"""
+        path = os.path.join(self.directory, key)
+        try:
+            with open(os.path.join(path, FRAME_FILE)) as f:
+                spec = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        columns = {}
+        for column in spec['columns']:
+            name, base = column['name'], os.path.join(path, column['file'])
+            if column['kind'] == 'category':
+                categories = np.load(base + '.categories.npy', allow_pickle=False)
+                columns[name] = pd.Categorical.from_codes(np.load(base + '.codes.npy'), categories)
+            else:
+                columns[name] = np.load(base + '.npy', allow_pickle=False)
+        df = pd.DataFrame(columns, index=pd.Index(np.load(os.path.join(path, 'index.npy'))))
+
+        location_encoder = LabelEncoder()
+        location_encoder.classes_ = np.load(os.path.join(path, 'location_classes.npy')).astype(object)
+        rows = np.load(os.path.join(path, 'rows.npy'))
+        os.utime(path)  # recency for pruning
+        return df, location_encoder, rows
+
+    def save(self, key: str, df: pd.DataFrame, location_encoder: LabelEncoder, rows: np.ndarray):
+        """Store a frame atomically; string columns are stored as categoricals"""
+        target = os.path.join(self.directory, key)
+        if os.path.isdir(target):
+            return
+        tmp_dir = tempfile.mkdtemp(dir=self.directory, prefix='.tmp-')
+        try:
+            columns = []
+            for i, name in enumerate(df.columns):
+                values, file = df[name], f'c{i}'
+                if pd.api.types.is_numeric_dtype(values) and not isinstance(values.dtype, pd.CategoricalDtype):
+                    np.save(os.path.join(tmp_dir, file + '.npy'), values.to_numpy(), allow_pickle=False)
+                    columns.append({'name': name, 'file': file, 'kind': 'numeric'})
+                    continue
+                values = values.astype('category')
+                np.save(os.path.join(tmp_dir, file + '.codes.npy'), values.cat.codes.to_numpy())
+                np.save(os.path.join(tmp_dir, file + '.categories.npy'),
+                        np.asarray(values.cat.categories, dtype=str), allow_pickle=False)
+                columns.append({'name': name, 'file': file, 'kind': 'category'})
+            np.save(os.path.join(tmp_dir, 'index.npy'), df.index.to_numpy(dtype=np.int64))
+            np.save(os.path.join(tmp_dir, 'rows.npy'), np.asarray(rows, dtype=np.int64))
+            np.save(os.path.join(tmp_dir, 'location_classes.npy'),
+                    np.asarray(location_encoder.classes_, dtype=str), allow_pickle=False)
+            with open(os.path.join(tmp_dir, FRAME_FILE), 'w') as f:
+                json.dump({'columns': columns, 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')}, f)
+            os.rename(tmp_dir, target)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.isdir(target):
+                raise
+        self._prune()
+
+    def _prune(self):
+        entries = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                   if not name.startswith('.') and os.path.isdir(os.path.join(self.directory, name))]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for stale in entries[self.max_entries:]:
+            shutil.rmtree(stale, ignore_errors=True)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Bulk Locality Geocoding
+Geocodes the distinct locations in household.csv with the HERE Geocoding API and writes
+a locality -> coordinates table that training joins in.
+"""
+
+import argparse
+import csv
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List
+
+import pandas as pd
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HERE_GEOCODE_URL = "https://geocode.search.hereapi.com/v1/geocode"
+TABLE_COLUMNS = ['location', 'lat', 'lng', 'label', 'status']
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls at most `rate` per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class BulkGeocoder:
+    """Geocode many localities with a bounded thread pool, rate limiting and retries"""
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, api_key: str, url: str = HERE_GEOCODE_URL, max_workers: int = 8,
+                 rate: float = 5.0, max_retries: int = 4, backoff: float = 0.5,
+                 timeout: float = 10.0, city: str = 'Bangalore'):
+        self.api_key = api_key
+        self.url = url
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.city = city
+        self.rate_limiter = RateLimiter(rate)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def geocode_one(self, location: str) -> Dict:
+        """Geocode a single locality, retrying throttled and transient failures"""
+        params = {
+            'apiKey': self.api_key,
+            'q': f"{self.city} {location}",
+            'limit': 1
+        }
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            try:
+                response = self.session.get(self.url, params=params, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                error = str(e)
+            else:
+                if response.ok:
+                    try:
+                        items = response.json().get('items') or []
+                    except ValueError:
+                        logger.warning(f"Geocoding '{location}' returned a non-JSON body")
+                        return {'location': location, 'lat': None, 'lng': None, 'label': '',
+                                'status': 'invalid_response'}
+                    if not items:
+                        return {'location': location, 'lat': None, 'lng': None, 'label': '', 'status': 'not_found'}
+                    item = items[0]
+                    return {
+                        'location': location,
+                        'lat': item['position']['lat'],
+                        'lng': item['position']['lng'],
+                        'label': item.get('title', ''),
+                        'status': 'ok'
+                    }
+                if response.status_code not in self.RETRY_STATUS:
+                    return {'location': location, 'lat': None, 'lng': None, 'label': '',
+                            'status': f'http_{response.status_code}'}
+                error = f"HTTP {response.status_code}"
+
+            if attempt < self.max_retries:
+                delay = self.backoff * (2 ** attempt)
+                logger.warning(f"Geocoding '{location}' failed ({error}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+        return {'location': location, 'lat': None, 'lng': None, 'label': '', 'status': 'failed'}
+
+    def geocode_all(self, locations: Iterable[str], checkpoint_path: str) -> pd.DataFrame:
+        """
+        Geocode every locality not already present in the checkpoint file
+
+        Each result is appended to checkpoint_path as soon as it arrives, so an interrupted
+        run resumes where it left off. Failed lookups are retried on the next run.
+        """
+        done = load_checkpoint(checkpoint_path)
+        pending = [loc for loc in dict.fromkeys(locations) if loc not in done]
+        logger.info(f"{len(done)} localities already geocoded, {len(pending)} pending")
+
+        if pending:
+            write_header = not os.path.exists(checkpoint_path)
+            os.makedirs(os.path.dirname(os.path.abspath(checkpoint_path)), exist_ok=True)
+            with open(checkpoint_path, 'a', newline='') as f, \
+                    ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                writer = csv.DictWriter(f, fieldnames=TABLE_COLUMNS)
+                if write_header:
+                    writer.writeheader()
+                futures = [pool.submit(self.geocode_one, loc) for loc in pending]
+                for i, future in enumerate(as_completed(futures), 1):
+                    writer.writerow(future.result())
+                    f.flush()
+                    if i % 100 == 0:
+                        logger.info(f"Geocoded {i}/{len(pending)} localities")
+
+        return read_coordinates_table(checkpoint_path)
+
+
+def load_checkpoint(checkpoint_path: str) -> Dict[str, Dict]:
+    """Return successfully resolved (or definitively missing) localities from a checkpoint"""
+    if not os.path.exists(checkpoint_path):
+        return {}
+    done = {}
+    with open(checkpoint_path, newline='') as f:
+        for row in csv.DictReader(f):
+            if row['status'] in ('ok', 'not_found'):
+                done[row['location']] = row
+    return done
+
+
+def read_coordinates_table(path: str) -> pd.DataFrame:
+    """Read the locality -> coordinates table, keeping the latest row per locality"""
+    table = pd.read_csv(path, dtype={'location': str, 'label': str, 'status': str})
+    table = table.drop_duplicates(subset=['location'], keep='last')
+    return table.reset_index(drop=True)
+
+
+def distinct_localities(data_path: str) -> List[str]:
+    """Return the distinct, non-empty location values from the household data"""
+    locations = pd.read_csv(data_path, usecols=['location'])['location'].dropna().str.strip()
+    return sorted(set(locations[locations != '']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Geocode household.csv localities with HERE')
+    parser.add_argument('--data-path', type=str, default='Data/household.csv',
+                       help='Path to household data CSV')
+    parser.add_argument('--output', type=str, default='Data/locality_coordinates.csv',
+                       help='Locality -> coordinates table (also used as the resume checkpoint)')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent HERE requests')
+    parser.add_argument('--rate', type=float, default=5.0, help='Maximum HERE requests per second')
+    parser.add_argument('--retries', type=int, default=4, help='Retries per locality on 429/5xx')
+    parser.add_argument('--url', type=str, default=os.getenv('HERE_GEOCODE_URL', HERE_GEOCODE_URL),
+                       help='HERE geocode endpoint')
+
+    args = parser.parse_args()
+
+    load_dotenv()
+    api_key = os.getenv('HERE_API_KEY')
+    if not api_key:
+        parser.error('HERE_API_KEY is not set')
+
+    locations = distinct_localities(args.data_path)
+    logger.info(f"Found {len(locations)} distinct localities in {args.data_path}")
+
+    geocoder = BulkGeocoder(api_key, url=args.url, max_workers=args.workers,
+                            rate=args.rate, max_retries=args.retries)
+    table = geocoder.geocode_all(locations, args.output)
+
+    resolved = int((table['status'] == 'ok').sum())
+    logger.info(f"Resolved {resolved}/{len(table)} localities, table written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
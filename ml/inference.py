@@ -4,43 +4,93 @@ Loads trained model and provides prediction functionality.
 """
 
 import os
-import joblib
+import threading
+import time
 import numpy as np
-import pandas as pd
 import logging
-from typing import Dict, Union
+from typing import Dict, List, Mapping, Sequence, Union
+
+from ml.artifacts import LabelClasses, LinearModel, StandardScalerArrays, has_bundle, read_bundle
+from ml.comparables import ComparablesStore
+from ml.lazy import lazy_import
+from ml.locality import LocalityIndex
+from ml.poi_store import FEATURE_PREFIX as POI_FEATURE_PREFIX, POIStore
+from ml.segments import SegmentModels
+from ml.uncertainty import PredictionStats
+from services.metrics import PREDICTOR_STAGE_SECONDS
 
 logger = logging.getLogger(__name__)
 
+# joblib (and sklearn behind it) is only needed for pickled models, not linear bundles
+joblib = lazy_import('joblib')
+
+REQUIRED_FEATURES = ['bhk', 'sqft', 'bath', 'lat', 'lng']
+
+# Optional locality name (e.g. a HERE address.district) that takes precedence over coordinates
+LOCALITY_FIELD = 'locality'
+
+# Optional area type (e.g. "Super built-up Area") that routes the request to its segment model
+AREA_TYPE_FIELD = 'area_type'
+TEXT_FIELDS = (LOCALITY_FIELD, AREA_TYPE_FIELD)
+
+
+def _to_columns(features) -> Dict[str, np.ndarray]:
+    """Normalize row-wise or columnar batch input into float64 column arrays"""
+    if isinstance(features, Mapping):
+        missing_features = [f for f in REQUIRED_FEATURES if f not in features]
+        if missing_features:
+            raise ValueError(f"Missing required features: {missing_features}")
+        columns = {f: np.asarray(features[f], dtype=np.float64).reshape(-1) for f in REQUIRED_FEATURES}
+        for field in TEXT_FIELDS:
+            if features.get(field) is not None:
+                columns[field] = np.asarray(features[field], dtype=object).reshape(-1)
+    else:
+        rows = list(features)
+        for i, row in enumerate(rows):
+            missing_features = [f for f in REQUIRED_FEATURES if f not in row]
+            if missing_features:
+                raise ValueError(f"Row {i}: missing required features: {missing_features}")
+        columns = {
+            f: np.fromiter((row[f] for row in rows), dtype=np.float64, count=len(rows))
+            for f in REQUIRED_FEATURES
+        }
+        for field in TEXT_FIELDS:
+            if any(row.get(field) is not None for row in rows):
+                columns[field] = np.array([row.get(field) for row in rows], dtype=object)
+    
+    lengths = {len(col) for col in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError("All feature columns must have the same length")
+    return columns
+
+
 class RealEstatePricePredictor:
     """Real estate price prediction model wrapper"""
     
-    def __init__(self, artifacts_dir: str = 'artifacts'):
+    def __init__(self, artifacts_dir: str = 'artifacts', version: str = None):
         self.artifacts_dir = artifacts_dir
+        # Load this bundle version instead of the one CURRENT points at
+        self.requested_version = version
         self.model = None
         self.scaler = None
         self.location_encoder = None
         self.feature_names = None
+        self.poi_store = None
+        self.locality_index = None
+        self.prediction_stats = None
+        self.comparables = None
+        self.segment_models = None
+        self.version = None
         self._load_artifacts()
     
     def _load_artifacts(self):
-        """Load all model artifacts"""
+        """Load all model artifacts, preferring a versioned bundle over legacy pickles"""
         try:
-            model_path = os.path.join(self.artifacts_dir, 'model.pkl')
-            scaler_path = os.path.join(self.artifacts_dir, 'scaler.pkl')
-            encoder_path = os.path.join(self.artifacts_dir, 'location_encoder.pkl')
-            features_path = os.path.join(self.artifacts_dir, 'feature_names.pkl')
-            
-            if not all(os.path.exists(p) for p in [model_path, scaler_path, encoder_path, features_path]):
-                raise FileNotFoundError(
-                    f"Model artifacts not found in {self.artifacts_dir}. "
-                    "Please run 'python ml/train_model.py' first."
-                )
-            
-            self.model = joblib.load(model_path)
-            self.scaler = joblib.load(scaler_path)
-            self.location_encoder = joblib.load(encoder_path)
-            self.feature_names = joblib.load(features_path)
+            if has_bundle(self.artifacts_dir):
+                self._load_bundle()
+            else:
+                self._load_pickles()
+            self._compile_fast_path()
             
             logger.info("Model artifacts loaded successfully")
             
@@ -48,20 +98,96 @@ class RealEstatePricePredictor:
             logger.error(f"Failed to load model artifacts: {e}")
             raise
     
+    def _load_bundle(self):
+        """Load a manifest + memory-mapped .npy bundle (no unpickling for linear models)"""
+        manifest, arrays = read_bundle(self.artifacts_dir, self.requested_version)
+        self.version = manifest['version']
+        self.feature_names = list(manifest['feature_names'])
+        self.scaler = StandardScalerArrays(arrays['scaler_mean'], arrays['scaler_scale'])
+        self.location_encoder = LabelClasses(arrays['location_classes'])
+        
+        model_spec = manifest['model']
+        if model_spec['type'] == 'linear':
+            self.model = LinearModel(arrays['coef'], arrays['intercept'][0])
+        else:
+            self.model = joblib.load(os.path.join(manifest['path'], model_spec['file']))
+        
+        poi_dir = os.path.join(manifest['path'], 'poi')
+        if POIStore.exists(poi_dir):
+            self.poi_store = POIStore.load(poi_dir)
+        
+        locality_dir = os.path.join(manifest['path'], 'locality')
+        if LocalityIndex.exists(locality_dir):
+            self.locality_index = LocalityIndex.load(locality_dir)
+        
+        stats_dir = os.path.join(manifest['path'], 'uncertainty')
+        if PredictionStats.exists(stats_dir):
+            self.prediction_stats = PredictionStats.load(stats_dir)
+        
+        comparables_dir = os.path.join(manifest['path'], 'comparables')
+        if ComparablesStore.exists(comparables_dir):
+            self.comparables = ComparablesStore.load(comparables_dir)
+        
+        segments_dir = os.path.join(manifest['path'], 'segments')
+        if SegmentModels.exists(segments_dir):
+            self.segment_models = SegmentModels.load(segments_dir)
+    
+    def _load_pickles(self):
+        """Load the legacy joblib pickle artifacts"""
+        model_path = os.path.join(self.artifacts_dir, 'model.pkl')
+        scaler_path = os.path.join(self.artifacts_dir, 'scaler.pkl')
+        encoder_path = os.path.join(self.artifacts_dir, 'location_encoder.pkl')
+        features_path = os.path.join(self.artifacts_dir, 'feature_names.pkl')
+        
+        if not all(os.path.exists(p) for p in [model_path, scaler_path, encoder_path, features_path]):
+            raise FileNotFoundError(
+                f"Model artifacts not found in {self.artifacts_dir}. "
+                "Please run 'python ml/train_model.py' first."
+            )
+        
+        self.model = joblib.load(model_path)
+        self.scaler = joblib.load(scaler_path)
+        self.location_encoder = joblib.load(encoder_path)
+        self.feature_names = joblib.load(features_path)
+        
+        poi_dir = os.path.join(self.artifacts_dir, 'poi')
+        if POIStore.exists(poi_dir):
+            self.poi_store = POIStore.load(poi_dir)
+        
+        locality_dir = os.path.join(self.artifacts_dir, 'locality')
+        if LocalityIndex.exists(locality_dir):
+            self.locality_index = LocalityIndex.load(locality_dir)
+        
+        stats_dir = os.path.join(self.artifacts_dir, 'uncertainty')
+        if PredictionStats.exists(stats_dir):
+            self.prediction_stats = PredictionStats.load(stats_dir)
+        
+        comparables_dir = os.path.join(self.artifacts_dir, 'comparables')
+        if ComparablesStore.exists(comparables_dir):
+            self.comparables = ComparablesStore.load(comparables_dir)
+        
+        segments_dir = os.path.join(self.artifacts_dir, 'segments')
+        if SegmentModels.exists(segments_dir):
+            self.segment_models = SegmentModels.load(segments_dir)
+    
     def predict(self, features_dict: Dict[str, Union[int, float]]) -> Dict[str, Union[float, Dict]]:
         """
         Predict house price based on input features
         
         Args:
-            features_dict: Dictionary with keys: bhk, sqft, bath, lat, lng
+            features_dict: Dictionary with keys: bhk, sqft, bath, lat, lng and optionally
+                locality (a locality name, e.g. HERE's address.district) and area_type
+                (routes to that segment's model when one was trained)
         
         Returns:
-            Dictionary with price_crore and features_used
+            Dictionary with price_crore, features_used and model_version, plus
+            price_range_crore (when the model that priced the row has interval stats) and contributions_crore
+            (per-feature additive terms over a baseline, for linear models). With segment
+            models, features_used['segment'] names the model used (None for the global one).
         """
         try:
             # Validate required features
-            required_features = ['bhk', 'sqft', 'bath', 'lat', 'lng']
-            missing_features = [f for f in required_features if f not in features_dict]
+            missing_features = [f for f in REQUIRED_FEATURES if f not in features_dict]
             if missing_features:
                 raise ValueError(f"Missing required features: {missing_features}")
             
@@ -72,36 +198,247 @@ class RealEstatePricePredictor:
                 'total_sqft': float(features_dict['sqft']),
                 'bath': float(features_dict['bath']),
                 'lat': float(features_dict['lat']),
-                'lng': float(features_dict['lng']),
-                'location_encoded': 0  # Default location encoding for new locations
+                'lng': float(features_dict['lng'])
             }
             
             # Create feature array in the same order as training
-            X = np.array([[feature_values[name] for name in self.feature_names]])
+            columns = {f: np.array([float(features_dict[f])]) for f in REQUIRED_FEATURES}
+            for field in TEXT_FIELDS:
+                if features_dict.get(field) is not None:
+                    columns[field] = [features_dict[field]]
+            start = time.perf_counter()
+            X = self._build_matrix(columns, out=self._row_buffer())
+            segments = None
+            if self.segment_models is not None:
+                segments = np.array([self.segment_models.route_one(features_dict.get(AREA_TYPE_FIELD),
+                                                                   feature_values['lat'], feature_values['lng'])])
+            built = time.perf_counter()
             
-            # Scale features
-            X_scaled = self.scaler.transform(X)
-            
-            # Make prediction
-            price_prediction = self.model.predict(X_scaled)[0]
+            # Scale features and make prediction
+            price_prediction = self._predict_matrix(X, segments)[0]
+            PREDICTOR_STAGE_SECONDS.observe(built - start, 'build_features')
+            PREDICTOR_STAGE_SECONDS.observe(time.perf_counter() - built, 'model')
             
             # Convert to crores (assuming price is in lakhs)
-            price_crore = round(price_prediction / 100, 2)
+            price_crore = round(float(price_prediction) / 100, 2)
+            
+            features_used = {
+                'bhk': feature_values['bhk'],
+                'total_sqft': feature_values['total_sqft'],
+                'bath': feature_values['bath'],
+                'lat': feature_values['lat'],
+                'lng': feature_values['lng']
+            }
+            if self.locality_index is not None:
+                features_used['locality'] = str(self.location_encoder.classes_[int(columns['location_encoded'][0])])
+            if segments is not None:
+                features_used['segment'] = self.segment_models.label(int(segments[0]))
             
-            return {
+            result = {
                 'price_crore': price_crore,
-                'features_used': {
-                    'bhk': feature_values['bhk'],
-                    'total_sqft': feature_values['total_sqft'],
-                    'bath': feature_values['bath'],
-                    'lat': feature_values['lat'],
-                    'lng': feature_values['lng']
-                }
+                'features_used': features_used,
+                'model_version': self.version
             }
+            if self.prediction_stats is not None:
+                low, high = self._interval(np.array([price_prediction]), X, segments)
+                # No range for a segment model without interval terms of its own
+                if np.isfinite(low[0]):
+                    result['price_range_crore'] = {'low': round(float(low[0]) / 100, 2),
+                                                   'high': round(float(high[0]) / 100, 2),
+                                                   'level': self.prediction_stats.level}
+            if self.fast_path:
+                contributions = self._contributions(X, segments)[0]
+                baseline = float(price_prediction) - float(contributions.sum())
+                result['contributions_crore'] = {'baseline': round(baseline / 100, 4)}
+                result['contributions_crore'].update(
+                    (name, round(value / 100, 4)) for name, value in zip(self.feature_names, contributions.tolist()))
+            return result
             
         except Exception as e:
             logger.error(f"Prediction failed: {e}")
             raise
+    
+    def predict_batch(self, features: Union[Sequence[Mapping[str, Union[int, float]]],
+                                            Mapping[str, Sequence[float]]],
+                      explain: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Predict house prices for many properties in one vectorized pass
+        
+        Args:
+            features: Either a list of dictionaries with keys bhk, sqft, bath, lat, lng
+                (and optionally locality and area_type), or a columnar mapping of those
+                keys to equal-length arrays
+            explain: Also return per-feature contributions (linear models only)
+        
+        Returns:
+            Dictionary with a price_crore array aligned with the input rows and the
+            model_version that produced it; price_low_crore/price_high_crore arrays when
+            the model has interval stats (NaN for rows whose segment model has none); with explain, a rows x features
+            contributions_crore array, its feature_names and the per-row baseline_crore
+            (which differs between segment models)
+        """
+        try:
+            start = time.perf_counter()
+            columns = _to_columns(features)
+            X = self._build_matrix(columns)
+            segments = self._route(columns)
+            built = time.perf_counter()
+            
+            # One predict pass per model: the global model plus each routed segment
+            price_predictions = self._predict_matrix(X, segments)
+            PREDICTOR_STAGE_SECONDS.observe(built - start, 'batch_build_features')
+            PREDICTOR_STAGE_SECONDS.observe(time.perf_counter() - built, 'batch_model')
+            
+            result = {
+                'price_crore': np.round(price_predictions / 100, 2),
+                'model_version': self.version
+            }
+            if self.prediction_stats is not None:
+                low, high = self._interval(price_predictions, X, segments)
+                result['price_low_crore'] = np.round(low / 100, 2)
+                result['price_high_crore'] = np.round(high / 100, 2)
+                result['interval_level'] = self.prediction_stats.level
+            if explain and self.fast_path:
+                contributions = self._contributions(X, segments)
+                result['contributions_crore'] = np.round(contributions / 100, 4)
+                result['feature_names'] = list(self.feature_names)
+                result['baseline_crore'] = np.round((price_predictions - contributions.sum(axis=1)) / 100, 4)
+            return result
+            
+        except Exception as e:
+            logger.error(f"Batch prediction failed: {e}")
+            raise
+    
+    def _compile_fast_path(self):
+        """
+        Fold a StandardScaler into linear weights at load time
+        
+        For y = coef . ((x - mean) / scale) + intercept the scaler is absorbed into
+        w = coef / scale and b = intercept - w . mean, so prediction is a single w . x + b
+        with no sklearn input validation. Models that are not plain linear models behind a
+        StandardScaler keep using the sklearn objects.
+        """
+        self._weights = None
+        self._bias = None
+        self._feature_mean = None
+        self._row_local = threading.local()
+        
+        coef = getattr(self.model, 'coef_', None)
+        intercept = getattr(self.model, 'intercept_', None)
+        if not (isinstance(coef, np.ndarray) and coef.ndim == 1 and len(coef) == len(self.feature_names)):
+            return
+        if not isinstance(intercept, (int, float, np.number)):
+            return
+        if type(self.scaler).__name__ not in ('StandardScaler', 'StandardScalerArrays'):
+            return
+        
+        mean = getattr(self.scaler, 'mean_', None)
+        scale = getattr(self.scaler, 'scale_', None)
+        mean = np.zeros(len(coef)) if mean is None else np.asarray(mean, dtype=np.float64)
+        scale = np.ones(len(coef)) if scale is None else np.asarray(scale, dtype=np.float64)
+        
+        self._weights = np.ascontiguousarray(coef / scale, dtype=np.float64)
+        self._bias = float(intercept) - float(self._weights @ mean)
+        # Contributions are measured from the average training property
+        self._feature_mean = mean
+        logger.info("Folded scaler into linear weights for the fast prediction path")
+    
+    @property
+    def fast_path(self) -> bool:
+        """True when predictions use the fused w . x + b path"""
+        return self._weights is not None
+    
+    def _row_buffer(self) -> np.ndarray:
+        """Per-thread preallocated single-row input buffer"""
+        row = getattr(self._row_local, 'row', None)
+        if row is None:
+            row = self._row_local.row = np.empty((1, len(self.feature_names)), dtype=np.float64)
+        return row
+    
+    def _route(self, columns: Dict[str, np.ndarray]):
+        """Segment model index per row (NO_SEGMENT for the global model), or None without segments"""
+        if self.segment_models is None:
+            return None
+        return self.segment_models.route(columns.get(AREA_TYPE_FIELD), columns['lat'], columns['lng'])
+    
+    def _predict_matrix(self, X: np.ndarray, segments: np.ndarray = None) -> np.ndarray:
+        """Predict prices in lakhs for an unscaled feature matrix, routing rows to segment models"""
+        routed = None if segments is None else segments >= 0
+        if routed is not None and routed.all():
+            return self.segment_models.predict(X, segments)
+        if self._weights is not None:
+            prices = X @ self._weights + self._bias
+        else:
+            prices = np.asarray(self.model.predict(self.scaler.transform(X)), dtype=np.float64)
+        if routed is not None and routed.any():
+            prices[routed] = self.segment_models.predict(X[routed], segments[routed])
+        return prices
+    
+    def _interval(self, prediction: np.ndarray, X: np.ndarray, segments: np.ndarray = None):
+        """
+        Closed-form lower/upper prices in lakhs (never below zero)
+        
+        Rows routed to a segment model use that segment's interval terms; they are NaN when
+        the segment has none (older artifacts, or too few hold-out rows to size a range).
+        """
+        low, high = self.prediction_stats.interval(prediction, X - self.prediction_stats.mean)
+        routed = None if segments is None else segments >= 0
+        if routed is not None and routed.any():
+            segment_stats = self.segment_models.prediction_stats
+            if segment_stats is None:
+                low[routed] = high[routed] = np.nan
+            else:
+                low[routed], high[routed] = segment_stats.interval(prediction[routed], X[routed], segments[routed])
+        return np.maximum(low, 0.0), high
+    
+    def _contributions(self, X: np.ndarray, segments: np.ndarray = None) -> np.ndarray:
+        """
+        Additive per-feature terms in lakhs: w * (x - mean), summing with the baseline to the price
+        
+        Exact for the folded linear model: w . x + b = w . (x - mean) + (w . mean + b). Rows
+        routed to a segment use that segment's weights, so their baseline is its w . mean + b.
+        """
+        weights = self._weights
+        if segments is not None:
+            routed = segments >= 0
+            weights = np.where(routed[:, None], self.segment_models.weights[np.maximum(segments, 0)], weights)
+        return (X - self._feature_mean) * weights
+    
+    def _location_codes(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        location_encoded per row: a known locality name, else the nearest training locality
+        
+        Models without a locality index (older artifacts) keep the constant 0 encoding.
+        """
+        if self.locality_index is None:
+            return np.zeros(len(columns['bhk']), dtype=np.int64)
+        return self.locality_index.resolve(columns['lat'], columns['lng'], columns.get(LOCALITY_FIELD))
+    
+    def _build_matrix(self, columns: Dict[str, np.ndarray], out: np.ndarray = None) -> np.ndarray:
+        """Assemble the model input matrix in training feature order, optionally into out"""
+        n_rows = len(columns['bhk'])
+        columns['location_encoded'] = self._location_codes(columns)
+        model_columns = {
+            'bhk': columns['bhk'],
+            'total_sqft': columns['sqft'],
+            'bath': columns['bath'],
+            'lat': columns['lat'],
+            'lng': columns['lng'],
+            'location_encoded': columns['location_encoded']
+        }
+
+        # Amenity counts come from the local POI store, never from HERE at request time
+        categories = [name[len(POI_FEATURE_PREFIX):] for name in self.feature_names
+                      if name.startswith(POI_FEATURE_PREFIX)]
+        if categories:
+            if self.poi_store is None:
+                raise RuntimeError("Model uses POI features but no POI store was found in artifacts")
+            model_columns.update(self.poi_store.count_batch(columns['lat'], columns['lng'], categories))
+        
+        X = out if out is not None else np.empty((n_rows, len(self.feature_names)), dtype=np.float64)
+        for i, name in enumerate(self.feature_names):
+            X[:, i] = model_columns[name]
+        return X
 
 def predict(features_dict: Dict[str, Union[int, float]], artifacts_dir: str = 'artifacts') -> Dict:
     """
@@ -117,12 +454,10 @@ def predict(features_dict: Dict[str, Union[int, float]], artifacts_dir: str = 'a
     predictor = RealEstatePricePredictor(artifacts_dir)
     return predictor.predict(features_dict)
 
-# Global predictor instance for Flask app
-_predictor = None
-
 def get_predictor(artifacts_dir: str = 'artifacts') -> RealEstatePricePredictor:
-    """Get or create global predictor instance"""
-    global _predictor
-    if _predictor is None:
-        _predictor = RealEstatePricePredictor(artifacts_dir)
-    return _predictor
+    """Get the active predictor from the global model registry, which hot-swaps new versions"""
+    from ml.registry import get_registry
+    registry = get_registry(artifacts_dir)
+    if registry.predictor is None:
+        raise FileNotFoundError(registry.last_error or f"No trained model found in {artifacts_dir}")
+    return registry.predictor
@@ -0,0 +1,207 @@
+"""
+Locality Resolution Index
+Maps request coordinates (or a locality name from a HERE geocode response) to the nearest
+training locality, so inference can fill location_encoded the same way training did.
+
+Built at training time from per-locality centroids of the training rows and saved next to
+the model:
+- a raster of the nearest locality for every ~200 m cell around the centroids, so a
+  coordinate lookup is one array index (points outside it use an exact GridIndex search)
+- a sorted array of normalized names for O(log n) exact name matches
+"""
+
+import json
+import os
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+from ml.spatial import EARTH_RADIUS_M, GridIndex
+from services.geocoding import normalize_query
+
+INDEX_FILE = 'locality.json'
+ARRAY_NAMES = ['codes', 'lat', 'lng', 'name_keys', 'name_codes', 'raster']
+
+# Localities further than this from a query are not considered a match
+DEFAULT_MAX_DISTANCE_M = 10000.0
+
+# Raster resolution: a lookup may pick a neighbouring locality within half a cell of a boundary
+RASTER_CELL_M = 200.0
+MAX_RASTER_CELLS = 4_000_000
+
+
+class LocalityIndex:
+    """Nearest-centroid and name lookup over the location classes of a trained model"""
+
+    def __init__(self, codes: np.ndarray, lat: np.ndarray, lng: np.ndarray, name_keys: np.ndarray,
+                 name_codes: np.ndarray, raster: np.ndarray, raster_meta: dict,
+                 max_distance_m: float = DEFAULT_MAX_DISTANCE_M, cell_size_m: float = 1000.0):
+        self.codes = codes
+        self.lat = lat
+        self.lng = lng
+        self.name_keys = name_keys
+        self.name_codes = name_codes
+        self.raster = raster
+        self.raster_meta = raster_meta
+        self.max_distance_m = float(max_distance_m)
+        self.cell_size_m = float(cell_size_m)
+        self.grid = GridIndex(lat, lng, cell_size_m)
+
+    @classmethod
+    def from_rows(cls, classes: Iterable[str], location_codes, lat, lng,
+                  max_distance_m: float = DEFAULT_MAX_DISTANCE_M) -> 'LocalityIndex':
+        """
+        Build from training rows: their location_encoded values and coordinates
+
+        Each locality is placed at the mean coordinate of its rows; classes without rows
+        (and the 'Unknown' placeholder) can still be matched by name but never by position.
+        """
+        classes = list(classes)
+        location_codes = np.asarray(location_codes, dtype=np.int64)
+        counts = np.bincount(location_codes, minlength=len(classes))
+        sum_lat = np.bincount(location_codes, weights=np.asarray(lat, dtype=np.float64), minlength=len(classes))
+        sum_lng = np.bincount(location_codes, weights=np.asarray(lng, dtype=np.float64), minlength=len(classes))
+        return cls.from_sums(classes, counts, sum_lat, sum_lng, max_distance_m)
+
+    @classmethod
+    def from_sums(cls, classes: Iterable[str], counts, sum_lat, sum_lng,
+                  max_distance_m: float = DEFAULT_MAX_DISTANCE_M) -> 'LocalityIndex':
+        """Build from per-class row counts and coordinate sums (for chunked training)"""
+        classes = np.asarray(list(classes), dtype=str)
+        counts = np.asarray(counts, dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            centroid_lat = np.asarray(sum_lat, dtype=np.float64) / counts
+            centroid_lng = np.asarray(sum_lng, dtype=np.float64) / counts
+        placed = (counts > 0) & (classes != 'Unknown')
+        codes = np.flatnonzero(placed)
+
+        # Name keys sorted for searchsorted; of classes sharing a key ("Whitefield" and
+        # " Whitefield") the one with the most training rows wins
+        keys = np.array([normalize_query(name) for name in classes], dtype=str)
+        named = np.flatnonzero((keys != '') & (classes != 'Unknown'))
+        order = named[np.lexsort((-counts[named], keys[named]))]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = keys[order][1:] != keys[order][:-1]
+        name_keys, name_codes = keys[order][first], order[first]
+
+        raster, raster_meta = _build_raster(centroid_lat[codes], centroid_lng[codes], codes, max_distance_m)
+        return cls(codes, centroid_lat[codes], centroid_lng[codes], name_keys, name_codes,
+                   raster, raster_meta, max_distance_m)
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name), allow_pickle=False)
+        with open(os.path.join(directory, INDEX_FILE), 'w') as f:
+            json.dump({'max_distance_m': self.max_distance_m, 'cell_size_m': self.cell_size_m,
+                       'raster': self.raster_meta, 'n_localities': len(self.codes)}, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'LocalityIndex':
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            meta = json.load(f)
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+                  for name in ARRAY_NAMES}
+        return cls(raster_meta=meta['raster'], max_distance_m=meta['max_distance_m'],
+                   cell_size_m=meta['cell_size_m'], **arrays)
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.isfile(os.path.join(directory, INDEX_FILE))
+
+    def nearest(self, lat, lng) -> np.ndarray:
+        """Exact location code of the nearest centroid per point (-1 beyond max_distance_m)"""
+        lat = np.atleast_1d(lat)
+        if len(self.codes) == 0:
+            return np.full(len(lat), -1, dtype=np.int64)
+        indices, _ = self.grid.nearest(lat, lng, k=1, max_radius_m=self.max_distance_m)
+        indices = indices[:, 0]
+        return np.where(indices >= 0, self.codes[np.maximum(indices, 0)], -1)
+
+    def resolve_coordinates(self, lat, lng) -> np.ndarray:
+        """Location code per point from the raster, falling back to nearest() outside it"""
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lng = np.atleast_1d(np.asarray(lng, dtype=np.float64))
+        meta = self.raster_meta
+        n_rows, n_cols = self.raster.shape
+        if len(lat) == 1:
+            # Single-row requests: plain float arithmetic avoids a dozen tiny array ops
+            row = int((lat[0] - meta['lat0']) // meta['dlat'])
+            col = int((lng[0] - meta['lng0']) // meta['dlng'])
+            if 0 <= row < n_rows and 0 <= col < n_cols:
+                return np.array([self.raster[row, col]], dtype=np.int64)
+            return self.nearest(lat, lng)
+        rows = np.floor((lat - meta['lat0']) / meta['dlat']).astype(np.int64)
+        cols = np.floor((lng - meta['lng0']) / meta['dlng']).astype(np.int64)
+        inside = (rows >= 0) & (rows < n_rows) & (cols >= 0) & (cols < n_cols)
+        if inside.all():
+            return self.raster[rows, cols].astype(np.int64)
+        codes = np.empty(len(lat), dtype=np.int64)
+        codes[inside] = self.raster[rows[inside], cols[inside]]
+        codes[~inside] = self.nearest(lat[~inside], lng[~inside])
+        return codes
+
+    def resolve_names(self, names: Iterable[Optional[str]]) -> np.ndarray:
+        """Location code per exactly matching (normalized) locality name, -1 when unknown"""
+        keys = np.array([normalize_query(name) if isinstance(name, str) else '' for name in names], dtype=str)
+        if len(self.name_keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        slot = np.searchsorted(self.name_keys, keys)
+        slot_clipped = np.minimum(slot, len(self.name_keys) - 1)
+        found = (slot < len(self.name_keys)) & (self.name_keys[slot_clipped] == keys) & (keys != '')
+        return np.where(found, self.name_codes[slot_clipped], -1)
+
+    def centroid(self, name: str) -> Optional[Tuple[float, float]]:
+        """(lat, lng) of the training locality with this exact (normalized) name, or None"""
+        code = int(self.resolve_names([name])[0])
+        rows = np.flatnonzero(self.codes == code) if code >= 0 else []
+        if len(rows) == 0:
+            return None
+        return float(self.lat[rows[0]]), float(self.lng[rows[0]])
+
+    def resolve(self, lat, lng, names: Optional[Iterable[Optional[str]]] = None,
+                default: int = 0) -> np.ndarray:
+        """Location codes for a batch: a known name wins, then the nearest centroid, else default"""
+        if names is None:
+            codes = self.resolve_coordinates(lat, lng)
+        else:
+            codes = self.resolve_names(names)
+            missing = codes < 0
+            if missing.any():
+                codes[missing] = self.resolve_coordinates(np.atleast_1d(lat)[missing], np.atleast_1d(lng)[missing])
+        codes[codes < 0] = default
+        return codes
+
+
+def _build_raster(lat: np.ndarray, lng: np.ndarray, codes: np.ndarray, max_distance_m: float):
+    """Nearest-centroid code for every cell centre of a grid covering the centroids +- max_distance_m"""
+    if len(codes) == 0:
+        return np.full((0, 0), -1, dtype=np.int32), {'lat0': 0.0, 'lng0': 0.0, 'dlat': 1.0, 'dlng': 1.0}
+
+    m_per_deg_lat = np.pi * EARTH_RADIUS_M / 180.0
+    m_per_deg_lng = m_per_deg_lat * np.cos(np.radians(np.mean(lat)))
+    pad_lat, pad_lng = max_distance_m / m_per_deg_lat, max_distance_m / m_per_deg_lng
+    lat0, lat1 = lat.min() - pad_lat, lat.max() + pad_lat
+    lng0, lng1 = lng.min() - pad_lng, lng.max() + pad_lng
+
+    # Coarsen the cells if the area would need more than MAX_RASTER_CELLS
+    area_m2 = (lat1 - lat0) * m_per_deg_lat * (lng1 - lng0) * m_per_deg_lng
+    cell_m = max(RASTER_CELL_M, float(np.sqrt(area_m2 / MAX_RASTER_CELLS)))
+    dlat, dlng = cell_m / m_per_deg_lat, cell_m / m_per_deg_lng
+    n_rows = int(np.ceil((lat1 - lat0) / dlat))
+    n_cols = int(np.ceil((lng1 - lng0) / dlng))
+
+    centre_lat = lat0 + (np.arange(n_rows) + 0.5) * dlat
+    centre_lng = lng0 + (np.arange(n_cols) + 0.5) * dlng
+    # Training-time only: a haversine ball tree answers the ~10^5 cell queries in one call
+    from sklearn.neighbors import BallTree
+    tree = BallTree(np.radians(np.column_stack([lat, lng])), metric='haversine')
+    cell_lat, cell_lng = np.meshgrid(centre_lat, centre_lng, indexing='ij')
+    distance, nearest = tree.query(np.radians(np.column_stack([cell_lat.ravel(), cell_lng.ravel()])), k=1)
+    within = distance[:, 0] * EARTH_RADIUS_M <= max_distance_m
+    raster = np.where(within, codes[nearest[:, 0]], -1).astype(np.int32).reshape(n_rows, n_cols)
+    meta = {'lat0': float(lat0), 'lng0': float(lng0), 'dlat': float(dlat), 'dlng': float(dlng),
+            'cell_m': cell_m}
+    return raster, meta
+
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Parallel Model Search
+Preprocesses household.csv once into a memory-mapped feature matrix, then evaluates
+candidate models x outlier thresholds x CV folds across a process pool. Writes a
+leaderboard (fit time, predict latency, MAE, R²) and can promote the winner to the
+artifacts directory.
+
+Usage: python ml/model_search.py --folds 5 --output bench/model_search --promote
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import KFold
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+# Allow running as a script: python ml/model_search.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ml.poi_store import POIStore
+from ml.feature_cache import DEFAULT_CACHE_DIR
+from ml.uncertainty import INTERVAL_QUANTILES, PredictionStats
+from ml.train_model import (build_comparables, build_locality_index, feature_columns, geocoded_rows, outlier_bounds,
+                            preprocess, read_coordinates, save_artifacts)
+
+logger = logging.getLogger(__name__)
+
+FEATURES_DIR = 'features'
+LEADERBOARD_FILE = 'leaderboard.json'
+
+# Rows timed one at a time for the single-prediction latency column
+LATENCY_ROWS = 200
+
+# Model kinds whose predictions are linear in the scaled features, so the (XᵀX)⁻¹ leverage
+# term of PredictionStats applies to them
+LINEAR_KINDS = ('linear', 'ridge', 'lasso')
+
+
+@dataclass
+class Candidate:
+    """One model configuration plus the outlier threshold applied to its training rows"""
+    name: str
+    kind: str
+    params: Dict = field(default_factory=dict)
+    iqr_multiplier: Optional[float] = 1.5
+
+
+def make_model(kind: str, params: Dict, seed: int):
+    if kind == 'linear':
+        from sklearn.linear_model import LinearRegression
+        return LinearRegression(**params)
+    if kind == 'ridge':
+        from sklearn.linear_model import Ridge
+        return Ridge(**params)
+    if kind == 'lasso':
+        from sklearn.linear_model import Lasso
+        return Lasso(max_iter=20000, **params)
+    if kind == 'gbr':
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        return HistGradientBoostingRegressor(random_state=seed, **params)
+    raise ValueError(f"Unknown model kind: {kind}")
+
+
+def default_candidates(kinds: List[str], iqr_multipliers: List[Optional[float]]) -> List[Candidate]:
+    grids = {
+        'linear': [{}],
+        'ridge': [{'alpha': a} for a in (0.1, 1.0, 10.0, 100.0)],
+        'lasso': [{'alpha': a} for a in (0.01, 0.1, 1.0)],
+        'gbr': [{'max_iter': 200, 'learning_rate': 0.1}, {'max_iter': 400, 'learning_rate': 0.05}],
+    }
+    candidates = []
+    for kind in kinds:
+        for params in grids[kind]:
+            for k in iqr_multipliers:
+                label = ','.join(f'{p}={v}' for p, v in params.items())
+                name = f"{kind}({label})" + (f"@iqr{k:g}" if k else "@no-filter")
+                candidates.append(Candidate(name, kind, params, k))
+    return candidates
+
+
+def build_feature_cache(df, location_encoder, directory: str, geocoded: Optional[np.ndarray] = None) -> Dict:
+    """
+    Write the full (pre-outlier-filter) feature matrix and prices as .npy files
+
+    Workers memory-map these, so the matrix is parsed once and shared across processes.
+    geocoded marks rows with coordinates from the locality table (see geocoded_rows).
+    """
+    os.makedirs(directory, exist_ok=True)
+    feature_names = feature_columns(df.columns)
+    np.save(os.path.join(directory, 'X.npy'), df[feature_names].to_numpy(dtype=np.float64))
+    np.save(os.path.join(directory, 'y.npy'), df['price'].to_numpy(dtype=np.float64))
+    np.save(os.path.join(directory, 'location_classes.npy'), np.asarray(location_encoder.classes_, dtype=str))
+    if geocoded is None:
+        geocoded = np.zeros(len(df), dtype=bool)
+    np.save(os.path.join(directory, 'geocoded.npy'), np.asarray(geocoded, dtype=bool))
+    meta = {'feature_names': feature_names, 'n_rows': int(len(df))}
+    with open(os.path.join(directory, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def load_feature_cache(directory: str, mmap: bool = True):
+    """Return (X, y, meta) from a feature cache directory"""
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    mmap_mode = 'r' if mmap else None
+    X = np.load(os.path.join(directory, 'X.npy'), mmap_mode=mmap_mode)
+    y = np.load(os.path.join(directory, 'y.npy'), mmap_mode=mmap_mode)
+    return X, y, meta
+
+
+def _price_mask(y: np.ndarray, iqr_multiplier: Optional[float]) -> np.ndarray:
+    if not iqr_multiplier:
+        return np.ones(len(y), dtype=bool)
+    q1, q3 = np.quantile(y, [0.25, 0.75])
+    lower, upper = outlier_bounds(q1, q3, iqr_multiplier)
+    return (y >= lower) & (y <= upper)
+
+
+# Per-worker state, set by _init_worker
+_worker = {}
+
+
+def _init_worker(features_dir: str):
+    from threadpoolctl import threadpool_limits
+    # One BLAS thread per process: the pool already uses every core
+    _worker['limits'] = threadpool_limits(1)
+    _worker['X'], _worker['y'], _ = load_feature_cache(features_dir)
+
+
+def evaluate_fold(candidate: Candidate, train_idx: np.ndarray, test_idx: np.ndarray, seed: int) -> Dict:
+    """
+    Fit one candidate on one fold and score it
+
+    Training rows are filtered with the candidate's outlier threshold; test rows always use
+    the default 1.5 * IQR rule so every candidate is scored on the same population.
+    """
+    X, y = _worker['X'], _worker['y']
+    X_train, y_train = X[train_idx], y[train_idx]
+    keep = _price_mask(y_train, candidate.iqr_multiplier)
+    X_train, y_train = X_train[keep], y_train[keep]
+    X_test, y_test = X[test_idx], y[test_idx]
+    keep = _price_mask(y_test, 1.5)
+    X_test, y_test = X_test[keep], y_test[keep]
+
+    start = time.perf_counter()
+    scaler = StandardScaler().fit(X_train)
+    model = make_model(candidate.kind, candidate.params, seed).fit(scaler.transform(X_train), y_train)
+    fit_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_pred = model.predict(scaler.transform(X_test))
+    batch_s = time.perf_counter() - start
+
+    rows = X_test[:LATENCY_ROWS]
+    start = time.perf_counter()
+    for i in range(len(rows)):
+        model.predict(scaler.transform(rows[i:i + 1]))
+    single_us = (time.perf_counter() - start) / max(len(rows), 1) * 1e6
+
+    return {
+        'fit_s': fit_s,
+        'predict_us_row': single_us,
+        'batch_rows_per_s': len(X_test) / batch_s if batch_s > 0 else float('inf'),
+        'mae': float(mean_absolute_error(y_test, y_pred)),
+        'r2': float(r2_score(y_test, y_pred)),
+        'residuals': y_test - y_pred,
+    }
+
+
+def _evaluate_task(candidate: Candidate, train_idx, test_idx, seed: int):
+    return candidate.name, evaluate_fold(candidate, train_idx, test_idx, seed)
+
+
+def run_search(features_dir: str, candidates: List[Candidate], folds: int = 5, seed: int = 42,
+               workers: Optional[int] = None) -> List[Dict]:
+    """Evaluate every candidate on every fold in a process pool; returns leaderboard rows by MAE"""
+    _, y, meta = load_feature_cache(features_dir)
+    splits = list(KFold(n_splits=folds, shuffle=True, random_state=seed).split(np.arange(meta['n_rows'])))
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"Evaluating {len(candidates)} candidates x {folds} folds on {workers} worker(s)")
+
+    scores: Dict[str, List[Dict]] = {c.name: [] for c in candidates}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(features_dir,)) as pool:
+        futures = [pool.submit(_evaluate_task, c, train_idx, test_idx, seed)
+                   for c in candidates for train_idx, test_idx in splits]
+        for future in as_completed(futures):
+            name, result = future.result()
+            scores[name].append(result)
+
+    leaderboard = []
+    for candidate in candidates:
+        # Out-of-fold residuals over every row, for the promoted model's price intervals
+        residuals = np.concatenate([result.pop('residuals') for result in scores[candidate.name]])
+        results = pd.DataFrame(scores[candidate.name])
+        leaderboard.append({
+            **asdict(candidate),
+            'mae': round(float(results['mae'].mean()), 4),
+            'mae_std': round(float(results['mae'].std(ddof=0)), 4),
+            'r2': round(float(results['r2'].mean()), 4),
+            'fit_s': round(float(results['fit_s'].mean()), 4),
+            'predict_us_row': round(float(results['predict_us_row'].median()), 1),
+            'batch_rows_per_s': round(float(results['batch_rows_per_s'].median()), 1),
+            'residual_quantiles': [round(float(q), 4) for q in np.quantile(residuals, INTERVAL_QUANTILES)],
+        })
+    leaderboard.sort(key=lambda row: row['mae'])
+    for rank, row in enumerate(leaderboard, 1):
+        row['rank'] = rank
+    return leaderboard
+
+
+def write_leaderboard(output_dir: str, leaderboard: List[Dict], config: Dict) -> str:
+    """Write the leaderboard as JSON (with the search config) and CSV; returns the JSON path"""
+    path = os.path.join(output_dir, LEADERBOARD_FILE)
+    with open(path, 'w') as f:
+        json.dump({'config': config, 'leaderboard': leaderboard}, f, indent=2)
+    pd.DataFrame(leaderboard).drop(columns=['params', 'residual_quantiles'], errors='ignore').to_csv(
+        os.path.join(output_dir, 'leaderboard.csv'), index=False)
+    return path
+
+
+def promote(features_dir: str, entry: Dict, artifacts_dir: str, seed: int = 42,
+            poi_store: Optional[POIStore] = None, artifact_format: str = 'bundle') -> Optional[str]:
+    """
+    Refit a leaderboard entry on every cached row and save it as the active artifacts
+
+    Price intervals use the entry's out-of-fold residual quantiles from the search, with the
+    leverage term only for linear kinds. The bundle serves the global model only.
+    """
+    X, y, meta = load_feature_cache(features_dir, mmap=False)
+    candidate = Candidate(entry['name'], entry['kind'], entry['params'], entry['iqr_multiplier'])
+    keep = _price_mask(y, candidate.iqr_multiplier)
+    scaler = StandardScaler().fit(X[keep])
+    model = make_model(candidate.kind, candidate.params, seed).fit(scaler.transform(X[keep]), y[keep])
+
+    location_encoder = LabelEncoder()
+    location_encoder.classes_ = np.load(os.path.join(features_dir, 'location_classes.npy')).astype(object)
+    training_info = {
+        'model': type(model).__name__,
+        'seed': seed,
+        'search': {key: entry[key] for key in ('name', 'params', 'iqr_multiplier', 'mae', 'r2')},
+    }
+    columns = {name: X[keep, i] for i, name in enumerate(meta['feature_names'])}
+    geocoded_path = os.path.join(features_dir, 'geocoded.npy')
+    geocoded = np.load(geocoded_path) if os.path.exists(geocoded_path) else np.zeros(len(y), dtype=bool)
+    locality_index = build_locality_index(location_encoder.classes_, pd.DataFrame(columns), geocoded[keep])
+    prediction_stats = _promoted_prediction_stats(candidate, entry, X[keep], y[keep], model, scaler)
+    comparables = build_comparables(pd.DataFrame(columns), y[keep], location_encoder.classes_)
+    version = save_artifacts(model, scaler, location_encoder, meta['feature_names'], artifacts_dir,
+                             poi_store, artifact_format, training_info, locality_index, prediction_stats,
+                             comparables)
+    logger.info(f"Promoted {candidate.name} to {artifacts_dir}")
+    logger.warning("The promoted bundle serves the global model only; ml/train_model.py trains segment models")
+    return version
+
+
+def _promoted_prediction_stats(candidate: Candidate, entry: Dict, X: np.ndarray, y: np.ndarray,
+                               model, scaler) -> PredictionStats:
+    """Interval terms for a refitted leaderboard entry"""
+    residual_quantiles = entry.get('residual_quantiles')
+    if residual_quantiles is None:
+        # Leaderboards written before out-of-fold residuals were recorded
+        logger.warning(f"No out-of-fold residuals for {candidate.name}; price ranges use in-sample residuals "
+                       "and will be too narrow")
+        residual_quantiles = np.quantile(y - model.predict(scaler.transform(X)), INTERVAL_QUANTILES)
+    if candidate.kind in LINEAR_KINDS:
+        mean = X.mean(axis=0)
+        centred = X - mean
+        return PredictionStats.from_moments(len(X), mean, centred.T @ centred, residual_quantiles)
+    # A zero precision matrix gives every row the average leverage: a constant-width range
+    dim = X.shape[1]
+    return PredictionStats(np.zeros(dim), np.zeros((dim, dim)), np.asarray(residual_quantiles, dtype=np.float64),
+                           len(X))
+
+
+def _parse_iqr(value: str) -> Optional[float]:
+    value = float(value)
+    return value if value > 0 else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel model search over cached features')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducibility')
+    parser.add_argument('--data-path', type=str, default='Data/household.csv',
+                       help='Path to household data CSV')
+    parser.add_argument('--coordinates-path', type=str, default='Data/locality_coordinates.csv',
+                       help='Locality -> coordinates table from ml/geocode_localities.py (used if present)')
+    parser.add_argument('--poi-path', type=str, default=None,
+                       help='POI CSV (category, lat, lng) or saved POI store directory for amenity features')
+    parser.add_argument('--output', type=str, default='bench/model_search',
+                       help='Directory for the cached feature matrix and leaderboard')
+    parser.add_argument('--models', nargs='+', default=['linear', 'ridge', 'lasso', 'gbr'],
+                       choices=['linear', 'ridge', 'lasso', 'gbr'])
+    parser.add_argument('--iqr', nargs='+', type=_parse_iqr, default=[1.5, 3.0],
+                       help='Outlier IQR multipliers for training rows (0 disables filtering)')
+    parser.add_argument('--folds', type=int, default=5, help='Cross-validation folds')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--reuse-features', action='store_true',
+                       help='Reuse the feature matrix already cached in --output')
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR,
+                       help='Preprocessed feature cache shared with train_model.py')
+    parser.add_argument('--promote', action='store_true', help='Refit the winner and save it to --artifacts-dir')
+    parser.add_argument('--promote-only', action='store_true',
+                       help='Promote the winner of the existing leaderboard in --output without searching')
+    parser.add_argument('--artifacts-dir', type=str, default='artifacts',
+                       help='Directory to save promoted model artifacts')
+    parser.add_argument('--artifact-format', choices=['bundle', 'pickle', 'both'], default='bundle')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    features_dir = os.path.join(args.output, FEATURES_DIR)
+
+    poi_store = None
+    if args.poi_path:
+        if POIStore.exists(args.poi_path):
+            poi_store = POIStore.load(args.poi_path, mmap=False)
+        else:
+            poi_store = POIStore.from_csv(args.poi_path)
+
+    if args.promote_only:
+        with open(os.path.join(args.output, LEADERBOARD_FILE)) as f:
+            winner = json.load(f)['leaderboard'][0]
+        promote(features_dir, winner, args.artifacts_dir, args.seed, poi_store, args.artifact_format)
+        return
+
+    if not (args.reuse_features and os.path.exists(os.path.join(features_dir, 'meta.json'))):
+        start = time.perf_counter()
+        df, location_encoder, _, _ = preprocess(args.data_path, args.seed, args.coordinates_path, args.poi_path,
+                                                poi_store, cache_dir=args.cache_dir)
+        build_feature_cache(df, location_encoder, features_dir,
+                            geocoded_rows(df, read_coordinates(args.coordinates_path)))
+        logger.info(f"Cached feature matrix in {features_dir} ({time.perf_counter() - start:.2f}s)")
+
+    candidates = default_candidates(args.models, args.iqr)
+    start = time.perf_counter()
+    leaderboard = run_search(features_dir, candidates, args.folds, args.seed, args.workers)
+    elapsed = time.perf_counter() - start
+    config = {'data_path': args.data_path, 'seed': args.seed, 'folds': args.folds,
+              'workers': args.workers or os.cpu_count(), 'search_s': round(elapsed, 2)}
+    path = write_leaderboard(args.output, leaderboard, config)
+
+    for row in leaderboard:
+        logger.info(f"{row['rank']:>3}. {row['name']:<45} MAE={row['mae']:.2f}±{row['mae_std']:.2f} "
+                    f"R²={row['r2']:.3f} fit={row['fit_s']:.3f}s predict={row['predict_us_row']:.0f}µs")
+    logger.info(f"Leaderboard written to {path} ({elapsed:.1f}s)")
+
+    if args.promote:
+        promote(features_dir, leaderboard[0], args.artifacts_dir, args.seed, poi_store, args.artifact_format)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+POI Density Feature Store
+Bulk-loads points of interest (hospitals, parks, schools, ...) into per-category grid
+indexes and answers "how many of category X within r metres" locally, so training and
+inference compute amenity features without HERE Browse calls.
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Allow running as a script: python ml/poi_store.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ml.lazy import lazy_import
+from ml.spatial import GridIndex
+
+# Only the build path needs pandas; loading a saved store for inference does not
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# Search radius per category in metres: daily needs must be closer than leisure spots
+DEFAULT_RADII = {
+    'hospital': 500,
+    'park': 500,
+    'school': 500,
+    'store': 500,
+    'restaurant': 1000,
+    'mall': 1000,
+    'metro_station': 1000,
+}
+
+FEATURE_PREFIX = 'poi_'
+
+
+def feature_name(category: str) -> str:
+    return f'{FEATURE_PREFIX}{category}'
+
+
+class POIStore:
+    """Per-category POI grid indexes with radius counting for single points and batches"""
+
+    def __init__(self, indexes: Dict[str, GridIndex], radii: Optional[Dict[str, float]] = None):
+        self.indexes = indexes
+        self.radii = {c: float((radii or DEFAULT_RADII).get(c, 500)) for c in indexes}
+
+    @property
+    def categories(self) -> List[str]:
+        return sorted(self.indexes)
+
+    @property
+    def feature_names(self) -> List[str]:
+        return [feature_name(c) for c in self.categories]
+
+    @classmethod
+    def from_frame(cls, pois: 'pd.DataFrame', radii: Optional[Dict[str, float]] = None,
+                   cell_size_m: float = 250.0) -> 'POIStore':
+        """Build from a frame with category, lat and lng columns"""
+        pois = pois.dropna(subset=['category', 'lat', 'lng'])
+        indexes = {
+            str(category): GridIndex(group['lat'].to_numpy(), group['lng'].to_numpy(), cell_size_m)
+            for category, group in pois.groupby('category')
+        }
+        logger.info(f"Built POI store with {len(pois)} points across {len(indexes)} categories")
+        return cls(indexes, radii)
+
+    @classmethod
+    def from_csv(cls, path: str, **kwargs) -> 'POIStore':
+        return cls.from_frame(pd.read_csv(path, usecols=['category', 'lat', 'lng']), **kwargs)
+
+    def save(self, directory: str):
+        """Write one grid index per category plus a store manifest"""
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.makedirs(directory)
+        for category, index in self.indexes.items():
+            index.save(os.path.join(directory, category))
+        with open(os.path.join(directory, 'store.json'), 'w') as f:
+            json.dump({'categories': self.categories, 'radii': self.radii}, f, indent=2)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'POIStore':
+        with open(os.path.join(directory, 'store.json')) as f:
+            manifest = json.load(f)
+        indexes = {c: GridIndex.load(os.path.join(directory, c), mmap=mmap) for c in manifest['categories']}
+        return cls(indexes, manifest['radii'])
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.isfile(os.path.join(directory, 'store.json'))
+
+    def count(self, category: str, lat: float, lng: float, radius_m: Optional[float] = None) -> int:
+        """Count POIs of one category within radius_m of a single point"""
+        radius_m = self.radii[category] if radius_m is None else radius_m
+        return int(self.indexes[category].count_within(lat, lng, radius_m)[0])
+
+    def count_batch(self, lat, lng, categories: Optional[Iterable[str]] = None,
+                    radii: Optional[Dict[str, float]] = None) -> Dict[str, np.ndarray]:
+        """Return {poi_<category>: counts} arrays for every query point"""
+        radii = radii or {}
+        features = {}
+        for category in (categories or self.categories):
+            radius_m = radii.get(category, self.radii[category])
+            features[feature_name(category)] = self.indexes[category].count_within(lat, lng, radius_m)
+        return features
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the local POI density store')
+    parser.add_argument('--input', type=str, required=True,
+                       help='CSV of POIs with category, lat, lng columns')
+    parser.add_argument('--output', type=str, default='artifacts/poi',
+                       help='Directory to write the POI store')
+    parser.add_argument('--cell-size', type=float, default=250.0, help='Grid cell size in metres')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    store = POIStore.from_csv(args.input, cell_size_m=args.cell_size)
+    store.save(args.output)
+    logger.info(f"POI store saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+Model Registry
+Holds the active predictor and hot-swaps it when a new model is published. A background
+thread watches the artifacts directory (the bundle CURRENT pointer, or the legacy pickle
+files), loads the new version off the request path, validates it with smoke predictions
+and swaps the reference in one assignment. In-flight requests keep the predictor they
+already hold; its memory-mapped arrays stay valid after the swap.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from ml.artifacts import current_version
+
+logger = logging.getLogger(__name__)
+
+PICKLE_FILES = ('model.pkl', 'scaler.pkl', 'location_encoder.pkl', 'feature_names.pkl')
+
+# Central Bangalore reference properties every candidate model must price sensibly
+SMOKE_FEATURES = [
+    {'bhk': 2, 'sqft': 1100, 'bath': 2, 'lat': 12.9716, 'lng': 77.5946},
+    {'bhk': 3, 'sqft': 1600, 'bath': 3, 'lat': 12.9698, 'lng': 77.7500},
+]
+
+
+def artifacts_fingerprint(artifacts_dir: str) -> Optional[str]:
+    """
+    Identify the model currently published in artifacts_dir
+
+    The bundle version named by CURRENT, else the legacy pickles' modification times,
+    else None when nothing has been trained yet.
+    """
+    version = current_version(artifacts_dir)
+    if version:
+        return version
+    try:
+        mtime = max(os.stat(os.path.join(artifacts_dir, name)).st_mtime_ns for name in PICKLE_FILES)
+    except FileNotFoundError:
+        return None
+    return f"pickle-{mtime // 1_000_000}"
+
+
+def smoke_test(predictor) -> None:
+    """
+    Raise ValueError unless the predictor returns finite, consistent prices
+
+    The single-row and batch paths must agree, which also warms both before the first
+    real request reaches the new model.
+    """
+    singles = [predictor.predict(dict(row))['price_crore'] for row in SMOKE_FEATURES]
+    batch = np.asarray(predictor.predict_batch([dict(row) for row in SMOKE_FEATURES])['price_crore'])
+    if not np.isfinite(singles).all() or not np.isfinite(batch).all():
+        raise ValueError(f"Smoke prediction is not finite: {singles}")
+    if not np.allclose(singles, batch, atol=0.01):
+        raise ValueError(f"Single and batch smoke predictions disagree: {singles} vs {batch.tolist()}")
+
+
+class ModelRegistry:
+    """
+    Active predictor with background reload on new artifacts
+
+    Args:
+        artifacts_dir: Directory containing the bundle pointer or legacy pickles
+        loader: Callable building a predictor from artifacts_dir
+        poll_interval: Seconds between checks for a new model; 0 disables the watcher
+    """
+
+    def __init__(self, artifacts_dir: str = 'artifacts', loader: Optional[Callable[[str], Any]] = None,
+                 poll_interval: float = 5.0):
+        if loader is None:
+            from ml.inference import RealEstatePricePredictor
+            loader = RealEstatePricePredictor
+        self.artifacts_dir = artifacts_dir
+        self.loader = loader
+        self.poll_interval = poll_interval
+        self.predictor = None
+        self.loaded_at = None
+        self.reloads = 0
+        self.last_error = None
+        self._fingerprint = None
+        self._failed_fingerprint = None
+        self._listeners: List[Callable[[Any], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._fork_hook = False
+
+    @property
+    def version(self) -> Optional[str]:
+        return getattr(self.predictor, 'version', None)
+
+    def add_listener(self, listener: Callable[[Any], None]):
+        """Call listener(predictor) after every successful swap"""
+        self._listeners.append(listener)
+
+    def check(self) -> bool:
+        """
+        Load, validate and activate the published model if it changed
+
+        A version that fails to load or to pass the smoke test is logged and skipped
+        until the artifacts change again; the current predictor keeps serving.
+
+        Returns:
+            True if a new predictor was swapped in
+        """
+        with self._lock:
+            fingerprint = artifacts_fingerprint(self.artifacts_dir)
+            if fingerprint is None or fingerprint in (self._fingerprint, self._failed_fingerprint):
+                return False
+
+            start = time.perf_counter()
+            try:
+                candidate = self.loader(self.artifacts_dir)
+                if getattr(candidate, 'version', None) is None:
+                    candidate.version = fingerprint
+                smoke_test(candidate)
+            except Exception as e:
+                self._failed_fingerprint = fingerprint
+                self.last_error = f"{fingerprint}: {e}"
+                logger.error(f"Rejected model {fingerprint}: {e}")
+                return False
+
+            previous = self.version
+            self.predictor = candidate
+            self._fingerprint = fingerprint
+            self._failed_fingerprint = None
+            self.last_error = None
+            self.loaded_at = time.time()
+            if previous is not None:
+                self.reloads += 1
+            logger.info(f"Activated model {candidate.version} (was {previous}) "
+                        f"in {time.perf_counter() - start:.2f}s")
+
+        for listener in self._listeners:
+            listener(candidate)
+        return True
+
+    def start(self) -> 'ModelRegistry':
+        """Start the background watcher (restarted in forked workers)"""
+        if self.poll_interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name='model-registry', daemon=True)
+        self._thread.start()
+        if hasattr(os, 'register_at_fork') and not self._fork_hook:
+            # Threads do not survive fork, so each gunicorn worker needs its own watcher
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+            self._fork_hook = True
+        return self
+
+    def _restart_after_fork(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        if not self._stop.is_set():
+            self.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Model registry check failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'loaded_at': self.loaded_at,
+            'reloads': self.reloads,
+            'last_error': self.last_error,
+            'watching': self._thread is not None and self._thread.is_alive()
+        }
+
+
+# Process-wide registry used by the Flask app
+_registry = None
+
+
+def get_registry(artifacts_dir: str = 'artifacts') -> ModelRegistry:
+    """Get or create the global registry, loading the published model on first use"""
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry(artifacts_dir,
+                                  poll_interval=float(os.getenv('MODEL_RELOAD_INTERVAL', '5')))
+        _registry.check()
+    return _registry
@@ -0,0 +1,238 @@
+"""
+Segment Models
+A family of linear models, one per market segment (area_type and/or a coarse spatial
+grid cell), fitted next to the global model. All segments are stored as one stacked
+weight matrix and bias vector in raw feature space, so they load as two memory-mapped
+arrays shared by every gunicorn worker.
+
+Each row is routed by packing its segment into an int64 key (area type index above a
+GridIndex cell key) and finding it with a np.searchsorted. Rows without a segment model
+(unknown or missing area_type, or a segment too small to fit) fall back to the global
+model. Batches are grouped per segment so each segment model runs one mat-vec.
+"""
+
+import bisect
+import json
+import math
+import os
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from ml.spatial import GridIndex
+from ml.uncertainty import SegmentPredictionStats
+
+SEGMENTS_FILE = 'segments.json'
+ARRAY_NAMES = ['area_types', 'keys', 'weights', 'bias']
+
+SEGMENT_FIELDS = ('area_type', 'cell')
+DEFAULT_CELL_SIZE_M = 5000.0
+DEFAULT_MIN_ROWS = 200
+
+# Returned by route() for rows served by the global model
+NO_SEGMENT = -1
+
+# Distinct raw area_type spellings remembered by the router
+MAX_MEMO_ENTRIES = 1024
+
+# GridIndex cell keys stay below 2^42; the area type index is packed above them
+_AREA_SHIFT = 44
+_CELL_MASK = (1 << _AREA_SHIFT) - 1
+
+
+def normalize_area_type(value) -> str:
+    """Canonical area type: 'Super built-up  Area' -> 'super built-up'"""
+    text = ' '.join(str(value).lower().split())
+    return text[:-len(' area')] if text.endswith(' area') else text
+
+
+class SegmentModels:
+    """
+    Per-segment linear models with a vectorized router
+
+    Args:
+        by: Segment fields, a subset of SEGMENT_FIELDS
+        area_types: Sorted normalized area types seen in training
+        keys: Sorted packed segment keys, one per fitted segment
+        weights: (segments x features) raw-space weights, rows aligned with keys
+        bias: Per-segment intercepts
+        cell_size_m: Grid cell size when segmenting by cell
+        prediction_stats: Per-segment interval terms (None when not trained)
+    """
+
+    def __init__(self, by: Sequence[str], area_types: np.ndarray, keys: np.ndarray, weights: np.ndarray,
+                 bias: np.ndarray, cell_size_m: float = DEFAULT_CELL_SIZE_M,
+                 prediction_stats: Optional[SegmentPredictionStats] = None):
+        unknown = [field for field in by if field not in SEGMENT_FIELDS]
+        if unknown or not by:
+            raise ValueError(f"Segment fields must be a non-empty subset of {SEGMENT_FIELDS}, got {list(by)}")
+        self.by = tuple(field for field in SEGMENT_FIELDS if field in by)
+        # Plain ndarray views of (possibly memory-mapped) arrays skip np.memmap's per-index overhead
+        self.area_types = np.asarray(area_types)
+        self.keys = np.asarray(keys)
+        self.weights = np.asarray(weights)
+        self.bias = np.asarray(bias)
+        self.cell_size_m = float(cell_size_m)
+        self.prediction_stats = prediction_stats
+        self._grid = GridIndex(np.empty(0), np.empty(0), self.cell_size_m)
+        # Python-side copies of the small lookup tables for routing without array overhead
+        self._area_index = {name: i for i, name in enumerate(self.area_types.tolist())}
+        self._key_list = self.keys.tolist()
+        self._area_code_memo = {}
+
+    @classmethod
+    def fit(cls, X, y, area_type, lat, lng, by: Sequence[str] = ('area_type',),
+            cell_size_m: float = DEFAULT_CELL_SIZE_M, min_rows: int = DEFAULT_MIN_ROWS) -> 'SegmentModels':
+        """
+        Fit one least-squares model per segment with at least min_rows training rows
+
+        X is the raw (unscaled) training feature matrix; lat/lng are its coordinate columns.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        area_types = np.empty(0, dtype=str)
+        if 'area_type' in by:
+            names = {normalize_area_type(v) for v in np.unique(np.asarray(area_type, dtype=str))}
+            area_types = np.array(sorted(names - {'', 'nan', 'none'}), dtype=str)
+        segments = cls(by, area_types, np.empty(0, dtype=np.int64), np.empty((0, X.shape[1])), np.empty(0),
+                       cell_size_m)
+
+        keys, valid = segments.segment_keys(area_type, lat, lng)
+        keys, rows = keys[valid], np.flatnonzero(valid)
+        order = np.argsort(keys, kind='stable')
+        unique_keys, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+        fitted = counts >= min_rows
+
+        weights = np.empty((int(fitted.sum()), X.shape[1]))
+        bias = np.empty(len(weights))
+        for i, (start, count) in enumerate(zip(starts[fitted], counts[fitted])):
+            members = rows[order[start:start + count]]
+            X_s, y_s = X[members], y[members]
+            x_mean, y_mean = X_s.mean(axis=0), y_s.mean()
+            # Minimum-norm solution tolerates columns that are constant within a segment
+            weights[i] = np.linalg.lstsq(X_s - x_mean, y_s - y_mean, rcond=None)[0]
+            bias[i] = y_mean - weights[i] @ x_mean
+
+        return cls(by, area_types, unique_keys[fitted].astype(np.int64), weights, bias, cell_size_m)
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)),
+                    allow_pickle=False)
+        with open(os.path.join(directory, SEGMENTS_FILE), 'w') as f:
+            json.dump({'by': list(self.by), 'cell_size_m': self.cell_size_m, 'n_segments': len(self)}, f)
+        if self.prediction_stats is not None:
+            self.prediction_stats.save(os.path.join(directory, 'uncertainty'))
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'SegmentModels':
+        with open(os.path.join(directory, SEGMENTS_FILE)) as f:
+            meta = json.load(f)
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+                  for name in ARRAY_NAMES}
+        stats_dir = os.path.join(directory, 'uncertainty')
+        prediction_stats = None
+        if SegmentPredictionStats.exists(stats_dir):
+            prediction_stats = SegmentPredictionStats.load(stats_dir, mmap)
+        return cls(meta['by'], cell_size_m=meta['cell_size_m'], prediction_stats=prediction_stats, **arrays)
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.isfile(os.path.join(directory, SEGMENTS_FILE))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _area_code(self, value) -> int:
+        """Index into area_types of one raw value, -1 when missing or unseen in training"""
+        code = self._area_code_memo.get(value)
+        if code is None:
+            code = self._area_index.get(normalize_area_type(value), -1) if isinstance(value, str) else -1
+            # Raw spellings are few in practice; the cap bounds memory against arbitrary input
+            if len(self._area_code_memo) < MAX_MEMO_ENTRIES:
+                self._area_code_memo[value] = code
+        return code
+
+    def _area_codes(self, area_type, n_rows: int) -> np.ndarray:
+        """Area type index per row, -1 when missing or unseen in training"""
+        if area_type is None or not self._area_index:
+            return np.full(n_rows, -1, dtype=np.int64)
+        values = np.asarray(area_type, dtype=object).reshape(-1)
+        # Resolve each distinct value once, then map the column with dict.get (no Python frame per row)
+        lookup = self._area_code_memo
+        missing = set(values).difference(lookup)
+        if missing:
+            resolved = {value: self._area_code(value) for value in missing}
+            if not resolved.keys() <= lookup.keys():
+                lookup = {**lookup, **resolved}
+        return np.fromiter(map(lookup.get, values), dtype=np.int64, count=len(values))
+
+    def segment_keys(self, area_type, lat, lng) -> Tuple[np.ndarray, np.ndarray]:
+        """Packed segment key per row and whether the row has every field the key needs"""
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lng = np.atleast_1d(np.asarray(lng, dtype=np.float64))
+        keys = np.zeros(len(lat), dtype=np.int64)
+        valid = np.ones(len(lat), dtype=bool)
+        if 'area_type' in self.by:
+            codes = self._area_codes(area_type, len(lat))
+            valid &= codes >= 0
+            keys |= (np.maximum(codes, 0) + 1) << _AREA_SHIFT
+        if 'cell' in self.by:
+            finite = np.isfinite(lat) & np.isfinite(lng)
+            valid &= finite
+            keys |= np.where(finite, self._grid.cell_of(np.where(finite, lat, 0.0), np.where(finite, lng, 0.0)), 0)
+        return keys, valid
+
+    def route(self, area_type, lat, lng) -> np.ndarray:
+        """Segment index per row, or NO_SEGMENT for rows served by the global model"""
+        keys, valid = self.segment_keys(area_type, lat, lng)
+        if len(self.keys) == 0:
+            return np.full(len(keys), NO_SEGMENT, dtype=np.int64)
+        slot = np.searchsorted(self.keys, keys)
+        clipped = np.minimum(slot, len(self.keys) - 1)
+        found = valid & (slot < len(self.keys)) & (self.keys[clipped] == keys)
+        return np.where(found, clipped, NO_SEGMENT).astype(np.int64)
+
+    def route_one(self, area_type, lat: float, lng: float) -> int:
+        """route() for a single request, on Python scalars"""
+        key = 0
+        if 'area_type' in self.by:
+            code = self._area_code(area_type)
+            if code < 0:
+                return NO_SEGMENT
+            key |= (code + 1) << _AREA_SHIFT
+        if 'cell' in self.by:
+            if not (math.isfinite(lat) and math.isfinite(lng)):
+                return NO_SEGMENT
+            key |= int(self._grid.cell_of(lat, lng))
+        slot = bisect.bisect_left(self._key_list, key)
+        return slot if slot < len(self._key_list) and self._key_list[slot] == key else NO_SEGMENT
+
+    def predict(self, X: np.ndarray, segments: np.ndarray) -> np.ndarray:
+        """Prices for rows of X routed to segments (all >= 0), one mat-vec per segment"""
+        out = np.empty(len(X))
+        if len(X) == 1:
+            s = int(segments[0])
+            out[0] = X[0] @ self.weights[s] + self.bias[s]
+            return out
+        order = np.argsort(segments, kind='stable')
+        grouped = segments[order]
+        bounds = np.flatnonzero(np.diff(grouped)) + 1
+        for rows in np.split(order, bounds):
+            s = int(segments[rows[0]])
+            out[rows] = X[rows] @ self.weights[s] + self.bias[s]
+        return out
+
+    def label(self, segment: int) -> Optional[str]:
+        """Readable name of a segment, e.g. 'super built-up' or 'plot / cell 1234'"""
+        if segment < 0:
+            return None
+        key = int(self.keys[segment])
+        parts = []
+        if 'area_type' in self.by:
+            parts.append(str(self.area_types[(key >> _AREA_SHIFT) - 1]))
+        if 'cell' in self.by:
+            parts.append(f'cell {key & _CELL_MASK}')
+        return ' / '.join(parts)
@@ -0,0 +1,229 @@
+"""
+Spatial Grid Index
+Fixed-size grid over lat/lng points stored as flat, cell-sorted NumPy arrays.
+Answers radius counts, radius queries and k-nearest lookups for single points and
+vectorized batches without building per-worker Python objects, so the arrays can be
+saved as .npy files and memory-mapped at serve time.
+"""
+
+import json
+import os
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+# Cell coordinates are offset and packed into one int64 key per cell
+_CELL_OFFSET = 1 << 20
+_CELL_MULT = 1 << 21
+
+ARRAY_NAMES = ['lat', 'lng', 'order', 'cell_keys', 'cell_starts']
+
+
+def haversine_m(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """Great-circle distance in metres between arrays of points"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GridIndex:
+    """
+    Grid spatial index over a fixed point set
+
+    Points are bucketed into square cells of cell_size_m metres (equirectangular projection
+    around ref_lat) and stored sorted by cell key; cell lookups are a np.searchsorted.
+    """
+
+    def __init__(self, lat, lng, cell_size_m: float = 500.0, ref_lat: float = 12.9716):
+        lat = np.asarray(lat, dtype=np.float64).reshape(-1)
+        lng = np.asarray(lng, dtype=np.float64).reshape(-1)
+        if len(lat) != len(lng):
+            raise ValueError("lat and lng must have the same length")
+
+        self.cell_size_m = float(cell_size_m)
+        self.ref_lat = float(ref_lat)
+        self._set_projection()
+
+        keys = self._cell_keys(*self._cell_coords(lat, lng))
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        cell_keys, first = np.unique(sorted_keys, return_index=True)
+
+        self.lat = lat[order]
+        self.lng = lng[order]
+        self.order = order.astype(np.int64)
+        self.cell_keys = cell_keys.astype(np.int64)
+        self.cell_starts = np.append(first, len(order)).astype(np.int64)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: Dict) -> 'GridIndex':
+        """Rebuild an index from saved (possibly memory-mapped) arrays without re-sorting"""
+        index = cls.__new__(cls)
+        index.cell_size_m = float(meta['cell_size_m'])
+        index.ref_lat = float(meta['ref_lat'])
+        index._set_projection()
+        for name in ARRAY_NAMES:
+            setattr(index, name, arrays[name])
+        return index
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], Dict]:
+        """Return the arrays and metadata needed by from_arrays"""
+        arrays = {name: getattr(self, name) for name in ARRAY_NAMES}
+        meta = {'cell_size_m': self.cell_size_m, 'ref_lat': self.ref_lat, 'n_points': len(self)}
+        return arrays, meta
+
+    def save(self, directory: str):
+        """Write the index as .npy arrays plus a small JSON metadata file"""
+        os.makedirs(directory, exist_ok=True)
+        arrays, meta = self.to_arrays()
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(array))
+        self.save_meta(directory)
+
+    def save_meta(self, directory: str):
+        """Write only the metadata file, for arrays already written in place"""
+        _, meta = self.to_arrays()
+        with open(os.path.join(directory, 'index.json'), 'w') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'GridIndex':
+        """Load an index written by save, memory-mapping the arrays by default"""
+        with open(os.path.join(directory, 'index.json')) as f:
+            meta = json.load(f)
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in ARRAY_NAMES}
+        return cls.from_arrays(arrays, meta)
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _set_projection(self):
+        self._m_per_deg_lat = np.pi * EARTH_RADIUS_M / 180.0
+        self._m_per_deg_lng = self._m_per_deg_lat * np.cos(np.radians(self.ref_lat))
+
+    def _cell_coords(self, lat, lng) -> Tuple[np.ndarray, np.ndarray]:
+        cx = np.floor(np.asarray(lng) * self._m_per_deg_lng / self.cell_size_m).astype(np.int64)
+        cy = np.floor(np.asarray(lat) * self._m_per_deg_lat / self.cell_size_m).astype(np.int64)
+        return cx, cy
+
+    @staticmethod
+    def _cell_keys(cx, cy) -> np.ndarray:
+        return (cx + _CELL_OFFSET) * _CELL_MULT + (cy + _CELL_OFFSET)
+
+    def cell_of(self, lat, lng) -> np.ndarray:
+        """Packed int64 key of the grid cell containing each point"""
+        return self._cell_keys(*self._cell_coords(lat, lng))
+
+    def _candidates(self, lat, lng, rings: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (query index, sorted point position) pairs for every point in the
+        (2 * rings + 1)^2 block of cells around each query
+        """
+        cx, cy = self._cell_coords(lat, lng)
+        n_cells = len(self.cell_keys)
+
+        # Keys of every neighbouring cell for every query, looked up in one searchsorted
+        span = np.arange(-rings, rings + 1)
+        dx, dy = np.meshgrid(span, span, indexing='ij')
+        keys = self._cell_keys(cx[:, None] + dx.ravel(), cy[:, None] + dy.ravel()).ravel()
+        slot = np.searchsorted(self.cell_keys, keys)
+        slot_clipped = np.minimum(slot, n_cells - 1)
+        found = (slot < n_cells) & (self.cell_keys[slot_clipped] == keys)
+        if not found.any():
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+        q = np.repeat(np.arange(len(cx)), len(span) ** 2)[found]
+        slot = slot[found]
+        starts = self.cell_starts[slot]
+        lengths = self.cell_starts[slot + 1] - starts
+        total = int(lengths.sum())
+        # Expand each [start, end) range into explicit positions without a Python loop
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.arange(total) - np.repeat(offsets, lengths) + np.repeat(starts, lengths)
+        return np.repeat(q, lengths), positions
+
+    def _rings_for(self, radius_m: float) -> int:
+        # 1% slack absorbs projection error away from ref_lat
+        return max(1, int(np.ceil(radius_m * 1.01 / self.cell_size_m)))
+
+    def count_within(self, lat, lng, radius_m: float) -> np.ndarray:
+        """Count indexed points within radius_m metres of each query point"""
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lng = np.atleast_1d(np.asarray(lng, dtype=np.float64))
+        if len(self) == 0:
+            return np.zeros(len(lat), dtype=np.int64)
+        q, pos = self._candidates(lat, lng, self._rings_for(radius_m))
+        within = haversine_m(lat[q], lng[q], self.lat[pos], self.lng[pos]) <= radius_m
+        return np.bincount(q[within], minlength=len(lat))
+
+    def query_radius(self, lat: float, lng: float, radius_m: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Return original point indices and distances within radius_m of one point, nearest first"""
+        lat_arr = np.array([lat], dtype=np.float64)
+        lng_arr = np.array([lng], dtype=np.float64)
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        _, pos = self._candidates(lat_arr, lng_arr, self._rings_for(radius_m))
+        distances = haversine_m(lat, lng, self.lat[pos], self.lng[pos])
+        keep = distances <= radius_m
+        pos, distances = pos[keep], distances[keep]
+        ranked = np.argsort(distances, kind='stable')
+        return self.order[pos[ranked]], distances[ranked]
+
+    def nearest(self, lat, lng, k: int = 1, max_radius_m: float = 50000.0,
+                where: Optional[Callable[[np.ndarray], np.ndarray]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest indexed points to each query point
+
+        Returns (indices, distances) of shape (n_queries, k); slots with no point within
+        max_radius_m are -1 / inf. The search widens the cell block until the k-th
+        candidate is provably closer than the unsearched cells. where(indices), if given,
+        returns a boolean mask over original point indices; only points passing it are
+        considered, and it is evaluated on the candidates alone, never the full point set.
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lng = np.atleast_1d(np.asarray(lng, dtype=np.float64))
+        n = len(lat)
+        indices = np.full((n, k), -1, dtype=np.int64)
+        distances = np.full((n, k), np.inf)
+        if len(self) == 0 or n == 0:
+            return indices, distances
+
+        pending = np.arange(n)
+        rings = 1
+        while len(pending):
+            q, pos = self._candidates(lat[pending], lng[pending], rings)
+            if where is not None and len(pos):
+                keep = where(self.order[pos])
+                q, pos = q[keep], pos[keep]
+            dist = haversine_m(lat[pending][q], lng[pending][q], self.lat[pos], self.lng[pos])
+            # Sort candidates by query, then distance; keep the first k per query
+            ranked = np.lexsort((dist, q))
+            q, pos, dist = q[ranked], pos[ranked], dist[ranked]
+            group_start = np.searchsorted(q, np.arange(len(pending)))
+            rank = np.arange(len(q)) - group_start[q]
+            top = rank < k
+
+            covered_m = rings * self.cell_size_m
+            kth = np.full(len(pending), np.inf)
+            counts = np.bincount(q, minlength=len(pending))
+            has_k = counts >= k
+            kth[has_k] = dist[group_start[has_k] + k - 1]
+            done = (kth <= covered_m) | (covered_m >= max_radius_m)
+
+            sel = top & done[q]
+            rows = pending[q[sel]]
+            indices[rows, rank[sel]] = self.order[pos[sel]]
+            distances[rows, rank[sel]] = dist[sel]
+
+            pending = pending[~done]
+            rings *= 2
+
+        too_far = distances > max_radius_m
+        indices[too_far] = -1
+        distances[too_far] = np.inf
+        return indices, distances
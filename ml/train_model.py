@@ -6,6 +6,9 @@ Loads household.csv, performs feature engineering, and trains a Linear Regressio
 
 import argparse
 import os
+import shutil
+import sys
+import tempfile
 import pandas as pd
 import numpy as np
 from sklearn.linear_model import LinearRegression
@@ -15,69 +18,250 @@ from sklearn.metrics import mean_absolute_error, r2_score
 import joblib
 import logging
 
+# Allow running as a script: python ml/train_model.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ml.artifacts import bundle_dir, write_bundle
+from ml.feature_cache import DEFAULT_CACHE_DIR, FeatureCache
+from ml.comparables import ComparablesBuilder, ComparablesStore
+from ml.locality import LocalityIndex
+from ml.poi_store import FEATURE_PREFIX, POIStore
+from ml.segments import DEFAULT_CELL_SIZE_M, DEFAULT_MIN_ROWS, SEGMENT_FIELDS, SegmentModels
+from ml.uncertainty import INTERVAL_QUANTILES, PredictionStats, SegmentPredictionStats
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def load_and_preprocess_data(data_path: str, seed: int = 42):
-    """Load and preprocess the household data"""
-    logger.info(f"Loading data from {data_path}")
-    df = pd.read_csv(data_path)
+# Bump whenever cleaning or feature engineering changes its output, to invalidate cached frames
+PREPROCESSING_VERSION = 2
+
+# Raw CSV dtypes: repeated strings as categoricals, numerics pinned so every chunk agrees
+CATEGORICAL_COLUMNS = ['area_type', 'availability', 'location', 'size', 'society']
+CSV_DTYPES = {
+    **{col: 'category' for col in CATEGORICAL_COLUMNS},
+    'total_sqft': 'category',
+    'bath': 'float64',
+    'balcony': 'float64',
+    'price': 'float64',
+}
+
+# Square feet per unit for suffixed total_sqft values such as "34.46Sq. Meter"
+SQFT_PER_UNIT = {
+    'sq. meter': 10.7639,
+    'sq. yards': 9.0,
+    'acres': 43560.0,
+    'cents': 435.6,
+    'guntha': 1089.0,
+    'perch': 272.25,
+    'grounds': 2400.0,
+}
+
+def _per_category(values: pd.Series, parse) -> pd.Series:
+    """Apply a string parser once per distinct value and broadcast the result by category code"""
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype('category')
+    parsed = parse(pd.Series(values.cat.categories.astype(str))).to_numpy(dtype=np.float64)
+    codes = values.cat.codes.to_numpy()
+    result = np.full(len(codes), np.nan)
+    present = codes >= 0
+    result[present] = parsed[codes[present]]
+    return pd.Series(result, index=values.index)
+
+def _parse_sqft_strings(text: pd.Series, convert_units: bool) -> pd.Series:
+    text = text.str.strip()
+    value = pd.to_numeric(text, errors='coerce').astype(np.float64)
+    
+    # Ranges like "1133 - 1384" take the midpoint
+    is_range = text.str.contains('-', regex=False)
+    if is_range.any():
+        parts = text[is_range].str.split('-', n=2, expand=True)
+        low = pd.to_numeric(parts[0].str.strip(), errors='coerce')
+        high = pd.to_numeric(parts[1].str.strip(), errors='coerce')
+        value[is_range] = (low + high) / 2
     
+    if convert_units:
+        suffixed = value.isna() & ~is_range
+        if suffixed.any():
+            match = text[suffixed].str.extract(r'^([\d.]+)\s*([A-Za-z][A-Za-z. ]*)$')
+            factor = match[1].str.lower().str.strip().map(SQFT_PER_UNIT)
+            value[suffixed] = pd.to_numeric(match[0], errors='coerce') * factor
+    return value
+
+def parse_total_sqft(values: pd.Series, convert_units: bool = False) -> pd.Series:
+    """
+    Parse total_sqft strings to square feet
+    
+    Plain numbers pass through and ranges ("1133 - 1384") become their midpoint. Values with
+    a unit suffix ("34.46Sq. Meter", "5.31Acres") are converted when convert_units is set and
+    are NaN otherwise, as is anything unparseable.
+    """
+    return _per_category(values, lambda text: _parse_sqft_strings(text, convert_units))
+
+def extract_bhk(size: pd.Series) -> pd.Series:
+    """Bedroom count from size strings like "2 BHK" or "4 Bedroom" (NaN if absent)"""
+    return _per_category(size, lambda text: text.str.extract(r'(\d+)')[0].astype(float))
+
+def _clean_chunk(df, convert_units: bool):
     # Basic data cleaning
     df = df.dropna(subset=['price', 'total_sqft', 'bath'])
     
     # Extract BHK from size column
-    df['bhk'] = df['size'].str.extract('(\d+)').astype(float)
+    df['bhk'] = extract_bhk(df['size'])
     df = df.dropna(subset=['bhk'])
     
     # Clean total_sqft - handle ranges by taking average
-    def clean_sqft(x):
-        if pd.isna(x):
-            return np.nan
-        if isinstance(x, str):
-            if '-' in x:
-                parts = x.split('-')
-                try:
-                    return (float(parts[0]) + float(parts[1])) / 2
-                except:
-                    return np.nan
-            else:
-                try:
-                    return float(x)
-                except:
-                    return np.nan
-        return float(x)
-    
-    df['total_sqft'] = df['total_sqft'].apply(clean_sqft)
-    df = df.dropna(subset=['total_sqft'])
-    
-    # Add dummy lat/lng for locations (in production, these would come from HERE API)
-    # For now, use Bangalore center with small random variations
+    df['total_sqft'] = parse_total_sqft(df['total_sqft'], convert_units)
+    return df.dropna(subset=['total_sqft'])
+
+def _concat_chunks(chunks):
+    """Concatenate cleaned chunks, keeping categorical columns categorical"""
+    if len(chunks) == 1:
+        return chunks[0]
+    for col in CATEGORICAL_COLUMNS:
+        if col in chunks[0].columns:
+            categories = pd.api.types.union_categoricals([c[col] for c in chunks]).categories
+            chunks = [c.assign(**{col: c[col].cat.set_categories(categories)}) for c in chunks]
+    return pd.concat(chunks)
+
+def _encode_locations(location: pd.Series, encoder: LabelEncoder = None):
+    """
+    Label-encode a categorical location column (missing values as 'Unknown')
+
+    Without an encoder this matches LabelEncoder().fit_transform; with one, its classes_
+    are reused and must cover every location present.
+    """
+    location = location.cat.remove_unused_categories()
+    if location.isna().any():
+        if 'Unknown' not in location.cat.categories:
+            location = location.cat.add_categories(['Unknown'])
+        location = location.fillna('Unknown')
+    categories = location.cat.categories.astype(str)
+    if encoder is None:
+        encoder = LabelEncoder()
+        encoder.classes_ = np.array(sorted(categories), dtype=object)
+    classes = encoder.classes_
+    rank = pd.Series(np.arange(len(classes)), index=classes)[categories].to_numpy()
+    return rank[location.cat.codes.to_numpy()], encoder
+
+def iter_clean_chunks(data_path: str, chunksize: int = 200_000, convert_units: bool = False):
+    """Yield cleaned chunks of the household CSV in file order"""
+    for chunk in pd.read_csv(data_path, dtype=CSV_DTYPES, chunksize=chunksize):
+        yield _clean_chunk(chunk, convert_units)
+
+def read_coordinates(coordinates_path: str):
+    """Load the locality -> coordinates table indexed by location, or None if absent"""
+    if not coordinates_path or not os.path.exists(coordinates_path):
+        return None
+    coords = pd.read_csv(coordinates_path, usecols=['location', 'lat', 'lng'])
+    coords = coords.dropna().drop_duplicates(subset=['location'], keep='last')
+    return coords.set_index('location')
+
+def join_coordinates(df, coords) -> int:
+    """Overwrite lat/lng with geocoded coordinates by location; returns the rows updated"""
+    key = df['location'].str.strip()
+    geocoded_lat = key.map(coords['lat'])
+    geocoded_lng = key.map(coords['lng'])
+    has_coords = geocoded_lat.notna()
+    df.loc[has_coords, 'lat'] = geocoded_lat[has_coords]
+    df.loc[has_coords, 'lng'] = geocoded_lng[has_coords]
+    return int(has_coords.sum())
+
+def geocoded_rows(df, coords) -> np.ndarray:
+    """Mask of rows whose lat/lng join_coordinates took from the table (not fallback jitter)"""
+    if coords is None:
+        return np.zeros(len(df), dtype=bool)
+    return df['location'].str.strip().isin(coords.index).to_numpy(dtype=bool)
+
+def _warn_no_coordinates(coordinates_path):
+    logger.warning(f"No locality coordinates table at {coordinates_path}: lat/lng are random jitter around "
+                   "the city centre, and location_encoded is resolved from locality names only "
+                   "(run ml/geocode_localities.py to build the table)")
+
+def load_and_preprocess_data(data_path: str, seed: int = 42, coordinates_path: str = None,
+                             chunksize: int = 200_000, convert_units: bool = False):
+    """
+    Load and preprocess the household data
+    
+    The CSV is read in chunks of chunksize rows with categorical string columns, and each
+    chunk is filtered before the next is read, so memory stays proportional to the cleaned
+    output. convert_units keeps unit-suffixed total_sqft rows (converted to square feet)
+    instead of dropping them.
+    
+    If coordinates_path points to a locality -> coordinates table (see ml/geocode_localities.py),
+    lat/lng are joined in by location. Rows without geocoded coordinates fall back to
+    jitter around the Bangalore centre.
+    """
+    logger.info(f"Loading data from {data_path}")
+    df = _concat_chunks(list(iter_clean_chunks(data_path, chunksize, convert_units)))
+    
+    # Fallback lat/lng: Bangalore center with small random variations
     np.random.seed(seed)
     df['lat'] = 12.9716 + np.random.normal(0, 0.1, len(df))
     df['lng'] = 77.5946 + np.random.normal(0, 0.1, len(df))
     
+    # Join real coordinates from the geocoded locality table when available
+    coords = read_coordinates(coordinates_path)
+    if coords is not None:
+        joined = join_coordinates(df, coords)
+        logger.info(f"Joined geocoded coordinates for {joined}/{len(df)} rows")
+    else:
+        _warn_no_coordinates(coordinates_path)
+    
     # Encode location for additional features
-    location_encoder = LabelEncoder()
-    df['location_encoded'] = location_encoder.fit_transform(df['location'].fillna('Unknown'))
+    location_codes, location_encoder = _encode_locations(df['location'])
+    df['location_encoded'] = location_codes
     
     logger.info(f"Data shape after preprocessing: {df.shape}")
     return df, location_encoder
 
-def prepare_features(df):
+def add_poi_features(df, poi_store: POIStore):
+    """Add poi_<category> amenity counts around each property from the local POI store"""
+    counts = poi_store.count_batch(df['lat'].to_numpy(), df['lng'].to_numpy())
+    for name, values in counts.items():
+        df[name] = values
+    logger.info(f"Added POI features: {list(counts)}")
+    return df
+
+BASE_FEATURES = ['bhk', 'total_sqft', 'bath', 'lat', 'lng', 'location_encoded']
+
+def feature_columns(columns):
+    """Model feature columns: the base features followed by sorted poi_* amenity counts"""
+    return BASE_FEATURES + sorted(c for c in columns if c.startswith(FEATURE_PREFIX))
+
+def build_locality_index(location_classes, X, geocoded) -> LocalityIndex:
+    """
+    Locality index placing each locality at the centroid of its geocoded rows
+
+    Rows with jittered fallback coordinates are left out, so localities without geocoded
+    coordinates can only be matched by name and unmatched requests keep location_encoded 0.
+    """
+    rows = X[np.asarray(geocoded, dtype=bool)]
+    index = LocalityIndex.from_rows(location_classes, rows['location_encoded'], rows['lat'], rows['lng'])
+    logger.info(f"Locality index places {len(index.codes)} localities from {len(rows)} geocoded rows")
+    return index
+
+def build_comparables(X, y, location_classes) -> ComparablesStore:
+    """Comparable-listings store over the cleaned, outlier-filtered training rows"""
+    store = ComparablesStore.from_columns(y, X['total_sqft'], X['bhk'], X['bath'], X['lat'], X['lng'],
+                                          X['location_encoded'], location_classes)
+    logger.info(f"Built comparables store with {len(store)} listings")
+    return store
+
+def outlier_bounds(q1: float, q3: float, iqr_multiplier: float = 1.5):
+    """Price bounds for the IQR outlier rule"""
+    iqr = q3 - q1
+    return q1 - iqr_multiplier * iqr, q3 + iqr_multiplier * iqr
+
+def prepare_features(df, iqr_multiplier: float = 1.5):
     """Prepare feature matrix and target vector"""
     # Select features for the model
-    feature_cols = ['bhk', 'total_sqft', 'bath', 'lat', 'lng', 'location_encoded']
+    feature_cols = feature_columns(df.columns)
     X = df[feature_cols].copy()
     y = df['price'].copy()
     
     # Remove outliers (simple approach)
-    Q1 = y.quantile(0.25)
-    Q3 = y.quantile(0.75)
-    IQR = Q3 - Q1
-    lower_bound = Q1 - 1.5 * IQR
-    upper_bound = Q3 + 1.5 * IQR
+    lower_bound, upper_bound = outlier_bounds(y.quantile(0.25), y.quantile(0.75), iqr_multiplier)
     
     mask = (y >= lower_bound) & (y <= upper_bound)
     X = X[mask]
@@ -87,7 +271,13 @@ def prepare_features(df):
     return X, y
 
 def train_model(X, y, seed=42):
-    """Train the Linear Regression model"""
+    """
+    Train the Linear Regression model
+    
+    Returns:
+        Tuple of (model, scaler, mae, r2, prediction_stats), where prediction_stats holds
+        the hold-out residual quantiles and training leverage terms for price intervals
+    """
     # Split data
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=seed
@@ -111,11 +301,405 @@ def train_model(X, y, seed=42):
     logger.info(f"  MAE: {mae:.2f}")
     logger.info(f"  R²: {r2:.3f}")
     
-    return model, scaler, mae, r2
+    prediction_stats = PredictionStats.from_training(X_train, np.asarray(y_test) - y_pred)
+    return model, scaler, mae, r2, prediction_stats
+
+def train_segments(X, y, area_type, model, scaler, seed=42, by=('area_type',),
+                   cell_size_m: float = DEFAULT_CELL_SIZE_M, min_rows: int = DEFAULT_MIN_ROWS):
+    """
+    Fit per-segment models on the same split as train_model
+
+    Segments are area_type and/or grid cells (see ml/segments.py); hold-out rows without a
+    segment model are scored by the global model, as at serving time.
+    
+    Each segment's hold-out residuals and training leverage terms are kept on
+    segment_models.prediction_stats for its price intervals.
+    
+    Returns:
+        Tuple of (segment_models, routed hold-out MAE), segment_models being None when no
+        segment reached min_rows training rows
+    """
+    X_train, X_test, y_train, y_test, area_train, area_test = train_test_split(
+        X, y, np.asarray(area_type, dtype=object), test_size=0.2, random_state=seed
+    )
+    segments = SegmentModels.fit(X_train, y_train, area_train, X_train['lat'], X_train['lng'], by,
+                                 cell_size_m, min_rows)
+    if len(segments) == 0:
+        logger.info(f"No segment by {list(by)} has {min_rows} training rows; serving the global model only")
+        return None, None
+    
+    y_pred = model.predict(scaler.transform(X_test))
+    routed = segments.route(area_test, X_test['lat'], X_test['lng'])
+    has_segment = routed >= 0
+    y_pred[has_segment] = segments.predict(X_test.to_numpy(dtype=np.float64)[has_segment], routed[has_segment])
+    mae = mean_absolute_error(y_test, y_pred)
+    
+    # Interval terms per segment, so routed ranges are sized from the segment model's own errors
+    segments.prediction_stats = SegmentPredictionStats.from_training(
+        X_train, segments.route(area_train, X_train['lat'], X_train['lng']),
+        np.asarray(y_test) - y_pred, routed, len(segments))
+    logger.info(f"Segment models by {list(segments.by)}: {len(segments)} segments covering "
+                f"{has_segment.mean():.1%} of hold-out rows, routed MAE {mae:.2f}")
+    return segments, mae
+
+def preprocess(data_path: str, seed: int = 42, coordinates_path: str = None, poi_path: str = None,
+               poi_store: POIStore = None, chunksize: int = 200_000, convert_units: bool = False,
+               cache_dir: str = DEFAULT_CACHE_DIR):
+    """
+    load_and_preprocess_data -> add_poi_features -> prepare_features, memoized on disk
+
+    The cache key covers the content of the CSV, coordinates table and POI source, the seed,
+    convert_units and PREPROCESSING_VERSION, so a hit is only possible when the output would
+    be identical. cache_dir=None disables the cache.
+
+    Returns:
+        Tuple of (df, location_encoder, X, y)
+    """
+    cache = key = None
+    if cache_dir:
+        cache = FeatureCache(cache_dir)
+        key = cache.key(data=cache.digest(data_path), coordinates=cache.digest(coordinates_path),
+                        poi=cache.digest(poi_path) if poi_store is not None else None,
+                        seed=seed, convert_units=convert_units, version=PREPROCESSING_VERSION)
+        cached = cache.load(key)
+        if cached is not None:
+            df, location_encoder, rows = cached
+            logger.info(f"Loaded preprocessed features from cache {key} ({len(df)} rows)")
+            X = df.iloc[rows][feature_columns(df.columns)]
+            return df, location_encoder, X, df['price'].iloc[rows]
+
+    df, location_encoder = load_and_preprocess_data(data_path, seed, coordinates_path, chunksize, convert_units)
+    if poi_store is not None:
+        df = add_poi_features(df, poi_store)
+    X, y = prepare_features(df)
+    if cache is not None:
+        cache.save(key, df, location_encoder, df.index.get_indexer(X.index))
+        logger.info(f"Cached preprocessed features as {key}")
+    return df, location_encoder, X, y
+
+class _Moments:
+    """Running mean and centred cross-product matrix of row blocks, merged pairwise (Chan et al.)"""
+
+    def __init__(self, dim: int):
+        self.n = 0
+        self.mean = np.zeros(dim)
+        self.m2 = np.zeros((dim, dim))
+
+    def update(self, block: np.ndarray):
+        n_block = len(block)
+        if n_block == 0:
+            return
+        block_mean = block.mean(axis=0)
+        centred = block - block_mean
+        delta = block_mean - self.mean
+        n = self.n + n_block
+        self.m2 += centred.T @ centred + np.outer(delta, delta) * (self.n * n_block / n)
+        self.mean += delta * (n_block / n)
+        self.n = n
+
+def _quantile_from_counts(counts: pd.Series, q: float) -> float:
+    """Linearly interpolated quantile (as pd.Series.quantile) from value -> count tallies"""
+    counts = counts.sort_index()
+    cumulative = counts.to_numpy().cumsum()
+    values = counts.index.to_numpy(dtype=np.float64)
+    position = (cumulative[-1] - 1) * q
+    low = int(np.floor(position))
+    high = min(low + 1, int(cumulative[-1]) - 1)
+    x_low = values[np.searchsorted(cumulative, low, side='right')]
+    x_high = values[np.searchsorted(cumulative, high, side='right')]
+    return float(x_low + (position - low) * (x_high - x_low))
+
+_GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+def holdout_mask(ordinals, seed: int = 42, test_size: float = 0.2) -> np.ndarray:
+    """
+    Deterministic hold-out assignment per row, hashed from the row's ordinal and the seed
+
+    Unlike train_test_split this needs no permutation of all rows, so it can be applied
+    chunk by chunk.
+    """
+    x = np.asarray(ordinals, dtype=np.uint64) + np.uint64((seed * _GOLDEN_GAMMA) & 0xFFFFFFFFFFFFFFFF)
+    # splitmix64 finaliser
+    x ^= x >> np.uint64(30)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(27)
+    x *= np.uint64(0x94D049BB133111EB)
+    x ^= x >> np.uint64(31)
+    return (x >> np.uint64(11)).astype(np.float64) * 2.0 ** -53 < test_size
+
+class StreamingTrainer:
+    """
+    Out-of-core training over CSV chunks with memory independent of row count
+
+    Mirrors load_and_preprocess_data -> prepare_features -> train_model in three passes:
+    1. count cleaned rows, collect locations and tally prices for the outlier quantiles
+    2. fit the scaler with partial_fit and accumulate the normal-equation moments of the
+       training rows, then solve for the linear model
+    3. evaluate MAE and R² on the hold-out rows
+    The hold-out set comes from holdout_mask rather than train_test_split.
+    """
+
+    def __init__(self, data_path: str, seed: int = 42, coordinates_path: str = None,
+                 poi_store: POIStore = None, chunksize: int = 200_000, convert_units: bool = False,
+                 test_size: float = 0.2):
+        self.data_path = data_path
+        self.seed = seed
+        self.coords = read_coordinates(coordinates_path)
+        if self.coords is None:
+            _warn_no_coordinates(coordinates_path)
+        self.poi_store = poi_store
+        self.chunksize = chunksize
+        self.convert_units = convert_units
+        self.test_size = test_size
+        self.feature_names = feature_columns(poi_store.feature_names if poi_store is not None else [])
+
+    def _chunks(self):
+        return iter_clean_chunks(self.data_path, self.chunksize, self.convert_units)
+
+    def scan(self):
+        """Pass 1: row count, location encoder and price outlier bounds"""
+        n_rows = 0
+        locations = set()
+        has_missing_location = False
+        price_counts = pd.Series(dtype=np.float64)
+        for chunk in self._chunks():
+            n_rows += len(chunk)
+            locations.update(chunk['location'].dropna().astype(str).unique())
+            has_missing_location |= bool(chunk['location'].isna().any())
+            price_counts = price_counts.add(chunk['price'].value_counts(), fill_value=0)
+        if has_missing_location:
+            locations.add('Unknown')
+
+        self.n_rows = n_rows
+        self.location_encoder = LabelEncoder()
+        self.location_encoder.classes_ = np.array(sorted(locations), dtype=object)
+        self.bounds = outlier_bounds(_quantile_from_counts(price_counts, 0.25),
+                                     _quantile_from_counts(price_counts, 0.75))
+        logger.info(f"Scanned {n_rows} rows, {len(locations)} locations; price bounds {self.bounds}")
+
+    def _feature_chunks(self):
+        """
+        Yield (X, y, is_test, geocoded) per chunk with the same features as the in-memory path
+
+        geocoded marks rows whose coordinates came from the coordinates table.
+        """
+        # Same noise as load_and_preprocess_data: all lat draws, then all lng draws
+        lat_rng = np.random.RandomState(self.seed)
+        lng_rng = np.random.RandomState(self.seed)
+        for start in range(0, self.n_rows, self.chunksize):
+            lng_rng.normal(0, 0.1, min(self.chunksize, self.n_rows - start))
+
+        offset = 0
+        for chunk in self._chunks():
+            n = len(chunk)
+            chunk['lat'] = 12.9716 + lat_rng.normal(0, 0.1, n)
+            chunk['lng'] = 77.5946 + lng_rng.normal(0, 0.1, n)
+            if self.coords is not None:
+                join_coordinates(chunk, self.coords)
+            geocoded = geocoded_rows(chunk, self.coords)
+            location_codes, _ = _encode_locations(chunk['location'], self.location_encoder)
+            chunk['location_encoded'] = location_codes
+            if self.poi_store is not None:
+                chunk = add_poi_features(chunk, self.poi_store)
+
+            ordinals = np.arange(offset, offset + n)
+            offset += n
+            y = chunk['price'].to_numpy(dtype=np.float64)
+            keep = (y >= self.bounds[0]) & (y <= self.bounds[1])
+            X = chunk[self.feature_names].to_numpy(dtype=np.float64)[keep]
+            yield X, y[keep], holdout_mask(ordinals[keep], self.seed, self.test_size), geocoded[keep]
+
+    def fit(self):
+        """Pass 2: scaler and linear model from accumulated training-row moments"""
+        scaler = StandardScaler()
+        moments = _Moments(len(self.feature_names) + 1)
+        n_classes = len(self.location_encoder.classes_)
+        lat_col, lng_col, code_col = (self.feature_names.index(c) for c in ('lat', 'lng', 'location_encoded'))
+        counts, sum_lat, sum_lng = np.zeros(n_classes), np.zeros(n_classes), np.zeros(n_classes)
+        # Listings are spilled to disk chunk by chunk and cell-sorted there, keeping memory flat
+        self._work_dir = tempfile.TemporaryDirectory(prefix='comparables-')
+        listings = ComparablesBuilder(self._work_dir.name, self.location_encoder.classes_)
+        sqft_col, bhk_col, bath_col = (self.feature_names.index(c) for c in ('total_sqft', 'bhk', 'bath'))
+        for X, y, is_test, geocoded in self._feature_chunks():
+            listings.add(y, X[:, sqft_col], X[:, bhk_col], X[:, bath_col], X[:, lat_col], X[:, lng_col],
+                         X[:, code_col])
+            # Locality centroids only from real coordinates, as build_locality_index
+            codes = X[geocoded, code_col].astype(np.int64)
+            counts += np.bincount(codes, minlength=n_classes)
+            sum_lat += np.bincount(codes, weights=X[geocoded, lat_col], minlength=n_classes)
+            sum_lng += np.bincount(codes, weights=X[geocoded, lng_col], minlength=n_classes)
+            train = ~is_test
+            if train.any():
+                scaler.partial_fit(X[train])
+                moments.update(np.column_stack([X[train], y[train]]))
+        self.locality_index = LocalityIndex.from_sums(self.location_encoder.classes_, counts, sum_lat, sum_lng)
+        self.comparables = listings.build()
+        logger.info(f"Built comparables store with {len(self.comparables)} listings")
+
+        self.moments = moments
+        d = len(self.feature_names)
+        weights = np.linalg.lstsq(moments.m2[:d, :d], moments.m2[:d, d], rcond=None)[0]
+        # Express the fit in the scaler's standardized space, as train_model does
+        model = LinearRegression()
+        model.coef_ = weights * scaler.scale_
+        model.intercept_ = float(moments.mean[d] + weights @ (scaler.mean_ - moments.mean[:d]))
+        model.n_features_in_ = d
+        logger.info(f"Fitted streaming model on {moments.n} training rows")
+        return model, scaler
+
+    def evaluate(self, model, scaler):
+        """Pass 3: hold-out MAE and R², and the residual tallies for prediction intervals"""
+        abs_error = 0.0
+        squared_error = 0.0
+        target = _Moments(1)
+        # Residuals rounded to 0.01 lakh keep the tally bounded regardless of row count
+        residual_counts = pd.Series(dtype=np.float64)
+        for X, y, is_test, _ in self._feature_chunks():
+            if not is_test.any():
+                continue
+            residual = y[is_test] - model.predict(scaler.transform(X[is_test]))
+            abs_error += float(np.abs(residual).sum())
+            squared_error += float(residual @ residual)
+            target.update(y[is_test, None])
+            residual_counts = residual_counts.add(pd.Series(np.round(residual, 2)).value_counts(), fill_value=0)
+        self.residual_counts = residual_counts
+        mae = abs_error / target.n
+        r2 = 1.0 - squared_error / float(target.m2[0, 0])
+        logger.info(f"Model Performance:")
+        logger.info(f"  MAE: {mae:.2f}")
+        logger.info(f"  R²: {r2:.3f}")
+        return mae, r2
+
+    def run(self):
+        """Run all passes; returns (model, scaler, location_encoder, mae, r2)
+
+        The locality index and comparables store built during the fit pass are left on
+        self.locality_index and self.comparables, and the prediction interval terms on
+        self.prediction_stats. The comparables store is memory-mapped from a temporary
+        directory removed with the trainer, so save it before dropping the trainer.
+        """
+        self.scan()
+        model, scaler = self.fit()
+        mae, r2 = self.evaluate(model, scaler)
+        d = len(self.feature_names)
+        self.prediction_stats = PredictionStats.from_moments(
+            self.moments.n, self.moments.mean[:d], self.moments.m2[:d, :d],
+            [_quantile_from_counts(self.residual_counts, q) for q in INTERVAL_QUANTILES])
+        return model, scaler, self.location_encoder, mae, r2
+
+def save_artifacts(model, scaler, location_encoder, feature_names, artifacts_dir, poi_store=None,
+                   artifact_format='bundle', training_info=None, locality_index=None, prediction_stats=None,
+                   comparables=None, segment_models=None):
+    """
+    Save model and preprocessing artifacts
+    
+    artifact_format selects 'bundle' (versioned manifest + memory-mappable .npy arrays),
+    'pickle' (the legacy joblib files) or 'both'. training_info is recorded in the bundle
+    manifest. Returns the bundle version, if one was written.
+    """
+    os.makedirs(artifacts_dir, exist_ok=True)
+    version = None
+    
+    if artifact_format in ('bundle', 'both'):
+        version = save_bundle(model, scaler, location_encoder, feature_names, artifacts_dir, poi_store,
+                              training_info, locality_index, prediction_stats, comparables, segment_models)
+    
+    if artifact_format in ('pickle', 'both'):
+        save_pickles(model, scaler, location_encoder, feature_names, artifacts_dir, poi_store, locality_index,
+                     prediction_stats, comparables, segment_models)
+    
+    return version
+
+def save_bundle(model, scaler, location_encoder, feature_names, artifacts_dir, poi_store=None,
+                training_info=None, locality_index=None, prediction_stats=None, comparables=None,
+                segment_models=None):
+    """Save artifacts as a versioned bundle and point artifacts_dir/CURRENT at it"""
+    arrays = {
+        'scaler_mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scaler_scale': np.asarray(scaler.scale_, dtype=np.float64),
+        'location_classes': np.asarray(location_encoder.classes_, dtype=str),
+    }
+    
+    # Linear models are stored as plain arrays; anything else falls back to joblib inside the bundle
+    coef = getattr(model, 'coef_', None)
+    if coef is not None and np.ndim(coef) == 1 and np.ndim(getattr(model, 'intercept_', None)) == 0:
+        arrays['coef'] = np.asarray(coef, dtype=np.float64)
+        arrays['intercept'] = np.array([model.intercept_], dtype=np.float64)
+        model_spec = {'type': 'linear'}
+    else:
+        model_spec = {'type': 'joblib', 'file': 'model.pkl'}
+    
+    def write_extra(path):
+        if model_spec['type'] == 'joblib':
+            joblib.dump(model, os.path.join(path, model_spec['file']))
+        if poi_store is not None:
+            poi_store.save(os.path.join(path, 'poi'))
+        if locality_index is not None:
+            locality_index.save(os.path.join(path, 'locality'))
+        if prediction_stats is not None:
+            prediction_stats.save(os.path.join(path, 'uncertainty'))
+        if comparables is not None:
+            comparables.save(os.path.join(path, 'comparables'))
+        if segment_models is not None:
+            segment_models.save(os.path.join(path, 'segments'))
+    
+    manifest = {
+        'model': model_spec,
+        'feature_names': list(feature_names),
+        'target': 'price_lakhs',
+    }
+    if training_info:
+        manifest['training'] = training_info
+    version = write_bundle(artifacts_dir, manifest, arrays, write_extra)
+    logger.info(f"Artifact bundle {version} saved to {bundle_dir(artifacts_dir, version)}")
+    return version
 
-def save_artifacts(model, scaler, location_encoder, feature_names, artifacts_dir):
-    """Save model and preprocessing artifacts"""
+def save_pickles(model, scaler, location_encoder, feature_names, artifacts_dir, poi_store=None,
+                 locality_index=None, prediction_stats=None, comparables=None, segment_models=None):
+    """
+    Save artifacts as the legacy joblib pickle files
+    
+    Sidecar directories this run does not produce are removed first: the predictor loads
+    any that exist, so a stale segments/ or poi/ would be served next to the new model.
+    """
     os.makedirs(artifacts_dir, exist_ok=True)
+    sidecars = {'segments': segment_models, 'comparables': comparables, 'uncertainty': prediction_stats,
+                'locality': locality_index, 'poi': poi_store}
+    for name, produced in sidecars.items():
+        stale_dir = os.path.join(artifacts_dir, name)
+        if produced is None and os.path.isdir(stale_dir):
+            shutil.rmtree(stale_dir)
+            logger.info(f"Removed {stale_dir} left by an earlier run")
+    
+    # Save per-segment models routed to by area_type / grid cell
+    if segment_models is not None:
+        segments_dir = os.path.join(artifacts_dir, 'segments')
+        segment_models.save(segments_dir)
+        logger.info(f"Segment models saved to {segments_dir}")
+    
+    # Save comparable listings served by /api/comparables
+    if comparables is not None:
+        comparables_dir = os.path.join(artifacts_dir, 'comparables')
+        comparables.save(comparables_dir)
+        logger.info(f"Comparables store saved to {comparables_dir}")
+    
+    # Save prediction interval terms
+    if prediction_stats is not None:
+        stats_dir = os.path.join(artifacts_dir, 'uncertainty')
+        prediction_stats.save(stats_dir)
+        logger.info(f"Prediction interval stats saved to {stats_dir}")
+    
+    # Save locality index used to resolve location_encoded at inference
+    if locality_index is not None:
+        locality_dir = os.path.join(artifacts_dir, 'locality')
+        locality_index.save(locality_dir)
+        logger.info(f"Locality index saved to {locality_dir}")
+    
+    # Save POI store used for amenity features
+    if poi_store is not None:
+        poi_dir = os.path.join(artifacts_dir, 'poi')
+        poi_store.save(poi_dir)
+        logger.info(f"POI store saved to {poi_dir}")
     
     # Save model
     model_path = os.path.join(artifacts_dir, 'model.pkl')
@@ -144,21 +728,87 @@ def main():
                        help='Path to household data CSV')
     parser.add_argument('--artifacts-dir', type=str, default='artifacts',
                        help='Directory to save model artifacts')
+    parser.add_argument('--coordinates-path', type=str, default='Data/locality_coordinates.csv',
+                       help='Locality -> coordinates table from ml/geocode_localities.py (used if present)')
+    parser.add_argument('--poi-path', type=str, default=None,
+                       help='POI CSV (category, lat, lng) or saved POI store directory for amenity features')
+    parser.add_argument('--chunksize', type=int, default=200_000,
+                       help='Rows read per CSV chunk during preprocessing')
+    parser.add_argument('--convert-units', action='store_true',
+                       help='Convert unit-suffixed total_sqft values (Sq. Meter, Acres, ...) instead of dropping them')
+    parser.add_argument('--streaming', action='store_true',
+                       help='Out-of-core training: stream CSV chunks instead of loading the full dataset')
+    parser.add_argument('--cache-dir', type=str, default=DEFAULT_CACHE_DIR,
+                       help='Preprocessed feature cache keyed by input content, seed and preprocessing version')
+    parser.add_argument('--no-cache', action='store_true', help='Always re-run preprocessing')
+    parser.add_argument('--artifact-format', choices=['bundle', 'pickle', 'both'], default='bundle',
+                       help='Artifact format: versioned .npy bundle, legacy joblib pickles, or both')
+    parser.add_argument('--segment-by', type=str, default='area_type',
+                       help=f'Comma-separated segment fields for per-segment models ({", ".join(SEGMENT_FIELDS)}), '
+                            'or "none" for the global model only')
+    parser.add_argument('--segment-cell-size', type=float, default=DEFAULT_CELL_SIZE_M,
+                       help='Grid cell size in metres when segmenting by cell')
+    parser.add_argument('--min-segment-rows', type=int, default=DEFAULT_MIN_ROWS,
+                       help='Training rows a segment needs for its own model; smaller segments use the global model')
     
     args = parser.parse_args()
+    segment_by = [] if args.segment_by.lower() == 'none' else \
+        [field.strip() for field in args.segment_by.split(',') if field.strip()]
+    if any(field not in SEGMENT_FIELDS for field in segment_by):
+        parser.error(f'--segment-by fields must be from {SEGMENT_FIELDS} or "none"')
     
-    # Load and preprocess data
-    df, location_encoder = load_and_preprocess_data(args.data_path, args.seed)
+    # Amenity counts from the local POI store
+    poi_store = None
+    if args.poi_path:
+        if POIStore.exists(args.poi_path):
+            poi_store = POIStore.load(args.poi_path, mmap=False)
+        else:
+            poi_store = POIStore.from_csv(args.poi_path)
     
-    # Prepare features
-    X, y = prepare_features(df)
-    feature_names = list(X.columns)
-    
-    # Train model
-    model, scaler, mae, r2 = train_model(X, y, args.seed)
+    if args.streaming:
+        trainer = StreamingTrainer(args.data_path, args.seed, args.coordinates_path, poi_store,
+                                   args.chunksize, args.convert_units)
+        model, scaler, location_encoder, mae, r2 = trainer.run()
+        feature_names = trainer.feature_names
+        locality_index = trainer.locality_index
+        comparables = trainer.comparables
+        prediction_stats = trainer.prediction_stats
+        segment_models = segment_mae = None
+        if segment_by:
+            logger.warning("Segment models are not fitted in --streaming mode; serving the global model only")
+    else:
+        # Load, preprocess and prepare features (cached by input content)
+        df, location_encoder, X, y = preprocess(args.data_path, args.seed, args.coordinates_path, args.poi_path,
+                                                poi_store, args.chunksize, args.convert_units,
+                                                None if args.no_cache else args.cache_dir)
+        feature_names = list(X.columns)
+        
+        # Locality centroids (from geocoded rows only) for resolving location_encoded at inference
+        geocoded = geocoded_rows(df.loc[X.index], read_coordinates(args.coordinates_path))
+        locality_index = build_locality_index(location_encoder.classes_, X, geocoded)
+        
+        # Nearby similar listings served by /api/comparables
+        comparables = build_comparables(X, y, location_encoder.classes_)
+        
+        # Train model
+        model, scaler, mae, r2, prediction_stats = train_model(X, y, args.seed)
+        
+        # Per-segment models on the same split, routed to at serving time
+        segment_models = segment_mae = None
+        if segment_by:
+            segment_models, segment_mae = train_segments(X, y, df['area_type'].loc[X.index], model, scaler,
+                                                         args.seed, segment_by, args.segment_cell_size,
+                                                         args.min_segment_rows)
     
     # Save artifacts
-    save_artifacts(model, scaler, location_encoder, feature_names, args.artifacts_dir)
+    training_info = {'model': type(model).__name__, 'seed': args.seed, 'streaming': args.streaming,
+                     'mae': round(float(mae), 4), 'r2': round(float(r2), 4)}
+    if segment_models is not None:
+        training_info['segments'] = {'by': list(segment_models.by), 'count': len(segment_models),
+                                     'mae': round(float(segment_mae), 4)}
+    save_artifacts(model, scaler, location_encoder, feature_names, args.artifacts_dir, poi_store,
+                   args.artifact_format, training_info, locality_index, prediction_stats, comparables,
+                   segment_models)
     
     logger.info("Training completed successfully!")
     logger.info(f"Final model performance: MAE={mae:.2f}, R²={r2:.3f}")
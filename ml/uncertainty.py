@@ -0,0 +1,185 @@
+"""
+Prediction Intervals
+Closed-form price ranges saved next to the model, so inference needs no bootstrap
+ensembles or extra model calls.
+
+Built at training time from:
+- the hold-out residual quantiles (empirical, so the skew of real prices is kept)
+- the inverse centred cross-product matrix of the training features, which gives each
+  request's leverage h = 1/n + cᵀ (CᵀC)⁻¹ c with c = x - mean
+
+An interval is the point prediction plus the residual quantiles, widened by
+sqrt((1 + h) / (1 + h̄)) relative to the average training row: wider for properties
+unlike anything in the training data, one small mat-vec per row. Segment models get
+their own terms (SegmentPredictionStats), so a routed row's range is sized from the
+errors of the model that priced it.
+"""
+
+import json
+import os
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+STATS_FILE = 'uncertainty.json'
+ARRAY_NAMES = ['mean', 'precision', 'residual_quantiles']
+
+# Hold-out residual quantiles forming the reported range (a 90% interval)
+INTERVAL_QUANTILES = (0.05, 0.95)
+
+SEGMENT_ARRAY_NAMES = ARRAY_NAMES + ['n_train']
+
+# Hold-out residuals a segment model needs before its quantiles are trusted for a range
+MIN_SEGMENT_RESIDUALS = 30
+
+
+class PredictionStats:
+    """
+    Training-time terms for closed-form prediction intervals
+
+    Args:
+        mean: Training feature means (the centring point for leverage)
+        precision: (CᵀC)⁻¹ of the centred training features
+        residual_quantiles: Hold-out residuals (actual - predicted, in lakhs) at quantiles
+        n_train: Number of training rows
+        quantiles: Quantile levels of residual_quantiles
+    """
+
+    def __init__(self, mean: np.ndarray, precision: np.ndarray, residual_quantiles: np.ndarray,
+                 n_train: int, quantiles: Sequence[float] = INTERVAL_QUANTILES):
+        self.mean = mean
+        self.precision = precision
+        self.residual_quantiles = residual_quantiles
+        self.n_train = int(n_train)
+        self.quantiles = tuple(float(q) for q in quantiles)
+        # Average training leverage: (1 + rank) / n for the centred design plus intercept
+        rank = np.linalg.matrix_rank(precision) if len(precision) else 0
+        self.mean_leverage = (1 + rank) / max(self.n_train, 1)
+
+    @classmethod
+    def from_training(cls, X_train, residuals, quantiles: Sequence[float] = INTERVAL_QUANTILES) -> 'PredictionStats':
+        """Build from the training feature matrix and hold-out residuals"""
+        X_train = np.asarray(X_train, dtype=np.float64)
+        mean = X_train.mean(axis=0)
+        centred = X_train - mean
+        return cls.from_moments(len(X_train), mean, centred.T @ centred,
+                                np.quantile(np.asarray(residuals, dtype=np.float64), quantiles), quantiles)
+
+    @classmethod
+    def from_moments(cls, n_train: int, mean: np.ndarray, m2: np.ndarray, residual_quantiles,
+                     quantiles: Sequence[float] = INTERVAL_QUANTILES) -> 'PredictionStats':
+        """Build from accumulated training moments (mean and centred cross-products)"""
+        # pinv tolerates constant columns (e.g. an amenity absent from the training area)
+        return cls(np.asarray(mean, dtype=np.float64), np.linalg.pinv(np.asarray(m2, dtype=np.float64)),
+                   np.asarray(residual_quantiles, dtype=np.float64), n_train, quantiles)
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name), allow_pickle=False)
+        with open(os.path.join(directory, STATS_FILE), 'w') as f:
+            json.dump({'n_train': self.n_train, 'quantiles': list(self.quantiles)}, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'PredictionStats':
+        with open(os.path.join(directory, STATS_FILE)) as f:
+            meta = json.load(f)
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+                  for name in ARRAY_NAMES}
+        return cls(n_train=meta['n_train'], quantiles=meta['quantiles'], **arrays)
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.isfile(os.path.join(directory, STATS_FILE))
+
+    @property
+    def level(self) -> float:
+        """Nominal coverage of the interval, e.g. 0.9"""
+        return round(self.quantiles[-1] - self.quantiles[0], 4)
+
+    def leverage(self, centred: np.ndarray) -> np.ndarray:
+        """h per row of a centred (x - mean) feature matrix"""
+        return 1.0 / self.n_train + ((centred @ self.precision) * centred).sum(axis=1)
+
+    def interval(self, prediction: np.ndarray, centred: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Lower and upper bounds (same units as prediction) for predictions at centred rows"""
+        widen = np.sqrt((1.0 + self.leverage(centred)) / (1.0 + self.mean_leverage))
+        return (prediction + self.residual_quantiles[0] * widen,
+                prediction + self.residual_quantiles[-1] * widen)
+
+
+class SegmentPredictionStats:
+    """
+    PredictionStats for each segment model, stored as stacked arrays
+
+    Segments with fewer than MIN_SEGMENT_RESIDUALS hold-out rows have NaN residual
+    quantiles, so their rows get a NaN range, which callers leave out of responses.
+    """
+
+    def __init__(self, mean: np.ndarray, precision: np.ndarray, residual_quantiles: np.ndarray,
+                 n_train: np.ndarray, quantiles: Sequence[float] = INTERVAL_QUANTILES):
+        self.mean = mean
+        self.precision = precision
+        self.residual_quantiles = residual_quantiles
+        self.n_train = n_train
+        self.quantiles = tuple(float(q) for q in quantiles)
+        self.segments: List[PredictionStats] = [
+            PredictionStats(mean[s], precision[s], residual_quantiles[s], n_train[s], self.quantiles)
+            for s in range(len(n_train))]
+
+    @classmethod
+    def from_training(cls, X_train, train_segments, residuals, residual_segments, n_segments: int,
+                      quantiles: Sequence[float] = INTERVAL_QUANTILES,
+                      min_residuals: int = MIN_SEGMENT_RESIDUALS) -> 'SegmentPredictionStats':
+        """Build from the training rows and hold-out residuals, each with its segment index"""
+        X_train = np.asarray(X_train, dtype=np.float64)
+        residuals = np.asarray(residuals, dtype=np.float64)
+        dim = X_train.shape[1]
+        mean = np.zeros((n_segments, dim))
+        precision = np.zeros((n_segments, dim, dim))
+        residual_quantiles = np.full((n_segments, len(quantiles)), np.nan)
+        n_train = np.zeros(n_segments, dtype=np.int64)
+        for s in range(n_segments):
+            rows = X_train[train_segments == s]
+            segment_residuals = residuals[residual_segments == s]
+            if len(segment_residuals) >= min_residuals:
+                residual_quantiles[s] = np.quantile(segment_residuals, quantiles)
+            if len(rows):
+                mean[s] = rows.mean(axis=0)
+                centred = rows - mean[s]
+                precision[s] = np.linalg.pinv(centred.T @ centred)
+                n_train[s] = len(rows)
+        return cls(mean, precision, residual_quantiles, n_train, quantiles)
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for name in SEGMENT_ARRAY_NAMES:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name), allow_pickle=False)
+        with open(os.path.join(directory, STATS_FILE), 'w') as f:
+            json.dump({'n_segments': len(self.n_train), 'quantiles': list(self.quantiles)}, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'SegmentPredictionStats':
+        with open(os.path.join(directory, STATS_FILE)) as f:
+            meta = json.load(f)
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+                  for name in SEGMENT_ARRAY_NAMES}
+        return cls(quantiles=meta['quantiles'], **arrays)
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.isfile(os.path.join(directory, STATS_FILE))
+
+    def interval(self, prediction: np.ndarray, X: np.ndarray, segments: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Lower and upper bounds for predictions at raw rows X, each from its own segment's stats"""
+        low, high = np.empty(len(X)), np.empty(len(X))
+        order = np.argsort(segments, kind='stable')
+        bounds = np.flatnonzero(np.diff(segments[order])) + 1
+        for rows in np.split(order, bounds):
+            if len(rows) == 0:
+                continue
+            stats = self.segments[int(segments[rows[0]])]
+            low[rows], high[rows] = stats.interval(prediction[rows], X[rows] - stats.mean)
+        return low, high
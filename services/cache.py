@@ -0,0 +1,248 @@
+"""
+Cache primitives shared by the API layer
+In-process LRU tier with TTL, an on-disk SQLite tier shared across worker processes,
+and a tiered cache that reads through both.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with per-entry TTL"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        """Store value under key, evicting the least recently used entry when full"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+class SQLiteCache:
+    """
+    Disk-backed key/value cache with TTL and size-bound eviction
+
+    Values are stored as JSON in a single SQLite file using WAL mode, so every
+    gunicorn worker can read and write the same cache and entries survive restarts.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_entries: int = 100000,
+                 evict_every: int = 256):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._connect().execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return a connection owned by the current thread and process"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str, default=None, with_expiry: bool = False):
+        """
+        Return the cached value for key, or default if missing or expired
+
+        With with_expiry, return (value, expires_at) instead; expires_at is None for a
+        miss or an entry that never expires.
+        """
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                self.misses += 1
+                return (default, None) if with_expiry else default
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            logger.warning(f"Disk cache read failed: {e}")
+            self.misses += 1
+            return (default, None) if with_expiry else default
+        self.hits += 1
+        value = json.loads(row[0])
+        return (value, row[1]) if with_expiry else value
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        """Store a JSON-serializable value under key"""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Disk cache write failed: {e}")
+            return
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            self.evict()
+
+    def items(self, limit: Optional[int] = None) -> Iterator[Tuple[str, Any]]:
+        """Unexpired (key, value) pairs, most recently accessed first"""
+        try:
+            rows = self._connect().execute(
+                "SELECT key, value FROM cache WHERE expires_at IS NULL OR expires_at > ?"
+                " ORDER BY accessed_at DESC LIMIT ?",
+                (time.time(), -1 if limit is None else limit)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Disk cache scan failed: {e}")
+            return
+        for key, value in rows:
+            yield key, json.loads(value)
+
+    def evict(self):
+        """Drop expired entries, then the least recently accessed ones beyond max_entries"""
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                " SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Disk cache eviction failed: {e}")
+
+    def clear(self):
+        self._connect().execute("DELETE FROM cache")
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'path': self.path,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+class TieredCache:
+    """Read-through cache: in-process LRU first, then the optional shared disk tier"""
+
+    def __init__(self, memory: LRUCache, disk: Optional[SQLiteCache] = None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key, default=None):
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.disk is not None:
+            value, expires_at = self.disk.get(key, _MISSING, with_expiry=True)
+            if value is not _MISSING:
+                # Promote disk hits so the next lookup stays in-process, for no longer than
+                # the entry has left on disk (a short-lived negative entry stays short-lived)
+                self.memory.set(key, value, None if expires_at is None else expires_at - time.time())
+                return value
+        return default
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        memory_stats = self.memory.stats()
+        stats = {'memory': memory_stats}
+        hits = memory_stats['hits']
+        if self.disk is not None:
+            disk_stats = self.disk.stats()
+            stats['disk'] = disk_stats
+            hits += disk_stats['hits']
+            misses = disk_stats['misses']
+        else:
+            misses = memory_stats['misses']
+        stats['hits'] = hits
+        stats['misses'] = misses
+        lookups = hits + misses
+        stats['hit_rate'] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
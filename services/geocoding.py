@@ -0,0 +1,123 @@
+"""
+Geocoding helpers for the HERE Geocoding API
+Query normalization and the geocode result cache used by /api/geocode.
+"""
+
+import os
+import re
+from typing import Mapping, Optional, Sequence, Tuple
+
+from services.cache import LRUCache, SQLiteCache, TieredCache
+
+# City/state/country tokens users add around a locality; they do not change the result
+_CITY_PREFIX = re.compile(r'^(?:bangalore|bengaluru)\b[\s,]*')
+_REGION_SUFFIX = re.compile(r'(?:[\s,]+(?:bangalore|bengaluru|karnataka|india))+$')
+_SEPARATORS = re.compile(r'[\s,]+')
+
+# Sentinel stored for queries HERE could not resolve
+NOT_FOUND = {'not_found': True}
+
+# Fields /api/geocode can return; raw (the full HERE item) is only sent when asked for
+GEOCODE_FIELDS = ('lat', 'lng', 'label', 'locality', 'raw')
+DEFAULT_GEOCODE_FIELDS = ('lat', 'lng', 'label', 'locality')
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a free-text geocode query into a cache key
+
+    Case, repeated whitespace/commas and a leading or trailing "Bangalore" are ignored,
+    so "Bangalore  Whitefield" and "whitefield, bengaluru" share one entry.
+    """
+    key = _SEPARATORS.sub(' ', query.strip().casefold()).strip()
+    key = _REGION_SUFFIX.sub('', key)
+    stripped = _CITY_PREFIX.sub('', key).strip()
+    return stripped or key
+
+
+def locality_hint(here_item: Optional[Mapping]) -> Optional[str]:
+    """Best locality name from a HERE geocode item: address.district, else the title's first part"""
+    if not isinstance(here_item, Mapping):
+        return None
+    address = here_item.get('address') or {}
+    for candidate in (address.get('district'), address.get('subdistrict')):
+        if candidate:
+            return candidate
+    label = here_item.get('title') or address.get('label')
+    return label.split(',')[0] if label else None
+
+
+def parse_fields(value) -> Tuple[str, ...]:
+    """
+    Parse a fields selection ("lat,lng,label" or a JSON list) into known field names
+
+    Raises:
+        ValueError: for unknown field names or a malformed selection
+    """
+    if value is None:
+        return DEFAULT_GEOCODE_FIELDS
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, (list, tuple)) or not all(isinstance(f, str) for f in value):
+        raise ValueError('fields must be a comma-separated string or a list of strings')
+    fields = tuple(f.strip() for f in value if f.strip())
+    unknown = [f for f in fields if f not in GEOCODE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {unknown}. Allowed: {list(GEOCODE_FIELDS)}")
+    return fields or DEFAULT_GEOCODE_FIELDS
+
+
+def select_fields(result: Mapping, fields: Sequence[str]) -> dict:
+    """Project a cached geocode result onto the requested fields"""
+    selected = {field: result.get(field) for field in fields}
+    if 'label' in selected and selected['label'] is None and isinstance(result.get('raw'), Mapping):
+        # Entries cached before labels were stored
+        raw = result['raw']
+        selected['label'] = raw.get('title') or (raw.get('address') or {}).get('label')
+    return selected
+
+
+class GeocodeCache:
+    """Geocode result cache keyed on the normalized query"""
+
+    def __init__(self, disk_path: Optional[str] = None, ttl: float = 7 * 24 * 3600,
+                 negative_ttl: float = 3600, memory_size: int = 2048, disk_size: int = 100000):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        disk = SQLiteCache(disk_path, ttl=ttl, max_entries=disk_size) if disk_path else None
+        self._cache = TieredCache(LRUCache(maxsize=memory_size, ttl=ttl), disk)
+
+    def get(self, query: str):
+        """Return the cached result dict, NOT_FOUND, or None on a miss"""
+        return self._cache.get(normalize_query(query))
+
+    def set(self, query: str, result: dict):
+        self._cache.set(normalize_query(query), result, self.ttl)
+
+    def set_not_found(self, query: str):
+        self._cache.set(normalize_query(query), NOT_FOUND, self.negative_ttl)
+
+    def items(self, limit: Optional[int] = None):
+        """Cached (normalized query, result) pairs from the shared disk tier, skipping not-found entries"""
+        if self._cache.disk is None:
+            return
+        for key, value in self._cache.disk.items(limit):
+            if value != NOT_FOUND:
+                yield key, value
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+def geocode_cache_from_env() -> GeocodeCache:
+    """Build the geocode cache from GEOCODE_CACHE_* environment variables"""
+    return GeocodeCache(
+        disk_path=os.getenv('GEOCODE_CACHE_PATH', 'cache/geocode_cache.sqlite') or None,
+        ttl=float(os.getenv('GEOCODE_CACHE_TTL', str(7 * 24 * 3600))),
+        negative_ttl=float(os.getenv('GEOCODE_CACHE_NEGATIVE_TTL', '3600')),
+        memory_size=int(os.getenv('GEOCODE_CACHE_SIZE', '2048')),
+        disk_size=int(os.getenv('GEOCODE_CACHE_DISK_SIZE', '100000'))
+    )
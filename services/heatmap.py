@@ -0,0 +1,186 @@
+"""
+Price heatmap over a lat/lng grid or web-mercator map tiles
+Every cell of a grid or tile is predicted in one vectorized predictor pass, and results
+are cached per tile, property profile and model version so panning the map is served
+from cache.
+"""
+
+import math
+import os
+from typing import Dict, Mapping, Optional, Tuple
+
+import numpy as np
+
+from services.cache import LRUCache, SQLiteCache, TieredCache
+
+# Region accepted by /api/predict; cells outside it are returned as null
+REGION_BOUNDS = {'south': 10.0, 'north': 15.0, 'west': 75.0, 'east': 80.0}
+
+MAX_ZOOM = 22
+DEFAULT_TILE_SIZE = 32
+MAX_TILE_SIZE = 128
+MAX_GRID_CELLS = 128 * 128
+
+
+def tile_bounds(z: int, x: int, y: int) -> Dict[str, float]:
+    """Bounding box of web-mercator (slippy map) tile z/x/y in degrees"""
+    n = 2 ** z
+    return {
+        'south': float(_tile_lat(y + 1, n)),
+        'west': x / n * 360.0 - 180.0,
+        'north': float(_tile_lat(y, n)),
+        'east': (x + 1) / n * 360.0 - 180.0
+    }
+
+
+def _tile_lat(tile_y, n):
+    return np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * np.asarray(tile_y, dtype=np.float64) / n))))
+
+
+def tile_cell_centers(z: int, x: int, y: int, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cell-center coordinates of a size x size raster over tile z/x/y
+
+    Rows run north to south and are evenly spaced in mercator y, so cells line up with
+    the tile's pixels rather than with equal latitude steps.
+    """
+    n = 2 ** z
+    offsets = (np.arange(size) + 0.5) / size
+    lat = _tile_lat(y + offsets, n)
+    lng = (x + offsets) / n * 360.0 - 180.0
+    return np.repeat(lat, size), np.tile(lng, size)
+
+
+def grid_cell_centers(bounds: Mapping[str, float], rows: int, cols: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Cell-center coordinates of a rows x cols lat/lng grid over bounds, north to south"""
+    lat = bounds['north'] - (np.arange(rows) + 0.5) * (bounds['north'] - bounds['south']) / rows
+    lng = bounds['west'] + (np.arange(cols) + 0.5) * (bounds['east'] - bounds['west']) / cols
+    return np.repeat(lat, cols), np.tile(lng, rows)
+
+
+def _in_region(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    return ((lat >= REGION_BOUNDS['south']) & (lat <= REGION_BOUNDS['north'])
+            & (lng >= REGION_BOUNDS['west']) & (lng <= REGION_BOUNDS['east']))
+
+
+def _overlaps_region(bounds: Mapping[str, float]) -> bool:
+    return (bounds['south'] <= REGION_BOUNDS['north'] and bounds['north'] >= REGION_BOUNDS['south']
+            and bounds['west'] <= REGION_BOUNDS['east'] and bounds['east'] >= REGION_BOUNDS['west'])
+
+
+def model_version(predictor) -> str:
+    """Cache namespace for a predictor; results are never shared across model versions"""
+    return str(getattr(predictor, 'version', None) or 'unversioned')
+
+
+def predict_cells(predictor, lat: np.ndarray, lng: np.ndarray, profile: Mapping[str, float],
+                  rows: int, cols: int) -> Dict:
+    """
+    Predict one property profile at every cell in a single predict_batch call
+
+    Returns:
+        Dictionary with prices (rows x cols nested lists in crores, null outside the
+        supported region) and their min/max
+    """
+    prices = np.full(len(lat), np.nan)
+    mask = _in_region(lat, lng)
+    if mask.any():
+        count = int(mask.sum())
+        prices[mask] = predictor.predict_batch({
+            'bhk': np.full(count, float(profile['bhk'])),
+            'sqft': np.full(count, float(profile['sqft'])),
+            'bath': np.full(count, float(profile['bath'])),
+            'lat': lat[mask],
+            'lng': lng[mask]
+        })['price_crore']
+
+    grid = prices.reshape(rows, cols)
+    return {
+        'prices': [[None if math.isnan(v) else v for v in row] for row in grid.tolist()],
+        'min': float(np.nanmin(prices)) if mask.any() else None,
+        'max': float(np.nanmax(prices)) if mask.any() else None
+    }
+
+
+class HeatmapCache:
+    """Heatmap result cache keyed on tile or grid, property profile and model version"""
+
+    def __init__(self, disk_path: Optional[str] = None, ttl: Optional[float] = None,
+                 memory_size: int = 4096, disk_size: int = 100000):
+        self.ttl = ttl
+        disk = SQLiteCache(disk_path, ttl=ttl, max_entries=disk_size) if disk_path else None
+        self._cache = TieredCache(LRUCache(maxsize=memory_size, ttl=ttl), disk)
+
+    @staticmethod
+    def key(version: str, area: str, profile: Mapping[str, float]) -> str:
+        return f"{version}|{area}|{profile['bhk']:g}/{profile['sqft']:g}/{profile['bath']:g}"
+
+    def get(self, key: str):
+        return self._cache.get(key)
+
+    def set(self, key: str, result: dict):
+        self._cache.set(key, result, self.ttl)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+def heatmap_cache_from_env() -> HeatmapCache:
+    """Build the heatmap cache from HEATMAP_CACHE_* environment variables"""
+    ttl = os.getenv('HEATMAP_CACHE_TTL')
+    return HeatmapCache(
+        disk_path=os.getenv('HEATMAP_CACHE_PATH') or None,
+        ttl=float(ttl) if ttl else None,
+        memory_size=int(os.getenv('HEATMAP_CACHE_SIZE', '4096'))
+    )
+
+
+def tile_heatmap(predictor, cache: HeatmapCache, z: int, x: int, y: int,
+                 profile: Mapping[str, float], size: int = DEFAULT_TILE_SIZE) -> Tuple[Dict, bool]:
+    """
+    Heatmap for map tile z/x/y, served from cache when this model has computed it before
+
+    Returns:
+        Tuple of (result dict, cache hit flag)
+    """
+    version = model_version(predictor)
+    key = cache.key(version, f"tile:{z}/{x}/{y}@{size}", profile)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached, True
+
+    bounds = tile_bounds(z, x, y)
+    result = {'z': z, 'x': x, 'y': y, 'size': size, 'bounds': bounds, 'model_version': version}
+    if _overlaps_region(bounds):
+        lat, lng = tile_cell_centers(z, x, y, size)
+        result.update(predict_cells(predictor, lat, lng, profile, size, size))
+    else:
+        # Tiles outside the region never reach the model
+        result.update({'prices': [[None] * size for _ in range(size)], 'min': None, 'max': None})
+    cache.set(key, result)
+    return result, False
+
+
+def grid_heatmap(predictor, cache: HeatmapCache, bounds: Mapping[str, float], rows: int, cols: int,
+                 profile: Mapping[str, float]) -> Tuple[Dict, bool]:
+    """
+    Heatmap for an arbitrary lat/lng bounding box split into rows x cols cells
+
+    Returns:
+        Tuple of (result dict, cache hit flag)
+    """
+    version = model_version(predictor)
+    area = 'grid:' + ','.join(f"{bounds[k]:.6f}" for k in ('south', 'west', 'north', 'east'))
+    key = cache.key(version, f"{area}@{rows}x{cols}", profile)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached, True
+
+    lat, lng = grid_cell_centers(bounds, rows, cols)
+    result = {'rows': rows, 'cols': cols, 'bounds': dict(bounds), 'model_version': version}
+    result.update(predict_cells(predictor, lat, lng, profile, rows, cols))
+    cache.set(key, result)
+    return result, False
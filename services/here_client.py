@@ -0,0 +1,260 @@
+"""
+HERE API client
+Shared keep-alive session with a bounded connection pool, coalescing of concurrent
+identical lookups into one upstream call, a circuit breaker that fails fast while
+HERE is degraded, and an optional quota budget shared by every worker.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.geocoding import normalize_query
+from services.metrics import HERE_UPSTREAM_SECONDS
+
+logger = logging.getLogger(__name__)
+
+HERE_GEOCODE_URL = "https://geocode.search.hereapi.com/v1/geocode"
+HERE_AUTOSUGGEST_URL = "https://autosuggest.search.hereapi.com/v1/autosuggest"
+
+# Autosuggest results are biased towards central Bangalore
+DEFAULT_FOCUS = (12.9716, 77.5946)
+
+
+class HereAPIError(Exception):
+    """HERE answered with a non-success HTTP status"""
+
+    def __init__(self, status_code: int, details: Any, retry_after: Optional[float] = None):
+        super().__init__(f"HERE API error {status_code}")
+        self.status_code = status_code
+        self.details = details
+        # Seconds from the Retry-After header (sent with 429), when given
+        self.retry_after = retry_after
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header given as a number (HTTP dates are ignored)"""
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class CircuitOpenError(Exception):
+    """Upstream calls are suspended because HERE has been failing"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"HERE circuit open, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class QuotaExhaustedError(Exception):
+    """The HERE call budget is spent, or HERE asked us to back off with a 429"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"HERE quota exhausted, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    After failure_threshold consecutive failures the circuit opens and calls fail fast for
+    reset_timeout seconds; then a single trial call is let through (half-open) and its
+    outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may proceed"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            elapsed = time.monotonic() - self.opened_at
+            if self.state == self.OPEN and elapsed >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpenError(max(self.reset_timeout - elapsed, 1.0))
+
+    def cancel_call(self):
+        """Give back a call allowed by before_call that was never made"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"HERE circuit opened after {self.failures} consecutive failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'state': self.state, 'consecutive_failures': self.failures}
+
+
+class _InflightCall:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class HereClient:
+    """Pooled, coalescing, circuit-broken client for the HERE Geocoding and Autosuggest APIs"""
+
+    # Statuses that indicate HERE itself is unhealthy, as opposed to a bad request
+    FAILURE_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, api_key: Optional[str], geocode_url: str = HERE_GEOCODE_URL,
+                 autosuggest_url: str = HERE_AUTOSUGGEST_URL, connect_timeout: float = 3.05,
+                 read_timeout: float = 10.0, pool_size: int = 16,
+                 breaker: Optional[CircuitBreaker] = None, rate_limiter=None):
+        self.api_key = api_key
+        self.geocode_url = geocode_url
+        self.autosuggest_url = autosuggest_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        # services.rate_limit.RateLimiter holding the HERE quota budget (None: unlimited)
+        self.rate_limiter = rate_limiter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._inflight: Dict[str, _InflightCall] = {}
+        self._lock = threading.Lock()
+        self.upstream_calls = 0
+        self.coalesced_calls = 0
+        self.quota_rejections = 0
+
+    def geocode(self, query: str) -> Dict:
+        """
+        Geocode a free-text query and return HERE's JSON response
+
+        Concurrent calls for the same normalized query share one upstream request.
+
+        Raises:
+            CircuitOpenError: HERE is currently considered down
+            QuotaExhaustedError: the HERE call budget is spent or HERE is throttling us
+            HereAPIError: HERE returned a non-success status
+            requests.exceptions.RequestException: transport failure
+        """
+        params = {'apiKey': self.api_key, 'q': query, 'limit': 1}
+        return self._coalesced(f"geocode:{normalize_query(query)}",
+                               lambda: self._get(self.geocode_url, params, 'geocode'))
+
+    def autosuggest(self, query: str, limit: int = 5, at=DEFAULT_FOCUS) -> Dict:
+        """
+        Complete a partial address with HERE Autosuggest, restricted to India
+
+        Shares the session, coalescing and circuit breaker with geocode, so a HERE
+        outage trips both.
+        """
+        params = {'apiKey': self.api_key, 'q': query, 'limit': limit, 'at': f"{at[0]},{at[1]}",
+                  'in': 'countryCode:IND'}
+        return self._coalesced(f"autosuggest:{limit}:{normalize_query(query)}",
+                               lambda: self._get(self.autosuggest_url, params, 'autosuggest'))
+
+    def _coalesced(self, key: str, fetch: Callable[[], Dict]) -> Dict:
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InflightCall()
+            else:
+                self.coalesced_calls += 1
+
+        if not leader:
+            # The leader's request is bounded by the HTTP timeouts
+            call.event.wait(sum(self.timeout) + 1.0)
+            if call.error is not None:
+                raise call.error
+            if not call.event.is_set():
+                raise requests.exceptions.Timeout("Timed out waiting for coalesced HERE request")
+            return call.result
+
+        try:
+            call.result = fetch()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.event.set()
+
+    def _get(self, url: str, params: Dict, endpoint: str) -> Dict:
+        self.breaker.before_call()
+        if self.rate_limiter is not None:
+            wait = self.rate_limiter.acquire_here()
+            if wait:
+                self.breaker.cancel_call()
+                self.quota_rejections += 1
+                raise QuotaExhaustedError(wait)
+        self.upstream_calls += 1
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            HERE_UPSTREAM_SECONDS.observe(time.perf_counter() - start, endpoint, 'transport_error')
+            self.breaker.record_failure()
+            raise
+        HERE_UPSTREAM_SECONDS.observe(time.perf_counter() - start, endpoint,
+                                      'ok' if response.ok else f'http_{response.status_code}')
+
+        if not response.ok:
+            if response.status_code in self.FAILURE_STATUS:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            try:
+                details = response.json()
+            except Exception:
+                details = {'message': response.text}
+            retry_after = _retry_after(response.headers.get('Retry-After'))
+            if response.status_code == 429 and self.rate_limiter is not None:
+                self.rate_limiter.here_throttled(retry_after)
+            raise HereAPIError(response.status_code, details, retry_after)
+
+        self.breaker.record_success()
+        return response.json()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'upstream_calls': self.upstream_calls,
+            'coalesced_calls': self.coalesced_calls,
+            'quota_rejections': self.quota_rejections,
+            'in_flight': len(self._inflight),
+            'circuit': self.breaker.stats()
+        }
@@ -0,0 +1,281 @@
+"""
+Lightweight Prometheus-style metrics
+Counters, gauges and fixed-bucket histograms kept in-process and periodically snapshotted
+to one JSON file per worker in a shared directory, so /metrics can aggregate across
+gunicorn worker processes. Recording a sample is a lock, a dict lookup and (for
+histograms) a bisect, keeping hot-path overhead to about a microsecond.
+"""
+
+import bisect
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry: 'Registry', name: str, documentation: str, labelnames: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *label_values, amount: float = 1.0):
+        self.registry._add(self.name, label_values, amount)
+
+
+class Gauge(_Metric):
+    """Per-process value; the aggregate is the sum over live worker processes"""
+    kind = 'gauge'
+
+    def set(self, value: float, *label_values):
+        self.registry._set(self.name, label_values, value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *label_values):
+        self.registry._observe(self, label_values, value)
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+
+class Registry:
+    """
+    Metric registry with optional multi-process aggregation
+
+    When multiproc_dir is set, each process writes its samples to
+    multiproc_dir/metrics-<pid>.json at most every flush_interval seconds (and whenever
+    /metrics is rendered), and render() merges every process's file.
+    """
+
+    def __init__(self, multiproc_dir: Optional[str] = None, flush_interval: float = 1.0):
+        self.multiproc_dir = multiproc_dir
+        self.flush_interval = flush_interval
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._reset_values()
+        if multiproc_dir:
+            os.makedirs(multiproc_dir, exist_ok=True)
+        if hasattr(os, 'register_at_fork'):
+            # Samples recorded in a preloading master must not be re-counted by every worker
+            os.register_at_fork(after_in_child=self._reset_values)
+
+    def _reset_values(self):
+        self._values: Dict[Tuple[str, Tuple[str, ...]], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple[str, ...]], list] = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    # Registration
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric: _Metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def register_collector(self, collector: Callable[[], None]):
+        """Register a callback that refreshes gauges right before each flush"""
+        self._collectors.append(collector)
+
+    # Recording
+
+    def _add(self, name, label_values, amount):
+        key = (name, tuple(str(v) for v in label_values))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+        self._maybe_flush()
+
+    def _set(self, name, label_values, value):
+        key = (name, tuple(str(v) for v in label_values))
+        with self._lock:
+            self._values[key] = float(value)
+
+    def _observe(self, histogram: Histogram, label_values, value):
+        key = (histogram.name, tuple(str(v) for v in label_values))
+        slot = bisect.bisect_left(histogram.buckets, value)
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                # Per-bucket counts (last slot is +Inf), then sum
+                state = self._histograms[key] = [0] * (len(histogram.buckets) + 1) + [0.0]
+            state[slot] += 1
+            state[-1] += value
+        self._maybe_flush()
+
+    # Multi-process snapshots
+
+    def _maybe_flush(self):
+        if self.multiproc_dir and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _snapshot(self) -> Dict:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'values': [[name, list(labels), value] for (name, labels), value in self._values.items()],
+                'histograms': [[name, list(labels), list(state)] for (name, labels), state in self._histograms.items()],
+            }
+
+    def flush(self):
+        """Write this process's samples to its snapshot file"""
+        self._last_flush = time.monotonic()
+        if not self.multiproc_dir:
+            return
+        snapshot = self._snapshot()
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.multiproc_dir, prefix='.metrics-')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, os.path.join(self.multiproc_dir, f"metrics-{os.getpid()}.json"))
+        except OSError as e:
+            logger.warning(f"Failed to write metrics snapshot: {e}")
+
+    def _snapshots(self) -> List[Dict]:
+        if not self.multiproc_dir:
+            return [self._snapshot()]
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.multiproc_dir, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    # Exposition
+
+    def collect(self) -> Tuple[Dict, Dict]:
+        """Merge samples across processes: counters summed, gauges summed over live processes"""
+        values: Dict[Tuple[str, Tuple[str, ...]], float] = {}
+        histograms: Dict[Tuple[str, Tuple[str, ...]], list] = {}
+        for snapshot in self._snapshots():
+            alive = _pid_alive(snapshot['pid'])
+            for name, labels, value in snapshot['values']:
+                metric = self._metrics.get(name)
+                if metric is None or (metric.kind == 'gauge' and not alive):
+                    continue
+                key = (name, tuple(labels))
+                values[key] = values.get(key, 0.0) + value
+            for name, labels, state in snapshot['histograms']:
+                key = (name, tuple(labels))
+                merged = histograms.get(key)
+                if merged is None or len(merged) != len(state):
+                    histograms[key] = list(state)
+                else:
+                    histograms[key] = [a + b for a, b in zip(merged, state)]
+        return values, histograms
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        values, histograms = self.collect()
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            if metric.kind == 'histogram':
+                for (hname, labels), state in sorted(histograms.items()):
+                    if hname != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(list(metric.buckets) + ['+Inf'], state[:-1]):
+                        cumulative += count
+                        le = bound if bound == '+Inf' else repr(float(bound))
+                        lines.append(f"{name}_bucket{_labels(metric.labelnames, labels, le=le)} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(metric.labelnames, labels)} {state[-1]}")
+                    lines.append(f"{name}_count{_labels(metric.labelnames, labels)} {cumulative}")
+            else:
+                for (vname, labels), value in sorted(values.items()):
+                    if vname == name:
+                        lines.append(f"{name}{_labels(metric.labelnames, labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(names: Sequence[str], values: Sequence[str], **extra) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Process-wide registry used by the app and the predictor
+REGISTRY = Registry(multiproc_dir=os.getenv('METRICS_MULTIPROC_DIR') or None,
+                    flush_interval=float(os.getenv('METRICS_FLUSH_INTERVAL', '1.0')))
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint', ['endpoint', 'method'])
+HTTP_REQUESTS = REGISTRY.counter(
+    'http_requests_total', 'Requests by endpoint and status code', ['endpoint', 'status'])
+HTTP_QUEUE_SECONDS = REGISTRY.histogram(
+    'http_request_queue_seconds', 'Time between the proxy accepting a request (X-Request-Start) and a worker starting it')
+STAGE_SECONDS = REGISTRY.histogram(
+    'request_stage_seconds', 'Time spent in each hot-path stage', ['endpoint', 'stage'])
+PREDICTOR_STAGE_SECONDS = REGISTRY.histogram(
+    'predictor_stage_seconds', 'Time spent in predictor stages', ['stage'])
+HERE_UPSTREAM_SECONDS = REGISTRY.histogram(
+    'here_upstream_duration_seconds', 'HERE API call latency by outcome', ['api', 'outcome'])
+CACHE_LOOKUPS = REGISTRY.counter(
+    'cache_lookups_total', 'Cache lookups by cache and result', ['cache', 'result'])
+RATE_LIMITED = REGISTRY.counter(
+    'rate_limited_total', 'Requests refused or degraded by a rate limit', ['endpoint', 'limit'])
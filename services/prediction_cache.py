@@ -0,0 +1,71 @@
+"""
+Prediction result cache
+Caches /api/predict responses on the model version plus quantized features, so the
+near-identical payloads a user sends while adjusting the form are answered without
+rebuilding features or running the model. A newly activated model uses a new key
+namespace, so stale prices are never served after a swap.
+"""
+
+import os
+from typing import Dict, Mapping, Optional
+
+from ml.segments import normalize_area_type
+from services.cache import LRUCache, SQLiteCache, TieredCache
+from services.geocoding import normalize_query
+
+# Decimal places kept per feature: 4 places of lat/lng is about 11 m in Bangalore
+QUANTIZE_DECIMALS = {'lat': 4, 'lng': 4, 'sqft': 0}
+
+
+def quantize_features(features: Mapping) -> Dict:
+    """
+    Round features onto the cache grid
+
+    The prediction is made on the quantized features, so every payload sharing a key
+    gets exactly the price that was cached for it.
+    """
+    quantized = dict(features)
+    for field, decimals in QUANTIZE_DECIMALS.items():
+        quantized[field] = round(float(features[field]), decimals)
+    return quantized
+
+
+class PredictionCache:
+    """Single-prediction cache keyed on model version and quantized features"""
+
+    def __init__(self, disk_path: Optional[str] = None, ttl: Optional[float] = None,
+                 memory_size: int = 16384, disk_size: int = 200000):
+        self.ttl = ttl
+        disk = SQLiteCache(disk_path, ttl=ttl, max_entries=disk_size) if disk_path else None
+        self._cache = TieredCache(LRUCache(maxsize=memory_size, ttl=ttl), disk)
+
+    @staticmethod
+    def key(version: str, features: Mapping) -> str:
+        locality = features.get('locality')
+        area_type = features.get('area_type')
+        return (f"{version}|{features['bhk']}/{features['sqft']:g}/{features['bath']}"
+                f"|{features['lat']:.4f},{features['lng']:.4f}"
+                f"|{normalize_query(locality) if locality else ''}"
+                f"|{normalize_area_type(area_type) if area_type else ''}")
+
+    def get(self, key: str):
+        return self._cache.get(key)
+
+    def set(self, key: str, result: dict):
+        self._cache.set(key, result, self.ttl)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+def prediction_cache_from_env() -> PredictionCache:
+    """Build the prediction cache from PREDICTION_CACHE_* environment variables"""
+    ttl = os.getenv('PREDICTION_CACHE_TTL')
+    return PredictionCache(
+        disk_path=os.getenv('PREDICTION_CACHE_PATH') or None,
+        ttl=float(ttl) if ttl else None,
+        memory_size=int(os.getenv('PREDICTION_CACHE_SIZE', '16384'))
+    )
@@ -0,0 +1,172 @@
+"""
+Rate Limiting
+Token buckets kept in a small memory-mapped file shared by every gunicorn worker: one
+bucket per client IP (hashed into a fixed number of slots) and one global bucket that
+spreads the daily HERE API quota over the day. A check is a CRC32, a byte-range fcntl
+lock on the bucket's slot and a struct read/write of three doubles, a few microseconds,
+with no server process or network round trip.
+"""
+
+import fcntl
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+# tokens, last refill (epoch seconds), blocked until (epoch seconds)
+SLOT = struct.Struct('=ddd')
+SLOT_SIZE = 32
+
+# 64K client slots (2 MB); IPs hashing to the same slot share a bucket
+DEFAULT_CLIENT_SLOTS = 65536
+
+# Slot 0 holds the HERE quota bucket; client buckets follow
+_HERE_SLOT = 0
+
+# Backoff after a HERE 429 without a usable Retry-After header
+DEFAULT_THROTTLE_SECONDS = 60.0
+
+
+class TokenBuckets:
+    """
+    Fixed array of token buckets in a memory map
+
+    With a path the map is file-backed and every process opening the file shares the
+    buckets; updates hold a POSIX lock on the slot's bytes (per process) and a thread
+    lock (per thread). Without a path the buckets are private to the process. A zeroed
+    slot reads as a full bucket, so the file needs no initialization.
+    """
+
+    def __init__(self, path: Optional[str], slots: int):
+        self.path = path
+        self.slots = slots
+        size = slots * SLOT_SIZE
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._map = mmap.mmap(self._fd, size)
+        else:
+            self._fd = None
+            self._map = mmap.mmap(-1, size)
+
+    def take(self, slot: int, rate: float, capacity: float, cost: float = 1.0,
+             now: Optional[float] = None) -> float:
+        """
+        Take cost tokens from a bucket refilling at rate tokens/second up to capacity
+
+        Returns 0.0 when the tokens were taken, else the seconds until they would be.
+        A rate <= 0 makes the bucket unlimited apart from block().
+        """
+        now = time.time() if now is None else now
+        offset = slot * SLOT_SIZE
+        with self._lock:
+            if self._fd is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, SLOT_SIZE, offset)
+            try:
+                tokens, updated, blocked_until = SLOT.unpack_from(self._map, offset)
+                if now < blocked_until:
+                    return blocked_until - now
+                if rate <= 0:
+                    return 0.0
+                # A clock stepping backwards must not drain the bucket
+                tokens = min(capacity, tokens + max(now - updated, 0.0) * rate)
+                wait = 0.0
+                if tokens >= cost:
+                    tokens -= cost
+                else:
+                    wait = (cost - tokens) / rate
+                SLOT.pack_into(self._map, offset, tokens, now, blocked_until)
+                return wait
+            finally:
+                if self._fd is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, SLOT_SIZE, offset)
+
+    def block(self, slot: int, until: float):
+        """Empty a bucket and refuse it until the given epoch time"""
+        offset = slot * SLOT_SIZE
+        with self._lock:
+            if self._fd is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, SLOT_SIZE, offset)
+            try:
+                _, _, blocked_until = SLOT.unpack_from(self._map, offset)
+                SLOT.pack_into(self._map, offset, 0.0, until, max(blocked_until, until))
+            finally:
+                if self._fd is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, SLOT_SIZE, offset)
+
+    def peek(self, slot: int, rate: float, capacity: float, now: Optional[float] = None) -> float:
+        """Tokens a bucket would hold now, without taking any (unlocked; for stats)"""
+        now = time.time() if now is None else now
+        tokens, updated, blocked_until = SLOT.unpack_from(self._map, slot * SLOT_SIZE)
+        if now < blocked_until:
+            return 0.0
+        return min(capacity, tokens + max(now - updated, 0.0) * rate) if rate > 0 else capacity
+
+
+class RateLimiter:
+    """
+    Per-client request limits and the global HERE quota budget
+
+    Args:
+        path: Shared bucket file (None keeps the buckets in this process only)
+        client_rate: Sustained requests/second per client IP (<= 0 disables the limit)
+        client_burst: Requests a client may make at once after being idle
+        here_daily_quota: HERE calls per day, spread evenly (<= 0 for no budget)
+        here_burst: HERE calls that may be made at once after a quiet period
+        client_slots: Number of client buckets
+    """
+
+    def __init__(self, path: Optional[str] = None, client_rate: float = 10.0, client_burst: float = 30.0,
+                 here_daily_quota: float = 0.0, here_burst: float = 100.0,
+                 client_slots: int = DEFAULT_CLIENT_SLOTS):
+        self.buckets = TokenBuckets(path, client_slots + 1)
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.client_slots = client_slots
+        self.here_daily_quota = here_daily_quota
+        self.here_rate = here_daily_quota / 86400.0 if here_daily_quota > 0 else 0.0
+        self.here_burst = here_burst
+
+    def check_client(self, client: str) -> float:
+        """Count a request from client; 0.0 if allowed, else seconds until it would be"""
+        if self.client_rate <= 0:
+            return 0.0
+        slot = 1 + zlib.crc32(client.encode()) % self.client_slots
+        return self.buckets.take(slot, self.client_rate, self.client_burst)
+
+    def acquire_here(self) -> float:
+        """Spend one HERE call from the budget; 0.0 if allowed, else seconds until one is available"""
+        return self.buckets.take(_HERE_SLOT, self.here_rate, self.here_burst)
+
+    def here_throttled(self, retry_after: Optional[float] = None):
+        """Stop every worker calling HERE after it answered 429"""
+        if retry_after is None or not math.isfinite(retry_after) or retry_after <= 0:
+            retry_after = DEFAULT_THROTTLE_SECONDS
+        self.buckets.block(_HERE_SLOT, time.time() + retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'shared': self.buckets.path is not None,
+            'client_rate': self.client_rate,
+            'client_burst': self.client_burst,
+            'here_daily_quota': self.here_daily_quota,
+            'here_tokens': round(self.buckets.peek(_HERE_SLOT, self.here_rate, self.here_burst), 2)
+        }
+
+
+def rate_limiter_from_env() -> RateLimiter:
+    """Build the limiter from RATE_LIMIT_* and HERE_* environment variables"""
+    return RateLimiter(
+        path=os.getenv('RATE_LIMIT_PATH', 'cache/rate_limit.bin') or None,
+        client_rate=float(os.getenv('RATE_LIMIT_PER_IP', '10')),
+        client_burst=float(os.getenv('RATE_LIMIT_BURST', '30')),
+        here_daily_quota=float(os.getenv('HERE_DAILY_QUOTA', '1000')),
+        here_burst=float(os.getenv('HERE_QUOTA_BURST', '100'))
+    )
@@ -0,0 +1,119 @@
+"""
+Response serialization and compression
+An orjson-backed Flask JSON provider (falling back to the stdlib encoder when orjson is
+not installed) and negotiated brotli/gzip compression of JSON and text responses.
+"""
+
+import gzip
+import json
+from typing import Any, Optional
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+# Bodies smaller than this are sent as-is; compressing them costs more than it saves
+MIN_COMPRESS_BYTES = 512
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider serializing with orjson when available
+
+    orjson is several times faster than json.dumps on the nested lists and dicts the
+    batch and heatmap endpoints return, and natively encodes numpy arrays and scalars.
+    Output is compact (no indentation or spaces after separators).
+    """
+
+    compact = True
+
+    @staticmethod
+    def default(o: Any) -> Any:
+        if isinstance(o, np.ndarray):
+            return o.tolist()
+        if isinstance(o, np.generic):
+            return o.item()
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        return self.dumps_bytes(obj).decode()
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(obj, default=self.default,
+                                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(obj, default=self.default, separators=(',', ':'),
+                          ensure_ascii=False).encode()
+
+    def loads(self, s, **kwargs) -> Any:
+        if orjson is not None:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick 'br' or 'gzip' from an Accept-Encoding header, honouring q=0 exclusions"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    wildcard = accepted.get('*', 0.0)
+    if brotli is not None and accepted.get('br', wildcard) > 0:
+        return 'br'
+    if accepted.get('gzip', wildcard) > 0:
+        return 'gzip'
+    return None
+
+
+def compress_response(response, accept_encoding: Optional[str]):
+    """
+    Compress a buffered JSON/text response in place when the client accepts it
+
+    Streaming, already-encoded, small and non-2xx-body responses are left untouched.
+    """
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)):
+        return response
+
+    body = response.get_data()
+    if len(body) < MIN_COMPRESS_BYTES:
+        return response
+    encoding = choose_encoding(accept_encoding)
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == 'gzip':
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,468 @@
+"""
+Asynchronous Scoring Jobs
+Portfolio re-valuations too large for one /api/predict/batch request. An upload (CSV, or
+Parquet when pyarrow is installed) is saved to its own job directory and scored chunk by
+chunk in a local process pool, so no broker is needed and memory is bounded by the chunk
+size rather than the file size.
+
+Layout:
+    <jobs_dir>/<job_id>/job.json          status and progress, replaced atomically
+    <jobs_dir>/<job_id>/input.csv         the upload (input.parquet for Parquet)
+    <jobs_dir>/<job_id>/part-00000.csv    scored rows of chunk 0, renamed into place when complete
+    <jobs_dir>/<job_id>/lock              flock held by the process scoring the job
+
+Completed parts are never rewritten, so a job interrupted by a restart resumes at its
+first missing part and results can be streamed while later chunks are still scoring.
+Each job is pinned to the model version it was submitted under.
+"""
+
+import csv
+import fcntl
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ml.lazy import lazy_import
+from services.heatmap import REGION_BOUNDS
+
+logger = logging.getLogger(__name__)
+
+# Only the scoring processes read the uploads; the web workers never import pandas
+pd = lazy_import('pandas')
+
+JOB_FILE = 'job.json'
+LOCK_FILE = 'lock'
+PART_FILE = 'part-{:05d}.csv'
+
+DEFAULT_CHUNKSIZE = 100_000
+COPY_BLOCK_BYTES = 1 << 20
+STREAM_BLOCK_BYTES = 1 << 16
+
+REQUIRED_COLUMNS = ['bhk', 'sqft', 'bath', 'lat', 'lng']
+TEXT_COLUMNS = ['locality', 'area_type']
+RESULT_COLUMNS = ['row', 'price_crore', 'price_low_crore', 'price_high_crore', 'error']
+
+QUEUED, RUNNING, COMPLETED, FAILED = 'queued', 'running', 'completed', 'failed'
+FINISHED = (COMPLETED, FAILED)
+
+# Same rules and messages as app.validate_features, applied per column
+INVALID_TYPES = 'Invalid field types. BHK and bath must be integers, sqft/lat/lng must be numbers'
+RANGE_CHECKS = [
+    ('bhk', 1, 10, 'BHK must be between 1 and 10'),
+    ('sqft', 100, 10000, 'Square feet must be between 100 and 10000'),
+    ('bath', 1, 10, 'Bathrooms must be between 1 and 10'),
+]
+OUTSIDE_REGION = 'Coordinates must be within Bangalore region'
+
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadTooLarge(ValueError):
+    """The upload exceeded the configured size limit"""
+
+
+def _now() -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def upload_format(filename: Optional[str] = None, content_type: Optional[str] = None) -> str:
+    """'parquet' for .parquet/.pq names or Parquet content types, else 'csv'"""
+    name = (filename or '').lower()
+    if name.endswith(('.parquet', '.pq')) or 'parquet' in (content_type or '').lower():
+        return 'parquet'
+    return 'csv'
+
+
+def input_path(job_dir: str, fmt: str) -> str:
+    return os.path.join(job_dir, f'input.{fmt}')
+
+
+def part_path(job_dir: str, index: int) -> str:
+    return os.path.join(job_dir, PART_FILE.format(index))
+
+
+def read_job(job_dir: str) -> Dict:
+    with open(os.path.join(job_dir, JOB_FILE)) as f:
+        return json.load(f)
+
+
+def write_job(job_dir: str, job: Dict):
+    """Replace job.json atomically, so readers in other processes never see a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=job_dir, prefix='.job-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(job, f)
+    os.replace(tmp_path, os.path.join(job_dir, JOB_FILE))
+
+
+def _try_lock(job_dir: str) -> Optional[int]:
+    """Take the job's scoring lock without blocking; returns the fd, or None if held elsewhere"""
+    fd = os.open(os.path.join(job_dir, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _unlock(fd: int):
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+def is_locked(job_dir: str) -> bool:
+    """True while some process is scoring the job (the lock dies with its process)"""
+    fd = _try_lock(job_dir)
+    if fd is None:
+        return True
+    _unlock(fd)
+    return False
+
+
+def input_columns(path: str, fmt: str) -> List[str]:
+    """Column names of an upload, read from the CSV header or the Parquet schema"""
+    if fmt == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError('Parquet uploads need the pyarrow package; upload a CSV instead') from None
+        return list(pq.ParquetFile(path).schema_arrow.names)
+    with open(path, newline='', encoding='utf-8-sig', errors='replace') as f:
+        header = next(csv.reader(f), [])
+    return [name.strip() for name in header]
+
+
+def count_rows(path: str, fmt: str) -> int:
+    """Data rows in an upload, for progress (CSV rows are counted by newline, so an estimate)"""
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return int(pq.ParquetFile(path).metadata.num_rows)
+    lines, last = 0, b'\n'
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(COPY_BLOCK_BYTES), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def iter_chunks(path: str, fmt: str, chunksize: int) -> Iterator:
+    """DataFrames of at most chunksize rows holding the input columns, in file order"""
+    wanted = set(REQUIRED_COLUMNS + TEXT_COLUMNS)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        columns = [name for name in parquet.schema_arrow.names if name in wanted]
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    reader = pd.read_csv(path, chunksize=chunksize, usecols=lambda name: name.strip() in wanted,
+                         dtype={name: str for name in TEXT_COLUMNS}, encoding='utf-8-sig')
+    for chunk in reader:
+        yield chunk.rename(columns=str.strip)
+
+
+def score_chunk(predictor, chunk, first_row: int) -> Tuple[object, int]:
+    """
+    Validate and score one chunk in a single predict_batch call
+
+    Returns:
+        Tuple of (result DataFrame with RESULT_COLUMNS, number of rows that failed validation)
+    """
+    n = len(chunk)
+    values = {name: pd.to_numeric(chunk[name], errors='coerce').to_numpy(dtype=np.float64)
+              for name in REQUIRED_COLUMNS}
+    # int() truncation, as app.validate_profile applies to bhk and bath
+    values['bhk'] = np.trunc(values['bhk'])
+    values['bath'] = np.trunc(values['bath'])
+
+    checks = [(~np.isfinite(np.column_stack(list(values.values()))).all(axis=1), INVALID_TYPES)]
+    checks += [((values[name] < low) | (values[name] > high), message) for name, low, high, message in RANGE_CHECKS]
+    checks.append(((values['lat'] < REGION_BOUNDS['south']) | (values['lat'] > REGION_BOUNDS['north']) |
+                   (values['lng'] < REGION_BOUNDS['west']) | (values['lng'] > REGION_BOUNDS['east']),
+                   OUTSIDE_REGION))
+    # Assigned in reverse so each row reports the first check it fails
+    errors = np.full(n, None, dtype=object)
+    valid = np.ones(n, dtype=bool)
+    for failed, message in reversed(checks):
+        errors[failed] = message
+        valid &= ~failed
+
+    prices = {name: np.full(n, np.nan) for name in RESULT_COLUMNS[1:4]}
+    if valid.any():
+        columns = {name: column[valid] for name, column in values.items()}
+        for name in TEXT_COLUMNS:
+            if name in chunk:
+                text = chunk[name].astype(object)
+                columns[name] = text.where(text.notna(), None).to_numpy()[valid]
+        batch = predictor.predict_batch(columns)
+        for name in prices:
+            if name in batch:
+                prices[name][valid] = batch[name]
+
+    result = pd.DataFrame({'row': np.arange(first_row, first_row + n), **prices, 'error': errors},
+                          columns=RESULT_COLUMNS)
+    return result, int(n - valid.sum())
+
+
+_predictors = {}
+
+
+def _load_predictor(artifacts_dir: str, version: Optional[str]):
+    """Predictor for a pinned bundle version, kept for later jobs in the same process"""
+    from ml.inference import RealEstatePricePredictor
+    if version is None:
+        return RealEstatePricePredictor(artifacts_dir)
+    key = (artifacts_dir, version)
+    if key not in _predictors:
+        _predictors[key] = RealEstatePricePredictor(artifacts_dir, version)
+    return _predictors[key]
+
+
+def run_job(job_dir: str, artifacts_dir: str) -> Optional[str]:
+    """
+    Score a job's remaining chunks; the process pool entry point
+
+    Returns the job's final status, or None if another process holds its lock.
+    """
+    lock = _try_lock(job_dir)
+    if lock is None:
+        return None
+    try:
+        job = read_job(job_dir)
+        if job['status'] in FINISHED:
+            return job['status']
+        try:
+            predictor = _load_predictor(artifacts_dir, job['model_version'])
+            path = input_path(job_dir, job['format'])
+            if job['rows_total'] is None:
+                job['rows_total'] = count_rows(path, job['format'])
+            job.update(status=RUNNING, model_version=predictor.version,
+                       started_at=job['started_at'] or _now(), updated_at=_now())
+            write_job(job_dir, job)
+
+            first_row = 0
+            for index, chunk in enumerate(iter_chunks(path, job['format'], job['chunksize'])):
+                # Parts written before a restart are complete; only their row count is needed
+                if index >= job['chunks_done']:
+                    result, n_failed = score_chunk(predictor, chunk, first_row)
+                    tmp_path = part_path(job_dir, index) + '.tmp'
+                    result.to_csv(tmp_path, header=False, index=False)
+                    os.replace(tmp_path, part_path(job_dir, index))
+                    job.update(rows_done=first_row + len(chunk), chunks_done=index + 1,
+                               rows_failed=job['rows_failed'] + n_failed, updated_at=_now())
+                    write_job(job_dir, job)
+                first_row += len(chunk)
+            job.update(status=COMPLETED, rows_total=job['rows_done'], finished_at=_now(), updated_at=_now())
+        except Exception as e:
+            logger.error(f"Scoring job {job['id']} failed: {e}")
+            job.update(status=FAILED, error=str(e), finished_at=_now(), updated_at=_now())
+        write_job(job_dir, job)
+        return job['status']
+    finally:
+        _unlock(lock)
+
+
+class ScoringJobs:
+    """
+    Job store and local process pool for asynchronous scoring
+
+    Args:
+        jobs_dir: Directory holding one subdirectory per job
+        artifacts_dir: Model artifacts the scoring processes load
+        workers: Scoring processes; 0 scores in the submitting thread (tests, debugging)
+        chunksize: Rows scored per chunk (and per result part)
+        max_upload_bytes: Largest accepted upload
+    """
+
+    def __init__(self, jobs_dir: str, artifacts_dir: str = 'artifacts', workers: int = 1,
+                 chunksize: int = DEFAULT_CHUNKSIZE, max_upload_bytes: Optional[int] = None):
+        self.jobs_dir = jobs_dir
+        self.artifacts_dir = artifacts_dir
+        self.workers = workers
+        self.chunksize = chunksize
+        self.max_upload_bytes = max_upload_bytes
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _job_dir(self, job_id: str) -> Optional[str]:
+        if not isinstance(job_id, str) or not _JOB_ID.match(job_id):
+            return None
+        job_dir = os.path.join(self.jobs_dir, job_id)
+        return job_dir if os.path.isfile(os.path.join(job_dir, JOB_FILE)) else None
+
+    def create(self, stream, filename: Optional[str] = None, content_type: Optional[str] = None,
+               model_version: Optional[str] = None) -> Dict:
+        """
+        Save an uploaded file stream as a new job and queue it
+
+        Raises:
+            UploadTooLarge: The stream is longer than max_upload_bytes
+            ValueError: The upload is empty or lacks a required column
+        """
+        fmt = upload_format(filename, content_type)
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(job_dir)
+        path = input_path(job_dir, fmt)
+        try:
+            size = 0
+            with open(path, 'wb') as f:
+                for block in iter(lambda: stream.read(COPY_BLOCK_BYTES), b''):
+                    size += len(block)
+                    if self.max_upload_bytes is not None and size > self.max_upload_bytes:
+                        raise UploadTooLarge(f'Upload too large: at most {self.max_upload_bytes} bytes allowed')
+                    f.write(block)
+            if size == 0:
+                raise ValueError('Upload is empty')
+            missing = [name for name in REQUIRED_COLUMNS if name not in input_columns(path, fmt)]
+            if missing:
+                raise ValueError(f'Missing required columns: {missing}')
+        except Exception:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+
+        job = {
+            'id': job_id, 'status': QUEUED, 'format': fmt, 'input_bytes': size, 'chunksize': self.chunksize,
+            'model_version': model_version, 'rows_total': None, 'rows_done': 0, 'rows_failed': 0,
+            'chunks_done': 0, 'error': None, 'created_at': _now(), 'started_at': None, 'finished_at': None,
+            'updated_at': _now(),
+        }
+        write_job(job_dir, job)
+        logger.info(f"Queued scoring job {job_id} ({fmt}, {size} bytes)")
+        self._submit(job_dir)
+        return self._with_progress(read_job(job_dir))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Job status and progress, or None for an unknown id"""
+        job_dir = self._job_dir(job_id)
+        if job_dir is None:
+            return None
+        job = read_job(job_dir)
+        if job['status'] == RUNNING and not is_locked(job_dir):
+            # Its scoring process died without a restart; pick the job up again
+            logger.warning(f"Scoring job {job_id} lost its worker; resuming")
+            self._submit(job_dir)
+        return self._with_progress(job)
+
+    @staticmethod
+    def _with_progress(job: Dict) -> Dict:
+        total = job['rows_total']
+        progress = 1.0 if job['status'] == COMPLETED else (min(job['rows_done'] / total, 1.0) if total else 0.0)
+        return dict(job, progress=round(progress, 4))
+
+    def results(self, job_id: str, follow: bool = False, timeout: float = 600.0,
+                poll_interval: float = 0.25) -> Optional[Iterator[bytes]]:
+        """
+        CSV of the scored rows so far, as a byte stream (None for an unknown id)
+
+        With follow, the stream waits for parts still being scored and ends when the job
+        finishes or after timeout seconds.
+        """
+        job_dir = self._job_dir(job_id)
+        if job_dir is None:
+            return None
+
+        def stream():
+            yield (','.join(RESULT_COLUMNS) + '\n').encode()
+            deadline = time.monotonic() + timeout
+            index = 0
+            while True:
+                path = part_path(job_dir, index)
+                if os.path.exists(path):
+                    with open(path, 'rb') as f:
+                        yield from iter(lambda: f.read(STREAM_BLOCK_BYTES), b'')
+                    index += 1
+                    continue
+                # job.json is updated after each part lands, so a finished job has all its parts
+                finished = read_job(job_dir)['status'] in FINISHED
+                if finished and os.path.exists(path):
+                    continue
+                if finished or not follow or time.monotonic() > deadline:
+                    return
+                time.sleep(poll_interval)
+
+        return stream()
+
+    def delete(self, job_id: str) -> Optional[bool]:
+        """Remove a job's files; False while it is being scored, None for an unknown id"""
+        job_dir = self._job_dir(job_id)
+        if job_dir is None:
+            return None
+        if is_locked(job_dir):
+            return False
+        shutil.rmtree(job_dir, ignore_errors=True)
+        return True
+
+    def resume(self) -> int:
+        """Queue every unfinished job no other process is scoring; returns how many"""
+        if not os.path.isdir(self.jobs_dir):
+            return 0
+        resumed = 0
+        for job_id in sorted(os.listdir(self.jobs_dir)):
+            job_dir = self._job_dir(job_id)
+            if job_dir is None:
+                continue
+            if read_job(job_dir)['status'] not in FINISHED and not is_locked(job_dir):
+                self._submit(job_dir)
+                resumed += 1
+        if resumed:
+            logger.info(f"Resumed {resumed} unfinished scoring jobs")
+        return resumed
+
+    def _submit(self, job_dir: str):
+        if self.workers <= 0:
+            run_job(job_dir, self.artifacts_dir)
+            return
+        with self._lock:
+            for attempt in range(2):
+                if self._pool is None:
+                    # spawn, not fork: the web worker's threads and locks are not copied into scorers
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+                try:
+                    future = self._pool.submit(run_job, job_dir, self.artifacts_dir)
+                    break
+                except BrokenProcessPool:
+                    # A scoring process was killed; start a fresh pool
+                    self._pool = None
+                    if attempt:
+                        raise
+        future.add_done_callback(_log_failure)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error(f"Scoring process failed: {error}")
+
+
+def scoring_jobs_from_env(artifacts_dir: str = 'artifacts') -> ScoringJobs:
+    """Build the job store from SCORING_JOBS_* environment variables"""
+    max_upload_mb = float(os.getenv('SCORING_JOBS_MAX_UPLOAD_MB', '2048'))
+    return ScoringJobs(
+        jobs_dir=os.getenv('SCORING_JOBS_DIR', 'cache/jobs'),
+        artifacts_dir=artifacts_dir,
+        workers=int(os.getenv('SCORING_JOBS_WORKERS', '1')),
+        chunksize=int(os.getenv('SCORING_JOBS_CHUNKSIZE', str(DEFAULT_CHUNKSIZE))),
+        max_upload_bytes=int(max_upload_mb * 1024 * 1024)
+    )
@@ -0,0 +1,314 @@
+"""
+Locality autosuggest
+In-memory prefix index over Bangalore locality names (the training data's locations plus
+cached geocodes) for keystroke-driven suggestions without a HERE call per keystroke.
+
+Exact prefixes are found by bisecting a sorted list of word-start suffixes ("main road"
+for "Whitefield Main Road"). Typos are tolerated with a precomputed single-deletion
+neighbourhood of every name prefix (SymSpell), stored as a sorted array of string hashes:
+a query and its deletions are a handful of searchsorted probes instead of an edit
+distance against every name. The arrays are plain numpy, so a preloaded gunicorn master
+shares them with its workers.
+"""
+
+import bisect
+import csv
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from services.geocoding import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Prefix lengths covered by the typo index; longer queries are matched on their first
+# MAX_FUZZY_PREFIX characters, shorter ones only by exact prefix
+MIN_FUZZY_PREFIX = 3
+MAX_FUZZY_PREFIX = 12
+
+# Upper bound on exact-prefix rows scanned for one-character queries
+MAX_PREFIX_SCAN = 2000
+
+# New entries go into a small pending table searched next to the main one; past this many
+# typo postings it is merged into the main table by a background thread
+MAX_PENDING_POSTINGS = 8192
+
+
+class _Tables(NamedTuple):
+    """One immutable generation of lookup tables"""
+    suffixes: List[Tuple[str, int, bool]]  # sorted (word-start suffix, entry id, is the full name)
+    hashes: np.ndarray  # sorted deletion-variant hashes
+    postings: np.ndarray  # packed (entry id, position, full name) per hash
+
+
+def _build_tables(suffixes: List[Tuple[str, int, bool]], hashes: np.ndarray, postings: np.ndarray) -> _Tables:
+    order = np.argsort(hashes, kind='stable')
+    return _Tables(sorted(suffixes), hashes[order], postings[order])
+
+
+_EMPTY_TABLES = _Tables([], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+
+def _deletes(text: str) -> Iterable[Tuple[str, int]]:
+    """text itself (position -1) and every single-character deletion with its position"""
+    yield text, -1
+    for i in range(len(text)):
+        yield text[:i] + text[i + 1:], i
+
+
+def _variant_postings(entry_id: int, suffix: str, full_name: bool) -> Tuple[List[int], List[int]]:
+    """Hashes of every deletion variant of the suffix's prefixes, with packed postings"""
+    hashes, postings = [], []
+    for length in range(MIN_FUZZY_PREFIX, min(len(suffix), MAX_FUZZY_PREFIX) + 1):
+        for variant, position in _deletes(suffix[:length]):
+            hashes.append(hash(variant))
+            postings.append(_pack(entry_id, position, full_name))
+    return hashes, postings
+
+
+def _pack(entry_id: int, position: int, full_name: bool) -> int:
+    return (entry_id << 5) | ((position + 1) << 1) | int(full_name)
+
+
+class SuggestIndex:
+    """Ranked prefix and typo-tolerant lookup over locality names"""
+
+    def __init__(self):
+        self._labels: List[str] = []
+        self._weights: List[float] = []
+        self._positions: List[Optional[Tuple[float, float]]] = []
+        self._sources: List[str] = []
+        self._ids: Dict[str, int] = {}
+        # (main, pending) tables, replaced with one assignment so readers never see a
+        # half-merged index; pending is rebuilt from the rows added since the last merge
+        self._tables: Tuple[_Tables, _Tables] = (_EMPTY_TABLES, _EMPTY_TABLES)
+        self._pending_rows: List[Tuple[List[Tuple[str, int, bool]], np.ndarray, np.ndarray]] = []
+        self._lock = threading.Lock()
+        self._merge_lock = threading.Lock()
+        self._merging = False
+
+    def __len__(self):
+        return len(self._labels)
+
+    @classmethod
+    def from_names(cls, counts: Mapping[str, float]) -> 'SuggestIndex':
+        """Build from {locality name: popularity weight}"""
+        index = cls()
+        index.add_many((name, weight) for name, weight in counts.items())
+        return index
+
+    @classmethod
+    def from_csv(cls, path: str, column: str = 'location') -> 'SuggestIndex':
+        """Build from the distinct values of a CSV column, weighted by their row counts"""
+        with open(path, newline='', encoding='utf-8') as f:
+            counts = Counter((row.get(column) or '').strip() for row in csv.DictReader(f))
+        counts.pop('', None)
+        index = cls.from_names(counts)
+        logger.info(f"Built suggest index with {len(index)} localities from {path}")
+        return index
+
+    def add(self, label: str, weight: float = 1.0, lat: Optional[float] = None, lng: Optional[float] = None,
+            source: str = 'locality', key: Optional[str] = None) -> Optional[int]:
+        """
+        Add a name, or merge into the entry with the same normalized key
+
+        Merging adds the weight and fills in coordinates, so a cached geocode of
+        "Whitefield" gives the training locality "Whitefield" a position.
+        """
+        return self.add_many([(label, weight, lat, lng, source, key)])[0]
+
+    def add_many(self, rows: Iterable[tuple]) -> List[Optional[int]]:
+        """
+        Add (label, weight[, lat, lng, source, key]) rows
+
+        New names go into the pending table, so a geocode miss only re-sorts the few
+        thousand pending postings; a large batch (startup) is merged into the main table
+        at once, otherwise a full pending table is merged by a background thread.
+        """
+        ids, suffixes, hashes, postings = [], [], [], []
+        start_merge = False
+        with self._lock:
+            for row in rows:
+                entry_id, new_suffixes, new_hashes, new_postings = self._add_entry(*row)
+                ids.append(entry_id)
+                suffixes.extend(new_suffixes)
+                hashes.extend(new_hashes)
+                postings.extend(new_postings)
+            if suffixes:
+                self._pending_rows.append(
+                    (suffixes, np.array(hashes, dtype=np.int64), np.array(postings, dtype=np.int64)))
+                self._publish(self._tables[0])
+                if (len(hashes) < MAX_PENDING_POSTINGS and not self._merging
+                        and len(self._tables[1].hashes) >= MAX_PENDING_POSTINGS):
+                    start_merge = self._merging = True
+        if len(hashes) >= MAX_PENDING_POSTINGS:
+            self.merge()
+        elif start_merge:
+            threading.Thread(target=self._background_merge, name='suggest-merge', daemon=True).start()
+        return ids
+
+    def merge(self):
+        """Fold the pending table into the main table, sorting outside the writer lock"""
+        with self._merge_lock:
+            with self._lock:
+                main = self._tables[0]
+                rows = list(self._pending_rows)
+            if not rows:
+                return
+            merged = _build_tables(main.suffixes + [suffix for row in rows for suffix in row[0]],
+                                   np.concatenate([main.hashes] + [row[1] for row in rows]),
+                                   np.concatenate([main.postings] + [row[2] for row in rows]))
+            with self._lock:
+                del self._pending_rows[:len(rows)]
+                self._publish(merged)
+
+    def _background_merge(self):
+        try:
+            self.merge()
+        except Exception as e:
+            logger.warning(f"Suggest index merge failed: {e}")
+        finally:
+            with self._lock:
+                self._merging = False
+
+    def _publish(self, main: _Tables):
+        """Rebuild the pending table from the pending rows and swap in (main, pending); needs _lock"""
+        pending = _EMPTY_TABLES
+        if self._pending_rows:
+            pending = _build_tables([suffix for row in self._pending_rows for suffix in row[0]],
+                                    np.concatenate([row[1] for row in self._pending_rows]),
+                                    np.concatenate([row[2] for row in self._pending_rows]))
+        self._tables = (main, pending)
+
+    def _add_entry(self, label, weight=1.0, lat=None, lng=None, source='locality', key=None):
+        key = key or normalize_query(label)
+        if not key:
+            return None, (), (), ()
+        entry_id = self._ids.get(key)
+        if entry_id is not None:
+            self._weights[entry_id] += weight
+            if lat is not None and lng is not None:
+                self._positions[entry_id] = (float(lat), float(lng))
+            return entry_id, (), (), ()
+
+        entry_id = len(self._labels)
+        self._labels.append(label.strip())
+        self._weights.append(float(weight))
+        self._positions.append((float(lat), float(lng)) if lat is not None and lng is not None else None)
+        self._sources.append(source)
+        self._ids[key] = entry_id
+
+        suffixes, hashes, postings = [], [], []
+        words = key.split(' ')
+        for start in range(len(words)):
+            suffix = ' '.join(words[start:])
+            suffixes.append((suffix, entry_id, start == 0))
+            new_hashes, new_postings = _variant_postings(entry_id, suffix, start == 0)
+            hashes.extend(new_hashes)
+            postings.extend(new_postings)
+        return entry_id, suffixes, hashes, postings
+
+    def add_geocode(self, query: str, result: Mapping) -> Optional[int]:
+        """Index a geocode result under its query, keeping its coordinates"""
+        ids = self.add_geocodes([(query, result)])
+        return ids[0] if ids else None
+
+    def add_geocodes(self, results: Iterable[Tuple[str, Mapping]]) -> List[Optional[int]]:
+        """Index (query, geocode result) pairs, e.g. the contents of the geocode cache"""
+        rows = []
+        for query, result in results:
+            if not isinstance(result, Mapping) or result.get('lat') is None:
+                continue
+            label = result.get('label') or result.get('locality') or query
+            rows.append((label, 0.0, result['lat'], result['lng'], 'geocode', normalize_query(query)))
+        return self.add_many(rows)
+
+    def lookup(self, query: str) -> Optional[Dict]:
+        """The entry whose normalized key equals the query's, if it has coordinates"""
+        entry_id = self._ids.get(normalize_query(query or ''))
+        if entry_id is None or self._positions[entry_id] is None:
+            return None
+        lat, lng = self._positions[entry_id]
+        return {'label': self._labels[entry_id], 'lat': lat, 'lng': lng, 'source': self._sources[entry_id]}
+
+    def suggest(self, query: str, limit: int = 5) -> List[Dict]:
+        """
+        Best matches for a partial query
+
+        Ranked by edit distance (exact prefixes first), then full-name over word-start
+        matches, then popularity.
+        """
+        q = normalize_query(query or '')
+        if not q:
+            return []
+
+        # (distance, word-start match, -weight) per entry, keeping each entry's best
+        best: Dict[int, Tuple[int, int, float]] = {}
+
+        def consider(entry_id, distance, full_name):
+            rank = (distance, 0 if full_name else 1, -self._weights[entry_id])
+            if entry_id not in best or rank < best[entry_id]:
+                best[entry_id] = rank
+
+        tables = self._tables
+        for suffixes, _, _ in tables:
+            slot = bisect.bisect_left(suffixes, (q,))
+            end = min(len(suffixes), slot + MAX_PREFIX_SCAN)
+            while slot < end and suffixes[slot][0].startswith(q):
+                _, entry_id, full_name = suffixes[slot]
+                consider(entry_id, 0, full_name)
+                slot += 1
+
+        if len(best) < limit and len(q) >= MIN_FUZZY_PREFIX:
+            probes = list(_deletes(q[:MAX_FUZZY_PREFIX]))
+            probe_hashes = np.array([hash(variant) for variant, _ in probes], dtype=np.int64)
+            for _, hashes, postings in tables:
+                lo = np.searchsorted(hashes, probe_hashes, side='left')
+                hi = np.searchsorted(hashes, probe_hashes, side='right')
+                for (_, query_position), start, stop in zip(probes, lo.tolist(), hi.tolist()):
+                    for packed in postings[start:stop].tolist():
+                        entry_id, name_position, full_name = packed >> 5, ((packed >> 1) & 15) - 1, packed & 1
+                        if query_position < 0 and name_position < 0:
+                            continue  # an exact prefix, already found above
+                        if query_position < 0 or name_position < 0:
+                            distance = 1  # one inserted or omitted character
+                        else:
+                            # Same position: substitution; adjacent: transposition
+                            distance = 1 if abs(query_position - name_position) <= 1 else 2
+                        consider(entry_id, distance, bool(full_name))
+
+        ranked = sorted(best.items(), key=lambda item: (item[1], len(self._labels[item[0]])))[:limit]
+        suggestions = []
+        for entry_id, (distance, _, _) in ranked:
+            suggestion = {'label': self._labels[entry_id], 'source': self._sources[entry_id]}
+            if self._positions[entry_id] is not None:
+                suggestion['lat'], suggestion['lng'] = self._positions[entry_id]
+            if distance:
+                suggestion['fuzzy'] = True
+            suggestions.append(suggestion)
+        return suggestions
+
+    def stats(self) -> Dict:
+        return {
+            'entries': len(self._labels),
+            'with_coordinates': sum(p is not None for p in self._positions),
+            'fuzzy_variants': sum(len(tables.hashes) for tables in self._tables),
+            'pending_variants': len(self._tables[1].hashes)
+        }
+
+
+def here_suggestions(here_response: Mapping, limit: int) -> List[Dict]:
+    """Map a HERE Autosuggest response to suggestion dicts (items without a position are skipped)"""
+    suggestions = []
+    for item in here_response.get('items') or []:
+        position = item.get('position')
+        label = item.get('title') or (item.get('address') or {}).get('label')
+        if not position or not label:
+            continue
+        suggestions.append({'label': label, 'lat': position['lat'], 'lng': position['lng'], 'source': 'here'})
+        if len(suggestions) >= limit:
+            break
+    return suggestions
@@ -75,7 +75,8 @@ class RealEstatePredictor {
                 sqft: sqft,
                 bath: bath,
                 lat: locationData.lat,
-                lng: locationData.lng
+                lng: locationData.lng,
+                locality: locationData.locality
             });
             
             // Step 4: Display results
@@ -4,6 +4,8 @@ Tests for the Flask API endpoints
 
 import pytest
 import json
+import numpy as np
+import requests
 import sys
 import os
 from unittest.mock import patch, MagicMock
@@ -12,6 +14,37 @@ from unittest.mock import patch, MagicMock
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from app import app
+from ml.inference import RealEstatePricePredictor
+from ml.train_model import preprocess, save_artifacts, train_model
+from services.cache import LRUCache
+from services.geocoding import GeocodeCache
+from services.heatmap import HeatmapCache
+from services.prediction_cache import PredictionCache
+from services.rate_limit import RateLimiter
+from services.scoring_jobs import QUEUED, ScoringJobs
+from services.here_client import CircuitBreaker, HereClient
+from services.suggest import SuggestIndex
+
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'Data', 'household.csv')
+
+
+@pytest.fixture(scope='module')
+def trained_predictor(tmp_path_factory):
+    """A model trained on the household data into a temporary artifacts directory"""
+    artifacts_dir = str(tmp_path_factory.mktemp('artifacts'))
+    _, location_encoder, X, y = preprocess(DATA_PATH, cache_dir=None)
+    model, scaler, _, _, prediction_stats = train_model(X, y)
+    save_artifacts(model, scaler, location_encoder, list(X.columns), artifacts_dir,
+                   prediction_stats=prediction_stats)
+    return RealEstatePricePredictor(artifacts_dir)
+
+
+@pytest.fixture(autouse=True)
+def predictor(trained_predictor):
+    """Serve the trained model; tests patching app.predictor themselves take precedence"""
+    with patch('app.predictor', trained_predictor):
+        yield trained_predictor
 
 
 @pytest.fixture
@@ -22,6 +55,47 @@ def client():
         yield client
 
 
+@pytest.fixture(autouse=True)
+def rate_limiter():
+    """Give every test private, full client and HERE quota buckets"""
+    limiter = RateLimiter(None)
+    with patch('app.rate_limiter', limiter):
+        yield limiter
+
+
+@pytest.fixture(autouse=True)
+def here_client(rate_limiter):
+    """Give every test a fresh HERE client with a closed circuit"""
+    client = HereClient('test_key', breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60),
+                        rate_limiter=rate_limiter)
+    with patch('app.here_client', client):
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def geocode_cache():
+    """Give every test a fresh, memory-only geocode cache"""
+    cache = GeocodeCache(disk_path=None)
+    with patch('app.geocode_cache', cache):
+        yield cache
+
+
+@pytest.fixture(autouse=True)
+def prediction_cache():
+    """Give every test a fresh, memory-only prediction cache"""
+    cache = PredictionCache(disk_path=None)
+    with patch('app.prediction_cache', cache):
+        yield cache
+
+
+@pytest.fixture(autouse=True)
+def suggest_index():
+    """Give every test a small suggest index and an empty HERE suggestion cache"""
+    index = SuggestIndex.from_names({'Whitefield': 540, 'Koramangala': 72, 'Hebbal': 180})
+    with patch('app.suggest_index', index), patch('app.here_suggest_cache', LRUCache()):
+        yield index
+
+
 class TestAPI:
     
     def test_index_route(self, client):
@@ -39,8 +113,9 @@ class TestAPI:
         assert 'status' in data
         assert 'model_loaded' in data
         assert 'here_api_configured' in data
+        assert 'version' in data['model']
     
-    @patch('app.requests.get')
+    @patch('app.here_client.session.get')
     @patch('app.HERE_API_KEY', 'test_key')
     def test_geocode_success(self, mock_get, client):
         """Test successful geocoding"""
@@ -65,6 +140,83 @@ class TestAPI:
         assert 'lng' in data
         assert data['lat'] == 12.9716
         assert data['lng'] == 77.5946
+        assert data['locality'] == 'Bangalore'
+    
+    @patch('app.here_client.session.get')
+    @patch('app.HERE_API_KEY', 'test_key')
+    def test_geocode_field_selection(self, mock_get, client):
+        """Test the default response is compact and fields= selects what is returned"""
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            'items': [{
+                'position': {'lat': 12.9698, 'lng': 77.7500},
+                'title': 'Whitefield, Bengaluru',
+                'address': {'district': 'Whitefield', 'label': 'Whitefield, Bengaluru, Karnataka, India'}
+            }]
+        }
+        mock_get.return_value = mock_response
+        
+        default = client.post('/api/geocode', data=json.dumps({'q': 'Whitefield'}),
+                              content_type='application/json')
+        selected = client.post('/api/geocode?fields=lat,lng,raw', data=json.dumps({'q': 'Whitefield'}),
+                               content_type='application/json')
+        unknown = client.post('/api/geocode', data=json.dumps({'q': 'Whitefield', 'fields': ['lat', 'bbox']}),
+                              content_type='application/json')
+        
+        assert json.loads(default.data) == {'lat': 12.9698, 'lng': 77.75, 'label': 'Whitefield, Bengaluru',
+                                            'locality': 'Whitefield'}
+        assert set(json.loads(selected.data)) == {'lat', 'lng', 'raw'}
+        assert unknown.status_code == 400
+        assert mock_get.call_count == 1
+    
+    @patch('app.here_client.session.get')
+    @patch('app.HERE_API_KEY', 'test_key')
+    def test_geocode_cache_hit_skips_upstream(self, mock_get, client):
+        """Test repeat lookups of the same locality are served from cache"""
+        mock_response = MagicMock()
+        mock_response.ok = True
+        mock_response.json.return_value = {
+            'items': [{
+                'position': {'lat': 12.9698, 'lng': 77.7500},
+                'title': 'Whitefield, Bengaluru'
+            }]
+        }
+        mock_get.return_value = mock_response
+        
+        first = client.post('/api/geocode',
+                          data=json.dumps({'q': 'Bangalore Whitefield'}),
+                          content_type='application/json')
+        second = client.post('/api/geocode',
+                           data=json.dumps({'q': '  whitefield, bengaluru '}),
+                           content_type='application/json')
+        
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert json.loads(second.data)['lat'] == 12.9698
+        assert mock_get.call_count == 1
+        
+        health = json.loads(client.get('/health').data)
+        assert health['geocode_cache']['hits'] == 1
+    
+    @patch('app.here_client.session.get')
+    @patch('app.HERE_API_KEY', 'test_key')
+    def test_geocode_circuit_opens_after_failures(self, mock_get, client):
+        """Test repeated HERE outages trip the breaker and later calls fail fast"""
+        mock_get.side_effect = requests.exceptions.ConnectionError('HERE down')
+        
+        for query in ['Hebbal', 'Whitefield']:
+            response = client.post('/api/geocode',
+                                 data=json.dumps({'q': query}),
+                                 content_type='application/json')
+            assert response.status_code == 503
+        
+        response = client.post('/api/geocode',
+                             data=json.dumps({'q': 'Jayanagar'}),
+                             content_type='application/json')
+        
+        assert response.status_code == 503
+        assert 'Retry-After' in response.headers
+        assert mock_get.call_count == 2
     
     @patch('app.HERE_API_KEY', 'test_key')
     def test_geocode_missing_query(self, client):
@@ -88,7 +240,7 @@ class TestAPI:
         data = json.loads(response.data)
         assert 'error' in data
     
-    @patch('app.requests.get')
+    @patch('app.here_client.session.get')
     @patch('app.HERE_API_KEY', 'test_key')
     def test_geocode_address_not_found(self, mock_get, client):
         """Test geocoding when address is not found"""
@@ -105,6 +257,106 @@ class TestAPI:
         data = json.loads(response.data)
         assert 'error' in data
     
+    def test_suggest_local_matches(self, client, suggest_index):
+        """Test suggestions come from the local index, including typos and geocoded places"""
+        response = client.get('/api/suggest?q=kormangala')
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['source'] == 'local'
+        assert data['suggestions'][0]['label'] == 'Koramangala'
+        assert client.get('/api/suggest').status_code == 400
+        assert client.get('/api/suggest?q=wh&limit=50').status_code == 400
+    
+    @patch('app.here_client.session.get')
+    @patch('app.HERE_API_KEY', 'test_key')
+    def test_suggest_falls_back_to_here(self, mock_get, client):
+        """Test HERE Autosuggest is only called, once, for queries with no local match"""
+        mock_response = MagicMock()
+        mock_response.ok = True
+        mock_response.json.return_value = {'items': [
+            {'title': 'Indiranagar, Bengaluru', 'position': {'lat': 12.9719, 'lng': 77.6412}}
+        ]}
+        mock_get.return_value = mock_response
+        
+        local = json.loads(client.get('/api/suggest?q=white').data)
+        first = json.loads(client.get('/api/suggest?q=indiranagar').data)
+        second = json.loads(client.get('/api/suggest?q=Indiranagar').data)
+        
+        assert local['source'] == 'local'
+        assert first['source'] == second['source'] == 'here'
+        assert first['suggestions'] == [{'label': 'Indiranagar, Bengaluru', 'lat': 12.9719, 'lng': 77.6412,
+                                         'source': 'here'}]
+        assert mock_get.call_count == 1
+        assert 'autosuggest' in mock_get.call_args[0][0]
+    
+    @patch('app.here_client.session.get')
+    @patch('app.HERE_API_KEY', 'test_key')
+    def test_suggest_here_failure_degrades(self, mock_get, client):
+        """Test a HERE outage returns an empty suggestion list instead of an error"""
+        mock_get.side_effect = requests.exceptions.ConnectionError('down')
+        
+        response = client.get('/api/suggest?q=indiranagar')
+        
+        assert response.status_code == 200
+        assert json.loads(response.data)['suggestions'] == []
+    
+    @patch('app.HERE_API_KEY', 'test_key')
+    def test_client_rate_limit(self, client):
+        """Test a client over its request bucket gets 429 with Retry-After, others do not"""
+        with patch('app.rate_limiter', RateLimiter(None, client_rate=0.01, client_burst=2)):
+            statuses = [client.get('/api/suggest?q=white').status_code for _ in range(3)]
+            geocode = client.post('/api/geocode', data=json.dumps({'q': 'Hebbal'}), content_type='application/json')
+            other = client.get('/api/suggest?q=white', environ_base={'REMOTE_ADDR': '198.51.100.1'})
+        
+        assert statuses == [200, 200, 429]
+        assert geocode.status_code == 429
+        assert int(geocode.headers['Retry-After']) >= 100
+        assert other.status_code == 200
+    
+    @patch('app.predictor', None)
+    @patch('app.here_client.session.get')
+    @patch('app.HERE_API_KEY', 'test_key')
+    def test_geocode_degrades_when_here_quota_spent(self, mock_get, client, rate_limiter, suggest_index):
+        """Test a spent HERE budget serves known places locally and 503s the rest without calling HERE"""
+        suggest_index.add_geocode('Indiranagar', {'lat': 12.9719, 'lng': 77.6412, 'label': 'Indiranagar'})
+        suggest_index.add_geocode('Hebbal Kempapura', {'lat': 13.0455, 'lng': 77.5966, 'label': 'Hebbal Kempapura'})
+        rate_limiter.here_throttled(60)
+        
+        local = client.post('/api/geocode', data=json.dumps({'q': 'indiranagar, Bangalore'}),
+                            content_type='application/json')
+        unknown = client.post('/api/geocode', data=json.dumps({'q': 'Jayanagar'}), content_type='application/json')
+        # "Hebbal" only prefix-matches the geocoded "Hebbal Kempapura", a different place
+        prefix_only = client.post('/api/geocode', data=json.dumps({'q': 'Hebbal'}), content_type='application/json')
+        suggestions = client.get('/api/suggest?q=jayanagar')
+        
+        assert local.status_code == 200
+        assert local.headers['X-Geocode-Source'] == 'local'
+        assert json.loads(local.data) == {'lat': 12.9719, 'lng': 77.6412, 'label': 'Indiranagar',
+                                          'locality': 'Indiranagar'}
+        assert unknown.status_code == 503
+        assert 55 <= int(unknown.headers['Retry-After']) <= 60
+        assert prefix_only.status_code == 503
+        assert json.loads(suggestions.data) == {'query': 'jayanagar', 'suggestions': [], 'source': 'local'}
+        assert mock_get.call_count == 0
+    
+    @patch('app.predictor')
+    @patch('app.here_client.session.get')
+    @patch('app.HERE_API_KEY', 'test_key')
+    def test_geocode_here_429_uses_locality_centroid(self, mock_get, mock_predictor, client):
+        """Test a HERE 429 stops further calls and falls back to the training locality centroid"""
+        mock_get.return_value = MagicMock(ok=False, status_code=429, headers={'Retry-After': '30'})
+        mock_predictor.locality_index.centroid.side_effect = lambda name: (12.961, 77.638) if name == 'Domlur' else None
+        
+        first = client.post('/api/geocode', data=json.dumps({'q': 'Domlur'}), content_type='application/json')
+        second = client.post('/api/geocode', data=json.dumps({'q': 'Hebbal'}), content_type='application/json')
+        
+        assert first.status_code == 200
+        assert first.headers['X-Geocode-Source'] == 'local'
+        assert json.loads(first.data)['lat'] == 12.961
+        assert second.status_code == 503
+        assert mock_get.call_count == 1
+    
     @patch('app.predictor')
     def test_predict_success(self, mock_predictor, client):
         """Test successful price prediction"""
@@ -136,6 +388,42 @@ class TestAPI:
         assert 'price_crore' in data
         assert data['price_crore'] == 2.5
     
+    @patch('app.predictor')
+    def test_predict_repeat_payload_is_cached(self, mock_predictor, client):
+        """Test near-identical payloads hit the cache until the model version changes"""
+        mock_predictor.version = 'v1'
+        mock_predictor.predict.return_value = {'price_crore': 2.5, 'features_used': {}, 'model_version': 'v1'}
+        payload = {'bhk': 3, 'sqft': 1200, 'bath': 2, 'lat': 12.97161, 'lng': 77.59462}
+        nearby = dict(payload, sqft=1200.2, lat=12.97163)
+        
+        first = client.post('/api/predict', data=json.dumps(payload), content_type='application/json')
+        second = client.post('/api/predict', data=json.dumps(nearby), content_type='application/json')
+        
+        assert json.loads(first.data) == json.loads(second.data)
+        assert mock_predictor.predict.call_count == 1
+        assert mock_predictor.predict.call_args[0][0]['lat'] == 12.9716
+        
+        mock_predictor.version = 'v2'
+        client.post('/api/predict', data=json.dumps(payload), content_type='application/json')
+        assert mock_predictor.predict.call_count == 2
+        
+        health = json.loads(client.get('/health').data)
+        assert health['prediction_cache']['hits'] == 1
+        assert health['prediction_cache']['hit_rate'] == pytest.approx(1 / 3, abs=1e-3)
+    
+    @patch('app.predictor')
+    def test_predict_passes_locality_and_area_type(self, mock_predictor, client):
+        """Test optional locality and area_type fields are forwarded to the predictor"""
+        mock_predictor.predict.return_value = {'price_crore': 2.5, 'features_used': {}}
+        payload = {'bhk': 3, 'sqft': 1200, 'bath': 2, 'lat': 12.9716, 'lng': 77.5946, 'locality': 'Whitefield',
+                   'area_type': 'Plot  Area'}
+        
+        response = client.post('/api/predict', data=json.dumps(payload), content_type='application/json')
+        
+        assert response.status_code == 200
+        assert mock_predictor.predict.call_args[0][0]['locality'] == 'Whitefield'
+        assert mock_predictor.predict.call_args[0][0]['area_type'] == 'Plot  Area'
+    
     def test_predict_missing_fields(self, client):
         """Test prediction with missing required fields"""
         payload = {
@@ -197,6 +485,191 @@ class TestAPI:
         data = json.loads(response.data)
         assert 'error' in data
     
+    @patch('app.predictor')
+    def test_predict_batch_json_array(self, mock_predictor, client):
+        """Test batch prediction with a JSON array and per-row errors"""
+        mock_predictor.predict_batch.return_value = {'price_crore': [1.25, 2.5]}
+        
+        payload = [
+            {'bhk': 2, 'sqft': 1000, 'bath': 2, 'lat': 12.9716, 'lng': 77.5946},
+            {'bhk': 15, 'sqft': 1200, 'bath': 2, 'lat': 12.9716, 'lng': 77.5946},
+            {'bhk': 3, 'sqft': 1500, 'bath': 3, 'lat': 12.9716, 'lng': 77.5946},
+        ]
+        
+        response = client.post('/api/predict/batch',
+                             data=json.dumps(payload),
+                             content_type='application/json')
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['count'] == 3
+        assert data['succeeded'] == 2
+        assert data['failed'] == 1
+        assert data['results'][0] == {'index': 0, 'price_crore': 1.25}
+        assert 'error' in data['results'][1]
+        assert data['results'][2] == {'index': 2, 'price_crore': 2.5}
+        
+        # Only the valid rows reach the model, in a single call
+        mock_predictor.predict_batch.assert_called_once()
+        assert len(mock_predictor.predict_batch.call_args[0][0]) == 2
+    
+    @patch('app.predictor')
+    def test_predict_batch_response_is_compressed(self, mock_predictor, client):
+        """Test large responses are gzip-encoded when the client accepts it"""
+        import gzip
+        mock_predictor.predict_batch.side_effect = lambda rows: {'price_crore': np.full(len(rows), 1.25),
+                                                                 'model_version': 'v1'}
+        payload = [{'bhk': 2, 'sqft': 1000, 'bath': 2, 'lat': 12.9716, 'lng': 77.5946}] * 200
+        
+        plain = client.post('/api/predict/batch', data=json.dumps(payload), content_type='application/json')
+        compressed = client.post('/api/predict/batch', data=json.dumps(payload), content_type='application/json',
+                                 headers={'Accept-Encoding': 'gzip;q=1.0, identity;q=0.5'})
+        
+        assert 'Content-Encoding' not in plain.headers
+        assert compressed.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in compressed.headers['Vary']
+        assert len(compressed.data) < len(plain.data) / 5
+        assert json.loads(gzip.decompress(compressed.data)) == json.loads(plain.data)
+        assert json.loads(plain.data)['model_version'] == 'v1'
+    
+    @patch('app.predictor')
+    def test_predict_batch_intervals_and_explain(self, mock_predictor, client):
+        """Test per-row price ranges, and contributions only when ?explain=1 is given"""
+        mock_predictor.predict_batch.return_value = {
+            'price_crore': np.array([0.8]), 'model_version': 'v1',
+            'price_low_crore': np.array([0.5]), 'price_high_crore': np.array([1.3]), 'interval_level': 0.9,
+            'contributions_crore': np.array([[0.02, -0.01]]), 'feature_names': ['bhk', 'total_sqft'],
+            'baseline_crore': np.array([0.79])
+        }
+        payload = [{'bhk': 3, 'sqft': 1400, 'bath': 2, 'lat': 12.9716, 'lng': 77.5946}]
+        
+        response = client.post('/api/predict/batch?explain=1', data=json.dumps(payload),
+                               content_type='application/json')
+        
+        result = json.loads(response.data)['results'][0]
+        assert result['price_low_crore'] == 0.5 and result['price_high_crore'] == 1.3
+        assert result['contributions_crore'] == {'bhk': 0.02, 'total_sqft': -0.01, 'baseline': 0.79}
+        assert mock_predictor.predict_batch.call_args[1] == {'explain': True}
+    
+    @patch('app.predictor')
+    def test_predict_batch_ndjson(self, mock_predictor, client):
+        """Test batch prediction with an NDJSON body"""
+        mock_predictor.predict_batch.return_value = {'price_crore': [1.25]}
+        
+        body = '\n'.join([
+            json.dumps({'bhk': 2, 'sqft': 1000, 'bath': 2, 'lat': 12.9716, 'lng': 77.5946}),
+            '{not json',
+        ])
+        
+        response = client.post('/api/predict/batch',
+                             data=body,
+                             content_type='application/x-ndjson')
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['results'][0]['price_crore'] == 1.25
+        assert data['results'][1]['error'] == 'Invalid JSON line'
+    
+    @patch('app.predictor')
+    def test_predict_batch_invalid_body(self, mock_predictor, client):
+        """Test batch prediction rejects non-array bodies"""
+        response = client.post('/api/predict/batch',
+                             data=json.dumps({'bhk': 2}),
+                             content_type='application/json')
+        
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert 'error' in data
+    
+    @patch('app.predictor')
+    def test_heatmap_tile(self, mock_predictor, client):
+        """Test a heatmap tile is predicted in one batch call and then served from cache"""
+        mock_predictor.version = 'v1'
+        mock_predictor.predict_batch.side_effect = lambda columns: {'price_crore': np.full(len(columns['lat']), 1.5)}
+
+        with patch('app.heatmap_cache', HeatmapCache()):
+            first = client.get('/api/heatmap/tiles/12/2930/1899?bhk=3&sqft=1200&bath=2&size=8')
+            second = client.get('/api/heatmap/tiles/12/2930/1899?bhk=3&sqft=1200&bath=2&size=8')
+
+        assert first.status_code == 200
+        data = json.loads(first.data)
+        assert data['model_version'] == 'v1'
+        assert data['prices'][0] == [1.5] * 8
+        assert 'max-age' in first.headers['Cache-Control']
+        assert json.loads(second.data) == data
+        mock_predictor.predict_batch.assert_called_once()
+
+    @patch('app.predictor')
+    def test_heatmap_rejects_bad_requests(self, mock_predictor, client):
+        """Test heatmap validation of tile coordinates, profile and grid size"""
+        assert client.get('/api/heatmap/tiles/3/9/0?bhk=3&sqft=1200&bath=2').status_code == 400
+        assert client.get('/api/heatmap/tiles/12/2930/1899?bhk=30&sqft=1200&bath=2').status_code == 400
+        response = client.get('/api/heatmap?south=12.8&west=77.4&north=13.1&east=77.8'
+                              '&rows=1000&cols=1000&bhk=3&sqft=1200&bath=2')
+        assert response.status_code == 400
+        mock_predictor.predict_batch.assert_not_called()
+
+    def test_comparables(self, client):
+        """Test nearest training listings are returned with filters applied"""
+        from ml.comparables import ComparablesStore
+        store = ComparablesStore.from_columns([80, 120, 95, 300], [1200, 1500, 1300, 4000], [2, 3, 2, 4],
+                                              [2, 3, 2, 4], [12.9716, 12.975, 12.99, 12.972],
+                                              [77.5946, 77.6, 77.6, 77.595])
+        model = MagicMock(comparables=store, version='v1')
+        
+        with patch('app.predictor', model):
+            response = client.get('/api/comparables?lat=12.9716&lng=77.5946&k=5&bhk=2&sqft_max=1400')
+            invalid = client.get('/api/comparables?lat=12.9716&k=5')
+        
+        data = json.loads(response.data)
+        assert response.status_code == 200
+        assert data['count'] == 2 and data['model_version'] == 'v1'
+        assert [c['price_crore'] for c in data['comparables']] == [0.8, 0.95]
+        assert data['comparables'][0]['distance_m'] == 0.0
+        assert invalid.status_code == 400
+    
+    @patch('services.scoring_jobs.run_job')
+    @patch('app.predictor')
+    def test_scoring_job_lifecycle(self, mock_predictor, mock_run_job, client, tmp_path):
+        """Test upload, polling, result streaming and deletion of a scoring job"""
+        mock_predictor.version = 'v1'
+        jobs = ScoringJobs(str(tmp_path), workers=0)
+        csv_body = 'bhk,sqft,bath,lat,lng\n3,1200,2,12.9716,77.5946\n'
+        
+        with patch('app.scoring_jobs', jobs):
+            created = client.post('/api/jobs', data=csv_body, content_type='text/csv')
+            job = json.loads(created.data)
+            status = client.get(f"/api/jobs/{job['id']}")
+            results = client.get(f"/api/jobs/{job['id']}/results")
+            results_body = results.get_data()
+            invalid = client.post('/api/jobs', data='bhk,sqft\n3,1200\n', content_type='text/csv')
+            deleted = client.delete(f"/api/jobs/{job['id']}")
+            missing = client.get(f"/api/jobs/{job['id']}")
+        
+        assert created.status_code == 202
+        assert created.headers['Location'] == f"/api/jobs/{job['id']}"
+        assert job['status'] == QUEUED and job['model_version'] == 'v1'
+        mock_run_job.assert_called_once_with(os.path.join(str(tmp_path), job['id']), jobs.artifacts_dir)
+        assert json.loads(status.data)['rows_done'] == 0
+        assert results.mimetype == 'text/csv' and results.headers['X-Job-Status'] == QUEUED
+        assert results_body == b'row,price_crore,price_low_crore,price_high_crore,error\n'
+        assert invalid.status_code == 400
+        assert deleted.status_code == 204 and missing.status_code == 404
+    
+    def test_metrics_endpoint(self, client):
+        """Test /metrics exposes request counters and stage histograms"""
+        client.get('/health')
+        client.post('/api/predict', data=json.dumps({'bhk': 3}), content_type='application/json')
+        
+        response = client.get('/metrics')
+        
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+        text = response.data.decode()
+        assert 'http_requests_total{endpoint="/health",status="200"}' in text
+        assert 'http_requests_total{endpoint="/api/predict",status="400"}' in text
+        assert 'request_stage_seconds_bucket{endpoint="/api/predict",stage="validate"' in text
+    
     def test_404_endpoint(self, client):
         """Test 404 handler"""
         response = client.get('/nonexistent')
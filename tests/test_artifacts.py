@@ -0,0 +1,112 @@
+"""
+Tests for the versioned .npy artifact bundle format
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ml.artifacts import current_version, has_bundle, read_bundle, write_bundle
+from ml.inference import RealEstatePricePredictor
+from ml.train_model import save_artifacts
+
+FEATURE_NAMES = ['bhk', 'total_sqft', 'bath', 'lat', 'lng', 'location_encoded']
+
+
+@pytest.fixture
+def fitted():
+    """A small fitted scaler, linear model and encoder"""
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+    
+    rng = np.random.default_rng(5)
+    X = np.column_stack([
+        rng.integers(1, 5, 300), rng.uniform(500, 3000, 300), rng.integers(1, 4, 300),
+        rng.normal(12.97, 0.1, 300), rng.normal(77.59, 0.1, 300), rng.integers(0, 30, 300)
+    ]).astype(float)
+    y = X[:, 1] * 0.06 + X[:, 0] * 8 + rng.normal(0, 4, 300)
+    scaler = StandardScaler().fit(X)
+    model = LinearRegression().fit(scaler.transform(X), y)
+    encoder = LabelEncoder().fit(['Whitefield', 'Uttarahalli', 'Hebbal'])
+    return model, scaler, encoder
+
+
+class TestArtifactBundle:
+    
+    def test_write_and_read_bundle(self, tmp_path):
+        """Test bundles are versioned, pointed to by CURRENT and memory-mapped on read"""
+        artifacts_dir = str(tmp_path)
+        version = write_bundle(artifacts_dir, {'feature_names': ['a']}, {'coef': np.arange(3.0)})
+        
+        assert has_bundle(artifacts_dir)
+        assert current_version(artifacts_dir) == version
+        
+        manifest, arrays = read_bundle(artifacts_dir)
+        assert manifest['version'] == version
+        assert manifest['feature_names'] == ['a']
+        assert isinstance(arrays['coef'], np.memmap)
+        np.testing.assert_array_equal(arrays['coef'], [0, 1, 2])
+    
+    def test_identical_bundles_get_distinct_versions(self, tmp_path):
+        """Test rewriting the same arrays never clobbers an existing bundle"""
+        first = write_bundle(str(tmp_path), {}, {'coef': np.ones(2)})
+        second = write_bundle(str(tmp_path), {}, {'coef': np.ones(2)})
+        
+        assert first != second
+        assert current_version(str(tmp_path)) == second
+    
+    def test_predictor_loads_bundle_without_pickles(self, fitted, tmp_path):
+        """Test the predictor detects the bundle and matches the sklearn objects"""
+        model, scaler, encoder = fitted
+        version = save_artifacts(model, scaler, encoder, FEATURE_NAMES, str(tmp_path))
+        
+        assert not os.path.exists(tmp_path / 'model.pkl')
+        predictor = RealEstatePricePredictor(str(tmp_path))
+        
+        assert predictor.version == version
+        assert isinstance(predictor.scaler.mean_, np.memmap)
+        np.testing.assert_array_equal(predictor.location_encoder.transform(['Hebbal', 'Whitefield']),
+                                      encoder.transform(['Hebbal', 'Whitefield']))
+        
+        features = {'bhk': 3, 'sqft': 1400, 'bath': 2, 'lat': 12.95, 'lng': 77.61}
+        X = np.array([[3, 1400, 2, 12.95, 77.61, 0]], dtype=float)
+        expected = model.predict(scaler.transform(X))[0]
+        assert predictor.predict(features)['price_crore'] == round(expected / 100, 2)
+    
+    def test_non_linear_model_is_stored_in_bundle(self, fitted, tmp_path):
+        """Test models without linear coefficients fall back to joblib inside the bundle"""
+        from sklearn.tree import DecisionTreeRegressor
+        
+        _, scaler, encoder = fitted
+        X = np.random.default_rng(0).normal(size=(50, 6))
+        tree = DecisionTreeRegressor(max_depth=3).fit(X, X[:, 0])
+        save_artifacts(tree, scaler, encoder, FEATURE_NAMES, str(tmp_path))
+        
+        manifest, _ = read_bundle(str(tmp_path))
+        assert manifest['model']['type'] == 'joblib'
+        assert isinstance(RealEstatePricePredictor(str(tmp_path)).model, DecisionTreeRegressor)
+    
+    def test_pickle_retrain_removes_stale_sidecars(self, fitted, tmp_path):
+        """Test a pickle retrain without segments or intervals drops the earlier run's sidecars"""
+        from ml.segments import SegmentModels
+        from ml.uncertainty import PredictionStats
+        
+        model, scaler, encoder = fitted
+        rng = np.random.default_rng(1)
+        X = np.column_stack([rng.normal(size=(400, 5)), np.zeros(400)])
+        segments = SegmentModels.fit(X, X[:, 0], ['Plot  Area'] * 400, X[:, 3], X[:, 4])
+        stats = PredictionStats.from_training(X, rng.normal(size=100))
+        save_artifacts(model, scaler, encoder, FEATURE_NAMES, str(tmp_path), artifact_format='pickle',
+                       prediction_stats=stats, segment_models=segments)
+        assert RealEstatePricePredictor(str(tmp_path)).segment_models is not None
+        
+        save_artifacts(model, scaler, encoder, FEATURE_NAMES, str(tmp_path), artifact_format='pickle')
+        
+        predictor = RealEstatePricePredictor(str(tmp_path))
+        assert predictor.segment_models is None and predictor.prediction_stats is None
+        assert not os.path.exists(tmp_path / 'segments') and not os.path.exists(tmp_path / 'uncertainty')
@@ -0,0 +1,91 @@
+"""
+Tests for the comparable listings store
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ml.comparables import ComparablesBuilder, ComparablesStore
+from ml.spatial import haversine_m
+
+CENTER = (12.9716, 77.5946)
+
+
+def make_store(n=5000, seed=1):
+    rng = np.random.default_rng(seed)
+    columns = {
+        'price': rng.uniform(20, 300, n), 'sqft': rng.uniform(400, 4000, n),
+        'bhk': rng.integers(1, 6, n), 'bath': rng.integers(1, 5, n),
+        'lat': CENTER[0] + rng.normal(0, 0.05, n), 'lng': CENTER[1] + rng.normal(0, 0.05, n),
+        'location_code': rng.integers(0, 3, n)
+    }
+    store = ComparablesStore.from_columns(**columns, location_classes=['Hebbal', 'Koramangala', 'Whitefield'])
+    return store, columns
+
+
+class TestComparablesStore:
+
+    def test_matches_brute_force_with_filters(self):
+        """Test the filtered k-nearest listings equal a full scan, nearest first"""
+        store, columns = make_store()
+        distances = haversine_m(CENTER[0], CENTER[1], columns['lat'], columns['lng'])
+        eligible = (columns['bhk'] == 3) & (columns['sqft'] >= 1000) & (columns['sqft'] <= 1600)
+        expected = np.sort(distances[eligible])[:8]
+
+        listings = store.query(*CENTER, k=8, bhk=3, sqft_range=(1000, 1600))
+
+        np.testing.assert_allclose([l['distance_m'] for l in listings], expected, atol=0.1)
+        assert all(l['bhk'] == 3 and 1000 <= l['sqft'] <= 1600 for l in listings)
+        assert listings[0]['locality'] in ('Hebbal', 'Koramangala', 'Whitefield')
+
+    def test_radius_limits_results(self):
+        """Test nothing beyond max_radius_m is returned, even if fewer than k match"""
+        store, _ = make_store()
+
+        far = store.query(13.5, 78.2, k=5, max_radius_m=2000)
+        near = store.query(*CENTER, k=5, max_radius_m=300)
+
+        assert far == []
+        assert all(l['distance_m'] <= 300 for l in near)
+
+    def test_saved_store_is_memory_mapped(self, tmp_path):
+        """Test a saved store loads as memory-mapped columns and answers identically"""
+        store, _ = make_store(n=500)
+        store.save(str(tmp_path / 'comparables'))
+
+        loaded = ComparablesStore.load(str(tmp_path / 'comparables'))
+
+        assert ComparablesStore.exists(str(tmp_path / 'comparables'))
+        assert isinstance(loaded.columns['price'], np.memmap)
+        assert loaded.query(*CENTER, k=5, bhk=2) == store.query(*CENTER, k=5, bhk=2)
+
+    def test_rows_with_missing_values_are_dropped(self):
+        """Test listings without a bath count or coordinates are not indexed"""
+        store = ComparablesStore.from_columns([50, 60, 70], [1000, 1100, 1200], [2, 2, 2], [2, np.nan, 2],
+                                              [12.97, 12.97, np.nan], [77.59, 77.59, 77.59])
+
+        assert len(store) == 1
+        assert store.query(*CENTER, k=3)[0]['price_crore'] == 0.5
+
+    def test_chunked_builder_matches_in_memory_store(self, tmp_path):
+        """Test building from spilled chunks gives the same cell-ordered, memory-mapped store"""
+        store, columns = make_store()
+        columns['lat'][7] = np.nan
+        store = ComparablesStore.from_columns(**columns, location_classes=['Hebbal', 'Koramangala', 'Whitefield'])
+        builder = ComparablesBuilder(str(tmp_path), location_classes=['Hebbal', 'Koramangala', 'Whitefield'])
+
+        for start in range(0, len(columns['lat']), 777):
+            builder.add(**{name: values[start:start + 777] for name, values in columns.items()})
+        built = builder.build()
+
+        assert isinstance(built.columns['price'], np.memmap)
+        for name, values in store.columns.items():
+            np.testing.assert_array_equal(built.columns[name], values)
+        for name in ('lat', 'lng', 'order', 'cell_keys', 'cell_starts'):
+            np.testing.assert_array_equal(getattr(built.index, name), getattr(store.index, name))
+        assert built.query(*CENTER, k=5, bhk=2) == store.query(*CENTER, k=5, bhk=2)
@@ -0,0 +1,82 @@
+"""
+Tests for the content-addressed preprocessed feature cache
+"""
+
+import os
+import shutil
+import sys
+
+import pandas as pd
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import ml.train_model as train_model
+from ml.feature_cache import FeatureCache
+from ml.train_model import preprocess
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'Data', 'household.csv')
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    path = tmp_path / 'household.csv'
+    shutil.copy(DATA_PATH, path)
+    return str(path)
+
+
+class TestFeatureCache:
+    
+    def test_hit_matches_fresh_preprocessing(self, data_path, tmp_path, mocker):
+        """Test a cache hit skips preprocessing and returns identical frames"""
+        cache_dir = str(tmp_path / 'cache')
+        df, encoder, X, y = preprocess(data_path, cache_dir=cache_dir)
+        
+        spy = mocker.spy(train_model, 'load_and_preprocess_data')
+        cached_df, cached_encoder, cached_X, cached_y = preprocess(data_path, cache_dir=cache_dir)
+        
+        assert spy.call_count == 0
+        pd.testing.assert_frame_equal(cached_df, df, check_categorical=False)
+        pd.testing.assert_frame_equal(cached_X, X)
+        pd.testing.assert_series_equal(cached_y, y)
+        assert list(cached_encoder.classes_) == list(encoder.classes_)
+    
+    def test_key_follows_content_and_seed(self, data_path, tmp_path, mocker):
+        """Test changed data or seed misses the cache"""
+        cache_dir = str(tmp_path / 'cache')
+        preprocess(data_path, cache_dir=cache_dir)
+        spy = mocker.spy(train_model, 'load_and_preprocess_data')
+        
+        preprocess(data_path, seed=7, cache_dir=cache_dir)
+        with open(data_path, 'a') as f:
+            f.write('\nPlot  Area,Ready To Move,Whitefield,3 BHK,,1500,3,1,95\n')
+        df, _, _, _ = preprocess(data_path, cache_dir=cache_dir)
+        
+        assert spy.call_count == 2
+        assert df['location'].iloc[-1] == 'Whitefield'
+    
+    def test_digest_is_memoized(self, data_path, tmp_path, mocker):
+        """Test unchanged files are not re-hashed"""
+        cache = FeatureCache(str(tmp_path / 'cache'))
+        first = cache.digest(data_path)
+        
+        hash_file = mocker.patch('ml.feature_cache._hash_file')
+        
+        assert cache.digest(data_path) == first
+        assert hash_file.call_count == 0
+        assert cache.digest(str(tmp_path / 'missing.csv')) is None
+    
+    def test_prunes_old_entries(self, tmp_path):
+        """Test the cache keeps at most max_entries frames"""
+        cache = FeatureCache(str(tmp_path / 'cache'), max_entries=2)
+        df = pd.DataFrame({'price': [1.0, 2.0], 'location': pd.Categorical(['a', 'b'])})
+        encoder = type('Encoder', (), {'classes_': ['a', 'b']})()
+        
+        for key in ('k1', 'k2', 'k3'):
+            cache.save(key, df, encoder, [0, 1])
+            os.utime(os.path.join(cache.directory, key), (0, {'k1': 1, 'k2': 2, 'k3': 3}[key]))
+            cache._prune()
+        
+        assert cache.load('k1') is None
+        assert cache.load('k3') is not None
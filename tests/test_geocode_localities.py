@@ -0,0 +1,140 @@
+"""
+Tests for the bulk locality geocoding pipeline against a local stub HERE server
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ml.geocode_localities import BulkGeocoder, distinct_localities
+from ml.train_model import load_and_preprocess_data
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'Data', 'household.csv')
+
+
+class StubHereHandler(BaseHTTPRequestHandler):
+    """Minimal HERE geocode stub: throttles the first call per query, knows a few localities"""
+
+    known = {
+        'Bangalore Whitefield': (12.9698, 77.7500),
+        'Bangalore Uttarahalli': (12.9055, 77.5454),
+    }
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)['q'][0]
+        server = self.server
+        with server.lock:
+            server.calls.append(query)
+            first_call = server.calls.count(query) == 1
+        
+        if first_call and query in server.throttle:
+            self._send(429, {'title': 'Too Many Requests'})
+        elif query in server.garbled:
+            self._send(200, b'<html>Service Unavailable</html>')
+        elif query in self.known:
+            lat, lng = self.known[query]
+            self._send(200, {'items': [{'title': query, 'position': {'lat': lat, 'lng': lng}}]})
+        else:
+            self._send(200, {'items': []})
+
+    def _send(self, status, body):
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def here_server():
+    """Run the stub HERE server on a free local port"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHereHandler)
+    server.calls = []
+    server.throttle = {'Bangalore Whitefield'}
+    server.garbled = set()
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_geocoder(server):
+    host, port = server.server_address
+    return BulkGeocoder('test_key', url=f'http://{host}:{port}/v1/geocode',
+                        max_workers=4, rate=1000, backoff=0.01)
+
+
+class TestBulkGeocoder:
+    
+    def test_distinct_localities_deduplicates(self):
+        """Test the ~13k rows collapse to the distinct locality names"""
+        locations = distinct_localities(DATA_PATH)
+        
+        assert len(locations) == len(set(locations))
+        assert 1000 < len(locations) < 1400
+    
+    def test_geocode_all_retries_and_writes_table(self, here_server, tmp_path):
+        """Test throttled lookups are retried and results land in the table"""
+        checkpoint = str(tmp_path / 'coords.csv')
+        
+        table = make_geocoder(here_server).geocode_all(
+            ['Whitefield', 'Uttarahalli', 'Whitefield', 'Atlantis'], checkpoint)
+        
+        rows = table.set_index('location')
+        assert rows.loc['Whitefield', 'status'] == 'ok'
+        assert rows.loc['Whitefield', 'lat'] == 12.9698
+        assert rows.loc['Atlantis', 'status'] == 'not_found'
+        assert here_server.calls.count('Bangalore Whitefield') == 2
+        assert len(here_server.calls) == 4
+    
+    def test_non_json_response_is_recorded_as_failed(self, here_server, tmp_path):
+        """Test a 200 with a non-JSON body fails that locality without aborting the run"""
+        here_server.garbled = {'Bangalore Atlantis'}
+        checkpoint = str(tmp_path / 'coords.csv')
+        
+        table = make_geocoder(here_server).geocode_all(['Atlantis', 'Uttarahalli'], checkpoint)
+        
+        rows = table.set_index('location')
+        assert rows.loc['Atlantis', 'status'] == 'invalid_response'
+        assert rows.loc['Uttarahalli', 'status'] == 'ok'
+    
+    def test_geocode_all_resumes_from_checkpoint(self, here_server, tmp_path):
+        """Test a second run only requests localities missing from the checkpoint"""
+        checkpoint = str(tmp_path / 'coords.csv')
+        geocoder = make_geocoder(here_server)
+        geocoder.geocode_all(['Uttarahalli'], checkpoint)
+        here_server.calls.clear()
+        
+        table = geocoder.geocode_all(['Uttarahalli', 'Whitefield'], checkpoint)
+        
+        assert 'Bangalore Uttarahalli' not in here_server.calls
+        assert set(table['location']) == {'Uttarahalli', 'Whitefield'}
+    
+    def test_training_joins_coordinates(self, tmp_path):
+        """Test load_and_preprocess_data uses geocoded coordinates by location"""
+        coords = tmp_path / 'coords.csv'
+        pd.DataFrame([
+            {'location': 'Uttarahalli', 'lat': 12.9055, 'lng': 77.5454, 'label': '', 'status': 'ok'}
+        ]).to_csv(coords, index=False)
+        
+        df, _ = load_and_preprocess_data(DATA_PATH, coordinates_path=str(coords))
+        
+        uttarahalli = df[df['location'] == 'Uttarahalli']
+        assert len(uttarahalli) > 0
+        assert (uttarahalli['lat'] == 12.9055).all()
+        assert (uttarahalli['lng'] == 77.5454).all()
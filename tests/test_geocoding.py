@@ -0,0 +1,109 @@
+"""
+Tests for the geocoding helpers and cache tiers
+"""
+
+import os
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.cache import LRUCache, SQLiteCache, TieredCache
+from services.geocoding import NOT_FOUND, GeocodeCache, locality_hint, normalize_query
+
+
+class TestNormalizeQuery:
+    
+    def test_case_whitespace_and_city_are_ignored(self):
+        """Test equivalent locality strings share a cache key"""
+        assert normalize_query('Bangalore  Whitefield') == 'whitefield'
+        assert normalize_query('whitefield, Bengaluru') == 'whitefield'
+        assert normalize_query('WHITEFIELD, Bangalore, Karnataka, India') == 'whitefield'
+    
+    def test_city_only_query_is_kept(self):
+        """Test a bare city name is not normalized to an empty key"""
+        assert normalize_query('Bangalore') == 'bangalore'
+    
+    def test_locality_hint_prefers_district(self):
+        """Test the locality name is taken from address.district, then the title"""
+        item = {'title': 'Whitefield Main Road, Bengaluru', 'address': {'district': 'Whitefield'}}
+        
+        assert locality_hint(item) == 'Whitefield'
+        assert locality_hint({'title': 'Uttarahalli, Bengaluru, Karnataka'}) == 'Uttarahalli'
+        assert locality_hint(None) is None
+
+
+class TestCaches:
+    
+    def test_lru_eviction_and_ttl(self):
+        """Test LRU evicts the least recently used entry and honours TTL"""
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        
+        cache.set('d', 4, ttl=-1)
+        assert cache.get('d') is None
+    
+    def test_sqlite_cache_survives_new_instance(self, tmp_path):
+        """Test the disk tier is shared between cache instances (workers)"""
+        path = str(tmp_path / 'geocode.sqlite')
+        SQLiteCache(path, ttl=60).set('whitefield', {'lat': 12.97, 'lng': 77.75})
+        
+        other = SQLiteCache(path, ttl=60)
+        assert other.get('whitefield') == {'lat': 12.97, 'lng': 77.75}
+        assert other.get('missing') is None
+        assert other.stats()['hits'] == 1
+    
+    def test_sqlite_cache_size_bound(self, tmp_path):
+        """Test eviction keeps the most recently accessed entries"""
+        cache = SQLiteCache(str(tmp_path / 'cache.sqlite'), max_entries=2, evict_every=1000)
+        for i in range(4):
+            cache.set(f'k{i}', i)
+            time.sleep(0.001)
+        cache.evict()
+        
+        assert len(cache) == 2
+        assert cache.get('k3') == 3
+        assert cache.get('k0') is None
+    
+    def test_tiered_cache_promotes_disk_hits(self, tmp_path):
+        """Test disk hits are copied into the memory tier"""
+        disk = SQLiteCache(str(tmp_path / 'cache.sqlite'))
+        disk.set('k', {'v': 1})
+        cache = TieredCache(LRUCache(), disk)
+        
+        assert cache.get('k') == {'v': 1}
+        assert cache.memory.get('k') == {'v': 1}
+    
+    def test_promoted_entries_keep_their_disk_expiry(self, tmp_path):
+        """Test a short-lived disk entry is not kept for the memory tier's longer default TTL"""
+        disk = SQLiteCache(str(tmp_path / 'cache.sqlite'))
+        disk.set('short', NOT_FOUND, ttl=3600)
+        cache = TieredCache(LRUCache(ttl=7 * 24 * 3600), disk)
+        
+        assert cache.get('short') == NOT_FOUND
+        _, expires_at = cache.memory._data['short']
+        assert abs(expires_at - disk.get('short', with_expiry=True)[1]) < 1
+        assert disk.get('missing', with_expiry=True) == (None, None)
+    
+    def test_geocode_cache_negative_entries(self, tmp_path):
+        """Test unresolvable queries are remembered"""
+        cache = GeocodeCache(disk_path=str(tmp_path / 'geocode.sqlite'))
+        cache.set_not_found('Nowhere Layout')
+        
+        assert GeocodeCache(disk_path=str(tmp_path / 'geocode.sqlite')).get('nowhere layout') == NOT_FOUND
+    
+    def test_geocode_cache_items_skip_not_found(self, tmp_path):
+        """Test the cached results can be listed to seed the suggest index"""
+        cache = GeocodeCache(disk_path=str(tmp_path / 'geocode.sqlite'))
+        cache.set('Bangalore Hebbal', {'lat': 13.03, 'lng': 77.59})
+        cache.set_not_found('Nowhere Layout')
+        
+        assert list(cache.items()) == [('hebbal', {'lat': 13.03, 'lng': 77.59})]
+        assert list(GeocodeCache(disk_path=None).items()) == []
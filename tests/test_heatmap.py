@@ -0,0 +1,101 @@
+"""
+Tests for heatmap grids and map tiles
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.heatmap import (HeatmapCache, grid_cell_centers, grid_heatmap, tile_bounds,
+                              tile_cell_centers, tile_heatmap)
+
+PROFILE = {'bhk': 3, 'sqft': 1200.0, 'bath': 2}
+
+
+class FakePredictor:
+    """Price grows with latitude; counts predict_batch calls"""
+
+    def __init__(self, version='v1'):
+        self.version = version
+        self.calls = 0
+
+    def predict_batch(self, columns):
+        self.calls += 1
+        return {'price_crore': np.round(columns['lat'] - 12, 2)}
+
+
+class TestTileMath:
+
+    def test_tile_bounds_match_slippy_map_scheme(self):
+        """Test tile z/x/y bounds follow the web-mercator tiling used by map clients"""
+        world = tile_bounds(0, 0, 0)
+        assert world['west'] == -180.0 and world['east'] == 180.0
+        assert world['north'] == pytest.approx(85.0511, abs=1e-4)
+
+        # Tile containing central Bangalore (12.97, 77.59) at zoom 12
+        bounds = tile_bounds(12, 2930, 1899)
+        assert bounds['south'] < 12.97 < bounds['north']
+        assert bounds['west'] < 77.59 < bounds['east']
+
+    def test_cell_centers_run_north_to_south_inside_the_area(self):
+        """Test cell centers are row-major from the north-west corner and stay in bounds"""
+        lat, lng = tile_cell_centers(12, 2930, 1899, 4)
+        bounds = tile_bounds(12, 2930, 1899)
+        assert lat.shape == lng.shape == (16,)
+        assert lat[0] > lat[-1] and lng[0] < lng[3]
+        assert ((lat > bounds['south']) & (lat < bounds['north'])).all()
+
+        lat, lng = grid_cell_centers({'south': 12.0, 'west': 77.0, 'north': 13.0, 'east': 78.0}, 2, 4)
+        np.testing.assert_allclose(lat[[0, 4]], [12.75, 12.25])
+        np.testing.assert_allclose(lng[:4], [77.125, 77.375, 77.625, 77.875])
+
+
+class TestHeatmap:
+
+    def test_tile_is_predicted_in_one_pass_and_cached(self):
+        """Test a tile takes one predict_batch call and repeats are served from cache"""
+        predictor = FakePredictor()
+        cache = HeatmapCache()
+
+        result, hit = tile_heatmap(predictor, cache, 12, 2930, 1899, PROFILE, size=8)
+        again, hit_again = tile_heatmap(predictor, cache, 12, 2930, 1899, PROFILE, size=8)
+
+        assert not hit and hit_again
+        assert predictor.calls == 1
+        assert again == result
+        assert len(result['prices']) == 8 and len(result['prices'][0]) == 8
+        assert result['prices'][0][0] >= result['prices'][-1][0]
+        assert result['model_version'] == 'v1'
+
+    def test_cache_is_keyed_on_profile_and_model_version(self):
+        """Test a new profile or a new model version recomputes the tile"""
+        cache = HeatmapCache()
+        predictor = FakePredictor('v1')
+        tile_heatmap(predictor, cache, 12, 2930, 1899, PROFILE, size=4)
+        tile_heatmap(predictor, cache, 12, 2930, 1899, dict(PROFILE, bhk=2), size=4)
+
+        retrained = FakePredictor('v2')
+        result, hit = tile_heatmap(retrained, cache, 12, 2930, 1899, PROFILE, size=4)
+
+        assert predictor.calls == 2
+        assert not hit and retrained.calls == 1
+        assert result['model_version'] == 'v2'
+
+    def test_cells_outside_the_region_are_null(self):
+        """Test out-of-region cells are null and out-of-region tiles skip the model"""
+        predictor = FakePredictor()
+        cache = HeatmapCache()
+
+        result, _ = grid_heatmap(predictor, cache, {'south': 14.5, 'west': 77.0, 'north': 15.5, 'east': 78.0},
+                                 2, 1, PROFILE)
+        assert result['prices'][0] == [None]
+        assert result['prices'][1][0] == pytest.approx(2.75)
+
+        ocean, _ = tile_heatmap(predictor, cache, 4, 0, 0, PROFILE, size=2)
+        assert ocean['prices'] == [[None, None], [None, None]] and ocean['min'] is None
+        assert predictor.calls == 1
@@ -0,0 +1,137 @@
+"""
+Tests for the pooled HERE client: request coalescing and circuit breaking
+"""
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.here_client import CircuitBreaker, CircuitOpenError, HereAPIError, HereClient, QuotaExhaustedError
+from services.rate_limit import RateLimiter
+
+
+def slow_response(delay, payload):
+    """Build a session.get replacement that blocks like a slow upstream"""
+    def get(url, params=None, timeout=None):
+        time.sleep(delay)
+        response = MagicMock()
+        response.ok = True
+        response.json.return_value = payload
+        return response
+    return get
+
+
+class TestHereClient:
+    
+    def test_concurrent_identical_queries_are_coalesced(self):
+        """Test a burst of the same locality makes one upstream call"""
+        client = HereClient('test_key')
+        payload = {'items': [{'position': {'lat': 12.97, 'lng': 77.75}}]}
+        client.session.get = MagicMock(side_effect=slow_response(0.2, payload))
+        queries = ['Whitefield', 'whitefield', 'Bangalore Whitefield', 'WHITEFIELD, Bengaluru'] * 5
+        
+        with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            results = list(pool.map(client.geocode, queries))
+        
+        assert all(r == payload for r in results)
+        assert client.session.get.call_count == 1
+        assert client.stats()['coalesced_calls'] == len(queries) - 1
+    
+    def test_coalesced_callers_share_errors(self):
+        """Test followers see the leader's failure instead of hanging"""
+        client = HereClient('test_key')
+        
+        def failing_get(url, params=None, timeout=None):
+            time.sleep(0.1)
+            raise requests.exceptions.ConnectionError('boom')
+        client.session.get = MagicMock(side_effect=failing_get)
+        
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(client.geocode, 'Hebbal') for _ in range(4)]
+        
+        for future in futures:
+            with pytest.raises(requests.exceptions.ConnectionError):
+                future.result()
+        assert client.session.get.call_count == 1
+    
+    def test_client_errors_do_not_trip_breaker(self):
+        """Test a 400 from HERE is reported but does not count as an outage"""
+        client = HereClient('test_key', breaker=CircuitBreaker(failure_threshold=1))
+        response = MagicMock(ok=False, status_code=400)
+        response.json.return_value = {'title': 'Bad request'}
+        client.session.get = MagicMock(return_value=response)
+        
+        with pytest.raises(HereAPIError) as exc_info:
+            client.geocode('Hebbal')
+        
+        assert exc_info.value.status_code == 400
+        assert client.breaker.state == CircuitBreaker.CLOSED
+    
+    def test_quota_budget_and_429_backoff(self):
+        """Test a spent budget fails without a call, and a 429 stops calls until Retry-After"""
+        limiter = RateLimiter(None, here_daily_quota=86.4, here_burst=1)
+        client = HereClient('test_key', rate_limiter=limiter)
+        response = MagicMock(ok=True)
+        response.json.return_value = {'items': []}
+        client.session.get = MagicMock(return_value=response)
+        
+        client.geocode('Hebbal')
+        with pytest.raises(QuotaExhaustedError):
+            client.geocode('Whitefield')
+        assert client.session.get.call_count == 1
+        assert client.stats()['quota_rejections'] == 1
+        
+        client.rate_limiter = RateLimiter(None)
+        throttled = MagicMock(ok=False, status_code=429, headers={'Retry-After': '120'})
+        throttled.json.return_value = {'title': 'Too Many Requests'}
+        client.session.get = MagicMock(return_value=throttled)
+        with pytest.raises(HereAPIError) as exc_info:
+            client.geocode('Hebbal')
+        with pytest.raises(QuotaExhaustedError) as quota_info:
+            client.geocode('Hebbal')
+        
+        assert exc_info.value.retry_after == 120.0
+        assert 119 < quota_info.value.retry_after <= 120
+        assert client.session.get.call_count == 1
+
+
+class TestCircuitBreaker:
+    
+    def test_open_then_half_open_then_closed(self):
+        """Test the breaker fails fast, allows one trial after the timeout, then recovers"""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        breaker.record_failure()
+        
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        
+        time.sleep(0.06)
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.before_call()
+    
+    def test_failed_trial_reopens(self):
+        """Test a failing half-open trial re-opens the circuit"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        breaker.before_call()
+        breaker.record_failure()
+        
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
@@ -120,3 +120,113 @@ class TestRealEstatePricePredictor:
         assert result == {'price_crore': 2.5}
         mock_predictor_class.assert_called_once_with('test_artifacts')
         mock_predictor.predict.assert_called_once_with(features)
+    
+    @patch('ml.inference.joblib.load')
+    @patch('ml.inference.os.path.exists')
+    def test_predict_batch_matches_single_predictions(self, mock_exists, mock_load):
+        """Test vectorized batch prediction agrees with row-by-row prediction"""
+        from sklearn.linear_model import LinearRegression
+        from sklearn.preprocessing import StandardScaler
+        
+        mock_exists.return_value = True
+        feature_names = ['bhk', 'total_sqft', 'bath', 'lat', 'lng', 'location_encoded']
+        rng = np.random.default_rng(0)
+        X = np.column_stack([
+            rng.integers(1, 5, 200), rng.uniform(500, 3000, 200), rng.integers(1, 4, 200),
+            rng.normal(12.97, 0.1, 200), rng.normal(77.59, 0.1, 200), rng.integers(0, 50, 200)
+        ])
+        y = X[:, 1] * 0.05 + X[:, 0] * 10 + rng.normal(0, 5, 200)
+        scaler = StandardScaler().fit(X)
+        model = LinearRegression().fit(scaler.transform(X), y)
+        mock_load.side_effect = [model, scaler, MagicMock(), feature_names]
+        
+        predictor = RealEstatePricePredictor('test_artifacts')
+        
+        rows = [
+            {'bhk': 2, 'sqft': 1000, 'bath': 2, 'lat': 12.95, 'lng': 77.60},
+            {'bhk': 3, 'sqft': 1650, 'bath': 3, 'lat': 12.99, 'lng': 77.55},
+            {'bhk': 4, 'sqft': 2400, 'bath': 4, 'lat': 13.02, 'lng': 77.64},
+        ]
+        
+        batch = predictor.predict_batch(rows)
+        single = [predictor.predict(row)['price_crore'] for row in rows]
+        np.testing.assert_allclose(batch['price_crore'], single)
+        
+        # Columnar input gives the same answer
+        columns = {key: [row[key] for row in rows] for key in rows[0]}
+        np.testing.assert_allclose(predictor.predict_batch(columns)['price_crore'], single)
+    
+    @patch('ml.inference.joblib.load')
+    @patch('ml.inference.os.path.exists')
+    def test_predict_batch_missing_features(self, mock_exists, mock_load):
+        """Test batch prediction reports the offending row"""
+        mock_exists.return_value = True
+        mock_load.side_effect = [MagicMock(), MagicMock(), MagicMock(), []]
+        
+        predictor = RealEstatePricePredictor('test_artifacts')
+        
+        rows = [
+            {'bhk': 3, 'sqft': 1200, 'bath': 2, 'lat': 12.9716, 'lng': 77.5946},
+            {'bhk': 3, 'bath': 2, 'lat': 12.9716, 'lng': 77.5946},
+        ]
+        
+        with pytest.raises(ValueError, match="Row 1: missing required features"):
+            predictor.predict_batch(rows)
+    
+    @patch('ml.inference.joblib.load')
+    @patch('ml.inference.os.path.exists')
+    def test_fast_path_matches_sklearn(self, mock_exists, mock_load):
+        """Test the folded w.x + b path agrees with scaler.transform + model.predict"""
+        from sklearn.linear_model import Ridge
+        from sklearn.preprocessing import StandardScaler
+        
+        mock_exists.return_value = True
+        feature_names = ['bhk', 'total_sqft', 'bath', 'lat', 'lng', 'location_encoded']
+        rng = np.random.default_rng(1)
+        X = np.column_stack([
+            rng.integers(1, 5, 500), rng.uniform(500, 3000, 500), rng.integers(1, 4, 500),
+            rng.normal(12.97, 0.1, 500), rng.normal(77.59, 0.1, 500), rng.integers(0, 50, 500)
+        ]).astype(float)
+        y = X @ np.array([6.0, 0.05, 3.0, 40.0, -25.0, 0.1]) + rng.normal(0, 3, 500)
+        scaler = StandardScaler().fit(X)
+        model = Ridge(alpha=0.5).fit(scaler.transform(X), y)
+        mock_load.side_effect = [model, scaler, MagicMock(), feature_names]
+        
+        predictor = RealEstatePricePredictor('test_artifacts')
+        
+        assert predictor.fast_path
+        X_new = X[:50].copy()
+        X_new[:, 5] = 0
+        np.testing.assert_allclose(predictor._predict_matrix(X_new),
+                                   model.predict(scaler.transform(X_new)), rtol=1e-10, atol=1e-8)
+    
+    @patch('ml.inference.joblib.load')
+    @patch('ml.inference.os.path.exists')
+    def test_fast_path_falls_back_for_non_linear_models(self, mock_exists, mock_load):
+        """Test models that cannot be folded keep the sklearn path"""
+        from sklearn.preprocessing import MinMaxScaler
+        from sklearn.tree import DecisionTreeRegressor
+        
+        mock_exists.return_value = True
+        feature_names = ['bhk', 'total_sqft', 'bath', 'lat', 'lng', 'location_encoded']
+        X = np.random.default_rng(2).normal(size=(100, 6))
+        scaler = MinMaxScaler().fit(X)
+        model = DecisionTreeRegressor(max_depth=4).fit(scaler.transform(X), X[:, 1])
+        mock_load.side_effect = [model, scaler, MagicMock(), feature_names]
+        
+        predictor = RealEstatePricePredictor('test_artifacts')
+        
+        assert not predictor.fast_path
+        np.testing.assert_allclose(predictor._predict_matrix(X[:10]), model.predict(scaler.transform(X[:10])))
+    
+    def test_serving_imports_skip_pandas_and_joblib(self):
+        """Test importing the inference module does not execute pandas, joblib or sklearn"""
+        import subprocess
+        
+        code = ("import sys, ml.inference; "
+                "print(sorted(m for m in ('pandas.core.frame', 'joblib.numpy_pickle', 'sklearn.base') "
+                "if m in sys.modules))")
+        root = os.path.join(os.path.dirname(__file__), '..')
+        output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+        
+        assert output.stdout.strip() == '[]'
@@ -0,0 +1,121 @@
+"""
+Tests for locality resolution at inference
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ml.inference import RealEstatePricePredictor
+from ml.locality import LocalityIndex
+from ml.train_model import save_artifacts
+
+CENTRES = {
+    ' Whitefield': (12.9700, 77.7500),
+    'Jayanagar': (12.9250, 77.5900),
+    'Hebbal': (13.0350, 77.5970),
+    'Whitefield': (12.9690, 77.7490),
+    'Yelahanka': (13.1000, 77.5960),
+}
+
+
+@pytest.fixture
+def training_rows():
+    rng = np.random.default_rng(3)
+    classes = np.array(sorted(CENTRES))
+    codes = np.repeat(np.arange(len(classes)), [5, 40, 40, 60, 40])
+    lat = np.array([CENTRES[classes[c]][0] for c in codes]) + rng.normal(0, 0.002, len(codes))
+    lng = np.array([CENTRES[classes[c]][1] for c in codes]) + rng.normal(0, 0.002, len(codes))
+    return classes, codes, lat, lng
+
+
+class TestLocalityIndex:
+    
+    def test_coordinates_resolve_to_nearest_centroid(self, training_rows):
+        """Test raster and exact lookups agree away from locality boundaries"""
+        classes, codes, lat, lng = training_rows
+        index = LocalityIndex.from_rows(classes, codes, lat, lng)
+        
+        query_lat = np.array([12.926, 13.034, 13.099])
+        query_lng = np.array([77.591, 77.598, 77.595])
+        expected = [list(classes).index(name) for name in ('Jayanagar', 'Hebbal', 'Yelahanka')]
+        
+        assert index.resolve_coordinates(query_lat, query_lng).tolist() == expected
+        assert index.nearest(query_lat, query_lng).tolist() == expected
+        assert index.resolve_coordinates(query_lat[:1], query_lng[:1]).tolist() == expected[:1]
+    
+    def test_far_points_use_default(self, training_rows):
+        """Test points beyond max_distance_m (inside or outside the raster) get the default code"""
+        classes, codes, lat, lng = training_rows
+        index = LocalityIndex.from_rows(classes, codes, lat, lng, max_distance_m=5000)
+        
+        resolved = index.resolve([12.5, 14.0], [77.5, 77.5], default=-7)
+        
+        assert resolved.tolist() == [-7, -7]
+    
+    def test_names_match_exactly_and_prefer_common_class(self, training_rows):
+        """Test normalized names win over coordinates; duplicates pick the class with most rows"""
+        classes, codes, lat, lng = training_rows
+        index = LocalityIndex.from_rows(classes, codes, lat, lng)
+        
+        resolved = index.resolve([12.926, 12.926, 12.926], [77.591, 77.591, 77.591],
+                                 ['whitefield, Bengaluru', 'Atlantis', None])
+        
+        jayanagar = list(classes).index('Jayanagar')
+        assert resolved.tolist() == [list(classes).index('Whitefield'), jayanagar, jayanagar]
+    
+    def test_centroid_by_name(self, training_rows):
+        """Test a locality name maps to the centroid of its training rows"""
+        classes, codes, lat, lng = training_rows
+        index = LocalityIndex.from_rows(classes, codes, lat, lng)
+        
+        centroid = index.centroid('hebbal, Bangalore')
+        
+        assert centroid == pytest.approx(CENTRES['Hebbal'], abs=0.002)
+        assert index.centroid('Atlantis') is None
+    
+    def test_save_load_roundtrip(self, training_rows, tmp_path):
+        """Test a saved index answers identically when memory-mapped"""
+        classes, codes, lat, lng = training_rows
+        index = LocalityIndex.from_rows(classes, codes, lat, lng)
+        index.save(str(tmp_path))
+        
+        loaded = LocalityIndex.load(str(tmp_path))
+        
+        assert LocalityIndex.exists(str(tmp_path))
+        assert (loaded.resolve(lat, lng) == index.resolve(lat, lng)).all()
+        assert (loaded.resolve_names(['Hebbal']) == index.resolve_names(['Hebbal'])).all()
+
+
+class TestPredictorLocation:
+    
+    def test_location_encoded_comes_from_locality_index(self, training_rows, tmp_path):
+        """Test the predictor resolves location_encoded instead of using a constant"""
+        classes, codes, lat, lng = training_rows
+        feature_names = ['bhk', 'total_sqft', 'bath', 'lat', 'lng', 'location_encoded']
+        X = np.column_stack([np.full(len(codes), 2.0), np.full(len(codes), 1000.0),
+                             np.full(len(codes), 2.0), lat, lng, codes])
+        y = 50 + 10 * codes
+        scaler = StandardScaler().fit(X)
+        model = LinearRegression().fit(scaler.transform(X), y)
+        encoder = LabelEncoder().fit(classes)
+        save_artifacts(model, scaler, encoder, feature_names, str(tmp_path),
+                       locality_index=LocalityIndex.from_rows(classes, codes, lat, lng))
+        predictor = RealEstatePricePredictor(str(tmp_path))
+        
+        row = {'bhk': 2, 'sqft': 1000, 'bath': 2, 'lat': 13.0995, 'lng': 77.5962}
+        by_coordinates = predictor.predict(row)
+        by_name = predictor.predict({**row, 'locality': 'Jayanagar'})
+        batch = predictor.predict_batch([row, {**row, 'locality': 'Jayanagar'}])
+        
+        assert by_coordinates['features_used']['locality'] == 'Yelahanka'
+        assert by_name['features_used']['locality'] == 'Jayanagar'
+        assert by_coordinates['price_crore'] != by_name['price_crore']
+        assert batch['price_crore'].tolist() == [by_coordinates['price_crore'], by_name['price_crore']]
@@ -0,0 +1,72 @@
+"""
+Tests for the Prometheus-style metrics registry
+"""
+
+import json
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.metrics import Registry
+
+
+class TestRegistry:
+    
+    def test_counter_and_histogram_render(self):
+        """Test samples render in the Prometheus text format"""
+        registry = Registry()
+        requests_total = registry.counter('requests_total', 'Requests', ['status'])
+        latency = registry.histogram('latency_seconds', 'Latency', ['stage'], buckets=(0.1, 1.0))
+        
+        requests_total.inc('200')
+        requests_total.inc('200')
+        requests_total.inc('500')
+        latency.observe(0.05, 'model')
+        latency.observe(0.5, 'model')
+        latency.observe(5.0, 'model')
+        
+        text = registry.render()
+        
+        assert '# TYPE requests_total counter' in text
+        assert 'requests_total{status="200"} 2.0' in text
+        assert 'requests_total{status="500"} 1.0' in text
+        assert 'latency_seconds_bucket{stage="model",le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{stage="model",le="1.0"} 2' in text
+        assert 'latency_seconds_bucket{stage="model",le="+Inf"} 3' in text
+        assert 'latency_seconds_count{stage="model"} 3' in text
+    
+    def test_multiprocess_aggregation(self, tmp_path):
+        """Test counters and histograms sum across worker snapshot files"""
+        registry = Registry(multiproc_dir=str(tmp_path))
+        requests_total = registry.counter('requests_total', 'Requests', ['status'])
+        latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+        in_flight = registry.gauge('in_flight', 'In-flight requests')
+        requests_total.inc('200', amount=3)
+        latency.observe(0.05)
+        in_flight.set(2)
+        
+        # A snapshot left by another worker that has since exited
+        other = {
+            'pid': 2 ** 22 + 12345,
+            'values': [['requests_total', ['200'], 4.0], ['in_flight', [], 7.0]],
+            'histograms': [['latency_seconds', [], [0, 1, 0, 0.5]]],
+        }
+        with open(tmp_path / 'metrics-99999.json', 'w') as f:
+            json.dump(other, f)
+        
+        values, histograms = registry.collect()
+        
+        assert values[('requests_total', ('200',))] == 7.0
+        assert values[('in_flight', ())] == 2.0
+        assert histograms[('latency_seconds', ())] == [1, 1, 0, 0.55]
+        assert os.path.exists(tmp_path / f'metrics-{os.getpid()}.json')
+    
+    def test_collectors_refresh_gauges(self):
+        """Test registered collectors run before samples are gathered"""
+        registry = Registry()
+        size = registry.gauge('cache_size', 'Entries')
+        registry.register_collector(lambda: size.set(42))
+        
+        assert 'cache_size 42.0' in registry.render()
@@ -0,0 +1,87 @@
+"""
+Tests for the parallel model search
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ml.artifacts import read_bundle
+from ml.inference import RealEstatePricePredictor
+from ml.model_search import (build_feature_cache, default_candidates, load_feature_cache, promote,
+                             run_search, write_leaderboard)
+from ml.train_model import load_and_preprocess_data
+from ml.uncertainty import PredictionStats
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'Data', 'household.csv')
+
+
+@pytest.fixture(scope='module')
+def features_dir(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('search') / 'features')
+    df, location_encoder = load_and_preprocess_data(DATA_PATH)
+    build_feature_cache(df, location_encoder, directory)
+    return directory
+
+
+class TestModelSearch:
+    
+    def test_feature_cache_is_memory_mapped(self, features_dir):
+        """Test the cached matrix loads memory-mapped with its feature names"""
+        X, y, meta = load_feature_cache(features_dir)
+        
+        assert isinstance(X, np.memmap)
+        assert X.shape == (meta['n_rows'], len(meta['feature_names']))
+        assert len(y) == meta['n_rows']
+    
+    def test_search_ranks_candidates(self, features_dir, tmp_path):
+        """Test every candidate is scored on every fold and ranked by MAE"""
+        candidates = default_candidates(['linear', 'ridge'], [1.5, None])
+        
+        leaderboard = run_search(features_dir, candidates, folds=2, workers=2)
+        path = write_leaderboard(str(tmp_path), leaderboard, {'folds': 2})
+        
+        assert len(leaderboard) == len(candidates)
+        assert [row['rank'] for row in leaderboard] == list(range(1, len(candidates) + 1))
+        assert [row['mae'] for row in leaderboard] == sorted(row['mae'] for row in leaderboard)
+        for row in leaderboard:
+            assert row['fit_s'] > 0 and row['predict_us_row'] > 0
+            assert row['r2'] < 1
+            low, high = row['residual_quantiles']
+            assert low < 0 < high
+        with open(path) as f:
+            assert json.load(f)['leaderboard'][0]['name'] == leaderboard[0]['name']
+    
+    def test_promote_writes_bundle(self, features_dir, tmp_path):
+        """Test promoting a leaderboard entry activates a bundle recording the search result"""
+        entry = {'name': 'ridge(alpha=1.0)@iqr1.5', 'kind': 'ridge', 'params': {'alpha': 1.0},
+                 'iqr_multiplier': 1.5, 'mae': 24.0, 'r2': 0.4, 'residual_quantiles': [-30.0, 45.0]}
+        
+        promote(features_dir, entry, str(tmp_path))
+        manifest, arrays = read_bundle(str(tmp_path))
+        
+        assert manifest['model']['type'] == 'linear'
+        assert manifest['training']['search']['name'] == entry['name']
+        assert len(arrays['coef']) == len(manifest['feature_names'])
+        stats = PredictionStats.load(os.path.join(manifest['path'], 'uncertainty'))
+        assert stats.residual_quantiles.tolist() == [-30.0, 45.0]
+        assert stats.precision.any()
+    
+    def test_promoted_tree_ranges_skip_leverage(self, features_dir, tmp_path):
+        """Test a non-linear winner gets constant-width ranges from its out-of-fold residuals"""
+        entry = {'name': 'gbr(max_iter=20)@iqr1.5', 'kind': 'gbr', 'params': {'max_iter': 20},
+                 'iqr_multiplier': 1.5, 'mae': 22.0, 'r2': 0.5, 'residual_quantiles': [-25.0, 40.0]}
+        
+        promote(features_dir, entry, str(tmp_path))
+        predictor = RealEstatePricePredictor(str(tmp_path))
+        
+        result = predictor.predict({'bhk': 3, 'sqft': 1400, 'bath': 2, 'lat': 12.95, 'lng': 77.61})
+        price_range = result['price_range_crore']
+        assert price_range['low'] == pytest.approx(result['price_crore'] - 0.25, abs=0.011)
+        assert price_range['high'] == pytest.approx(result['price_crore'] + 0.40, abs=0.011)
@@ -0,0 +1,135 @@
+"""
+Tests for the grid spatial index and the POI density store
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ml.poi_store import POIStore
+from ml.spatial import GridIndex, haversine_m
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(7)
+    return rng.normal(12.97, 0.05, 5000), rng.normal(77.59, 0.05, 5000)
+
+
+@pytest.fixture
+def poi_frame():
+    rng = np.random.default_rng(11)
+    frames = []
+    for category, n in [('hospital', 300), ('school', 800), ('metro_station', 40)]:
+        frames.append(pd.DataFrame({
+            'category': category,
+            'lat': rng.normal(12.97, 0.04, n),
+            'lng': rng.normal(77.59, 0.04, n),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+class TestGridIndex:
+    
+    def test_count_within_matches_brute_force(self, points):
+        """Test radius counts agree with a full haversine scan"""
+        lat, lng = points
+        index = GridIndex(lat, lng, cell_size_m=300)
+        q_lat = np.array([12.97, 12.93, 13.05, 12.5])
+        q_lng = np.array([77.59, 77.62, 77.55, 77.0])
+        
+        counts = index.count_within(q_lat, q_lng, 750)
+        expected = [(haversine_m(a, b, lat, lng) <= 750).sum() for a, b in zip(q_lat, q_lng)]
+        
+        np.testing.assert_array_equal(counts, expected)
+        assert counts[-1] == 0
+    
+    def test_nearest_matches_brute_force(self, points):
+        """Test k-nearest lookups return the true nearest points in order"""
+        lat, lng = points
+        index = GridIndex(lat, lng, cell_size_m=300)
+        q_lat = np.array([12.97, 12.80])
+        q_lng = np.array([77.59, 77.70])
+        
+        indices, distances = index.nearest(q_lat, q_lng, k=5)
+        
+        for row, (a, b) in enumerate(zip(q_lat, q_lng)):
+            brute = np.argsort(haversine_m(a, b, lat, lng))[:5]
+            np.testing.assert_array_equal(indices[row], brute)
+        assert np.all(np.diff(distances, axis=1) >= 0)
+    
+    def test_save_and_memory_mapped_load(self, points, tmp_path):
+        """Test a saved index reloads memory-mapped with identical answers"""
+        lat, lng = points
+        index = GridIndex(lat, lng, cell_size_m=300)
+        index.save(str(tmp_path / 'grid'))
+        
+        loaded = GridIndex.load(str(tmp_path / 'grid'))
+        
+        assert isinstance(loaded.lat, np.memmap)
+        ids, _ = index.query_radius(12.97, 77.59, 400)
+        loaded_ids, _ = loaded.query_radius(12.97, 77.59, 400)
+        np.testing.assert_array_equal(ids, loaded_ids)
+
+
+class TestPOIStore:
+    
+    def test_count_single_and_batch_agree(self, poi_frame):
+        """Test single-point counts match the vectorized batch"""
+        store = POIStore.from_frame(poi_frame)
+        lat = np.array([12.97, 12.95, 13.0])
+        lng = np.array([77.59, 77.60, 77.57])
+        
+        batch = store.count_batch(lat, lng)
+        
+        assert set(batch) == {'poi_hospital', 'poi_metro_station', 'poi_school'}
+        for i in range(len(lat)):
+            assert batch['poi_school'][i] == store.count('school', lat[i], lng[i])
+    
+    def test_save_and_load(self, poi_frame, tmp_path):
+        """Test the store round-trips through disk"""
+        store = POIStore.from_frame(poi_frame, radii={'hospital': 800})
+        store.save(str(tmp_path / 'poi'))
+        
+        loaded = POIStore.load(str(tmp_path / 'poi'))
+        
+        assert loaded.radii['hospital'] == 800
+        assert loaded.count('hospital', 12.97, 77.59) == store.count('hospital', 12.97, 77.59)
+    
+    def test_predictor_computes_poi_features(self, poi_frame, tmp_path):
+        """Test inference fills POI features from the store saved with the model"""
+        from sklearn.linear_model import LinearRegression
+        from sklearn.preprocessing import LabelEncoder, StandardScaler
+        from ml.inference import RealEstatePricePredictor
+        from ml.train_model import add_poi_features, save_artifacts
+        
+        store = POIStore.from_frame(poi_frame)
+        rng = np.random.default_rng(3)
+        df = pd.DataFrame({
+            'bhk': rng.integers(1, 5, 300).astype(float),
+            'total_sqft': rng.uniform(500, 3000, 300),
+            'bath': rng.integers(1, 4, 300).astype(float),
+            'lat': rng.normal(12.97, 0.04, 300),
+            'lng': rng.normal(77.59, 0.04, 300),
+            'location_encoded': rng.integers(0, 20, 300).astype(float),
+        })
+        df = add_poi_features(df, store)
+        y = df['total_sqft'] * 0.05 + df['poi_school'] * 2
+        scaler = StandardScaler().fit(df)
+        model = LinearRegression().fit(scaler.transform(df), y)
+        save_artifacts(model, scaler, LabelEncoder().fit(['a']), list(df.columns), str(tmp_path), store)
+        
+        predictor = RealEstatePricePredictor(str(tmp_path))
+        result = predictor.predict({'bhk': 2, 'sqft': 1000, 'bath': 2, 'lat': 12.97, 'lng': 77.59})
+        
+        row = df.iloc[:1].copy()
+        row[['bhk', 'total_sqft', 'bath', 'lat', 'lng', 'location_encoded']] = [2, 1000, 2, 12.97, 77.59, 0]
+        row = add_poi_features(row, store)
+        expected = model.predict(scaler.transform(row[df.columns]))[0]
+        assert result['price_crore'] == round(expected / 100, 2)
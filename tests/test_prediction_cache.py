@@ -0,0 +1,48 @@
+"""
+Tests for the quantized prediction cache
+"""
+
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.prediction_cache import PredictionCache, quantize_features
+
+FEATURES = {'bhk': 3, 'sqft': 1400.4, 'bath': 2, 'lat': 12.971649, 'lng': 77.594612}
+
+
+class TestPredictionCache:
+
+    def test_nearby_payloads_share_a_key(self):
+        """Test payloads within the quantization step map to one key per model version"""
+        nearby = dict(FEATURES, sqft=1399.6, lat=12.97162)
+
+        key = PredictionCache.key('v1', quantize_features(FEATURES))
+
+        assert PredictionCache.key('v1', quantize_features(nearby)) == key
+        assert PredictionCache.key('v2', quantize_features(FEATURES)) != key
+        assert PredictionCache.key('v1', quantize_features(dict(FEATURES, lat=12.9718))) != key
+        assert PredictionCache.key('v1', quantize_features(dict(FEATURES, locality='Whitefield'))) != key
+        assert PredictionCache.key('v1', quantize_features(dict(FEATURES, area_type='Plot  Area'))) != key
+        assert (PredictionCache.key('v1', quantize_features(dict(FEATURES, area_type='Plot  Area'))) ==
+                PredictionCache.key('v1', quantize_features(dict(FEATURES, area_type='plot area'))))
+
+    def test_quantized_features_are_predicted(self):
+        """Test the features sent to the model are the rounded ones the key describes"""
+        quantized = quantize_features(dict(FEATURES, locality='Whitefield'))
+
+        assert quantized == {'bhk': 3, 'sqft': 1400.0, 'bath': 2, 'lat': 12.9716, 'lng': 77.5946,
+                             'locality': 'Whitefield'}
+
+    def test_disk_tier_is_shared(self, tmp_path):
+        """Test another worker's cache instance reads results through the SQLite tier"""
+        path = str(tmp_path / 'predictions.sqlite')
+        key = PredictionCache.key('v1', quantize_features(FEATURES))
+        PredictionCache(disk_path=path).set(key, {'price_crore': 1.23, 'model_version': 'v1'})
+
+        other = PredictionCache(disk_path=path)
+
+        assert other.get(key) == {'price_crore': 1.23, 'model_version': 'v1'}
+        assert other.stats()['hits'] == 1
@@ -0,0 +1,80 @@
+"""
+Tests for the shared token-bucket rate limiter
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.rate_limit import RateLimiter, TokenBuckets
+
+
+def take_tokens(path, client, count):
+    limiter = RateLimiter(path, client_rate=0.001, client_burst=10)
+    return [limiter.check_client(client) for _ in range(count)]
+
+
+class TestTokenBuckets:
+
+    def test_burst_then_refill(self):
+        """Test a bucket allows its capacity at once, then refills at its rate"""
+        buckets = TokenBuckets(None, slots=4)
+
+        assert [buckets.take(1, rate=2.0, capacity=3, now=100.0) for _ in range(3)] == [0.0] * 3
+        assert buckets.take(1, rate=2.0, capacity=3, now=100.0) == pytest.approx(0.5)
+        assert buckets.take(1, rate=2.0, capacity=3, now=100.5) == 0.0
+        # Other slots are independent; a backwards clock step does not drain the bucket
+        assert buckets.take(2, rate=2.0, capacity=3, now=100.0) == 0.0
+        assert buckets.take(1, rate=2.0, capacity=3, now=99.0) == pytest.approx(0.5)
+
+    def test_block_refuses_until_deadline(self):
+        """Test a blocked bucket refuses even with rate <= 0 (unlimited) and restarts empty"""
+        buckets = TokenBuckets(None, slots=1)
+        buckets.block(0, until=200.0)
+
+        assert buckets.take(0, rate=0.0, capacity=5, now=150.0) == pytest.approx(50.0)
+        assert buckets.take(0, rate=0.0, capacity=5, now=200.0) == 0.0
+        assert buckets.take(0, rate=1.0, capacity=5, now=200.5) == pytest.approx(0.5)
+
+
+class TestRateLimiter:
+
+    def test_clients_share_buckets_across_processes(self, tmp_path):
+        """Test requests counted in another process use up the same client bucket"""
+        path = str(tmp_path / 'rate_limit.bin')
+        with multiprocessing.get_context('spawn').Pool(2) as pool:
+            results = pool.starmap(take_tokens, [(path, '203.0.113.7', 4)] * 2)
+
+        assert all(wait == 0.0 for waits in results for wait in waits)
+        limiter = RateLimiter(path, client_rate=0.001, client_burst=10)
+        assert [limiter.check_client('203.0.113.7') > 0 for _ in range(3)] == [False, False, True]
+        assert limiter.check_client('198.51.100.1') == 0.0
+
+    def test_here_budget_and_throttle(self, tmp_path):
+        """Test the HERE budget is spent by every instance and a 429 stops all of them"""
+        path = str(tmp_path / 'rate_limit.bin')
+        first = RateLimiter(path, here_daily_quota=86.4, here_burst=2)
+        second = RateLimiter(path, here_daily_quota=86.4, here_burst=2)
+
+        assert first.acquire_here() == 0.0 and second.acquire_here() == 0.0
+        assert first.acquire_here() == pytest.approx(1000.0, rel=0.01)
+
+        unlimited = RateLimiter(str(tmp_path / 'other.bin'))
+        assert unlimited.acquire_here() == 0.0
+        unlimited.here_throttled(30)
+        assert 29 < RateLimiter(str(tmp_path / 'other.bin')).acquire_here() <= 30
+        assert unlimited.stats()['here_tokens'] == 0.0
+
+    def test_check_is_cheap(self, tmp_path):
+        """Test a shared-file client check stays in the microsecond range"""
+        limiter = RateLimiter(str(tmp_path / 'rate_limit.bin'), client_rate=1e9, client_burst=1e9)
+        start = time.perf_counter()
+        for _ in range(10000):
+            limiter.check_client('203.0.113.7')
+        assert (time.perf_counter() - start) / 10000 < 50e-6
@@ -0,0 +1,103 @@
+"""
+Tests for the hot-reloading model registry
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ml.registry import ModelRegistry, artifacts_fingerprint
+from ml.train_model import save_artifacts
+
+FEATURE_NAMES = ['bhk', 'total_sqft', 'bath', 'lat', 'lng', 'location_encoded']
+FEATURES = {'bhk': 3, 'sqft': 1400, 'bath': 2, 'lat': 12.95, 'lng': 77.61}
+
+
+def fit(price_per_sqft):
+    """A fitted scaler, linear model and encoder where price scales with price_per_sqft"""
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    rng = np.random.default_rng(5)
+    X = np.column_stack([
+        rng.integers(1, 5, 200), rng.uniform(500, 3000, 200), rng.integers(1, 4, 200),
+        rng.normal(12.97, 0.1, 200), rng.normal(77.59, 0.1, 200), rng.integers(0, 3, 200)
+    ]).astype(float)
+    y = X[:, 1] * price_per_sqft + rng.normal(0, 1, 200)
+    scaler = StandardScaler().fit(X)
+    model = LinearRegression().fit(scaler.transform(X), y)
+    encoder = LabelEncoder().fit(['Whitefield', 'Uttarahalli', 'Hebbal'])
+    return model, scaler, encoder
+
+
+class TestModelRegistry:
+
+    def test_swaps_in_new_bundle_version(self, tmp_path):
+        """Test a newly published bundle is loaded, smoke-tested and swapped in"""
+        first = save_artifacts(*fit(0.06), FEATURE_NAMES, str(tmp_path))
+        registry = ModelRegistry(str(tmp_path), poll_interval=0)
+        activated = []
+        registry.add_listener(activated.append)
+
+        assert registry.check()
+        old = registry.predictor
+        assert registry.version == first
+        assert not registry.check()
+
+        second = save_artifacts(*fit(0.12), FEATURE_NAMES, str(tmp_path))
+        assert registry.check()
+
+        assert registry.version == second and registry.reloads == 1
+        assert [p.version for p in activated] == [first, second]
+        # A request still holding the old predictor keeps working after the swap
+        assert old.predict(FEATURES)['model_version'] == first
+        assert registry.predictor.predict(FEATURES)['price_crore'] > old.predict(FEATURES)['price_crore']
+
+    def test_rejects_model_failing_smoke_test(self, tmp_path):
+        """Test a broken model is skipped and the current one keeps serving"""
+        good = save_artifacts(*fit(0.06), FEATURE_NAMES, str(tmp_path))
+        registry = ModelRegistry(str(tmp_path), poll_interval=0)
+        registry.check()
+
+        model, scaler, encoder = fit(0.06)
+        model.coef_[1] = np.nan
+        bad = save_artifacts(model, scaler, encoder, FEATURE_NAMES, str(tmp_path))
+
+        assert not registry.check()
+        assert registry.version == good
+        assert bad in registry.stats()['last_error']
+        # The rejected version is not reloaded on every poll
+        registry.loader = lambda path: pytest.fail('rejected version was reloaded')
+        assert not registry.check()
+
+    def test_pickle_artifacts_get_a_version(self, tmp_path):
+        """Test legacy pickles are fingerprinted by mtime and versioned on load"""
+        assert artifacts_fingerprint(str(tmp_path)) is None
+        save_artifacts(*fit(0.06), FEATURE_NAMES, str(tmp_path), artifact_format='pickle')
+
+        registry = ModelRegistry(str(tmp_path), poll_interval=0)
+        assert registry.check()
+        assert registry.version.startswith('pickle-')
+        assert registry.predictor.predict_batch([FEATURES])['model_version'] == registry.version
+
+    def test_watcher_reloads_in_background(self, tmp_path):
+        """Test the watcher thread picks up a new CURRENT pointer without a check() call"""
+        save_artifacts(*fit(0.06), FEATURE_NAMES, str(tmp_path))
+        registry = ModelRegistry(str(tmp_path), poll_interval=0.02)
+        registry.check()
+        registry.start()
+        try:
+            second = save_artifacts(*fit(0.12), FEATURE_NAMES, str(tmp_path))
+            deadline = time.monotonic() + 5
+            while registry.version != second and time.monotonic() < deadline:
+                time.sleep(0.02)
+            assert registry.version == second
+            assert registry.stats()['watching']
+        finally:
+            registry.stop()
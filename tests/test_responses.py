@@ -0,0 +1,55 @@
+"""
+Tests for response serialization and compression helpers
+"""
+
+import gzip
+import json
+import os
+import sys
+
+import numpy as np
+from flask import Flask, jsonify
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services import responses
+from services.responses import FastJSONProvider, choose_encoding, compress_response
+
+
+class TestResponses:
+    
+    def test_choose_encoding_honours_preferences(self, monkeypatch):
+        """Test brotli is preferred when installed and q=0 excludes an encoding"""
+        monkeypatch.setattr(responses, 'brotli', None)
+        assert choose_encoding('gzip, deflate, br') == 'gzip'
+        assert choose_encoding('gzip;q=0, br') is None
+        assert choose_encoding('*') == 'gzip'
+        assert choose_encoding(None) is None
+        
+        monkeypatch.setattr(responses, 'brotli', object())
+        assert choose_encoding('gzip, deflate, br') == 'br'
+        assert choose_encoding('gzip, br;q=0') == 'gzip'
+    
+    def test_provider_serializes_numpy_compactly(self):
+        """Test the JSON provider emits compact JSON and handles numpy values"""
+        app = Flask(__name__)
+        app.json = FastJSONProvider(app)
+        
+        with app.app_context():
+            body = jsonify({'prices': np.array([1.25, 2.5]), 'count': np.int64(2)}).get_data()
+        
+        assert body == b'{"prices":[1.25,2.5],"count":2}\n'
+    
+    def test_small_and_non_json_bodies_are_not_compressed(self):
+        """Test compression only applies to large JSON/text bodies"""
+        app = Flask(__name__)
+        with app.app_context():
+            small = compress_response(jsonify({'ok': True}), 'gzip')
+            image = compress_response(app.response_class(b'\x89PNG' * 500, mimetype='image/png'), 'gzip')
+            large = compress_response(jsonify({'rows': list(range(1000))}), 'gzip')
+        
+        assert 'Content-Encoding' not in small.headers
+        assert 'Content-Encoding' not in image.headers
+        assert large.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(large.get_data()))['rows'][-1] == 999
@@ -0,0 +1,152 @@
+"""
+Tests for asynchronous, chunked scoring jobs
+"""
+
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ml.inference import RealEstatePricePredictor
+from ml.train_model import save_artifacts
+from services.scoring_jobs import (COMPLETED, QUEUED, RUNNING, ScoringJobs, UploadTooLarge, _try_lock, _unlock,
+                                   part_path, read_job, run_job, write_job)
+
+FEATURE_NAMES = ['bhk', 'total_sqft', 'bath', 'lat', 'lng', 'location_encoded']
+
+
+@pytest.fixture
+def artifacts_dir(tmp_path):
+    """A small linear bundle"""
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    rng = np.random.default_rng(1)
+    X = np.column_stack([rng.integers(1, 5, 300), rng.uniform(500, 3000, 300), rng.integers(1, 4, 300),
+                         rng.normal(12.97, 0.05, 300), rng.normal(77.59, 0.05, 300), np.zeros(300)])
+    y = X[:, 1] * 0.06 + X[:, 0] * 8
+    scaler = StandardScaler().fit(X)
+    model = LinearRegression().fit(scaler.transform(X), y)
+    path = str(tmp_path / 'artifacts')
+    save_artifacts(model, scaler, LabelEncoder().fit(['Whitefield']), FEATURE_NAMES, path)
+    return path
+
+
+def make_csv(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'bhk': rng.integers(1, 5, n_rows), 'sqft': rng.uniform(600, 2500, n_rows).round(1),
+        'bath': rng.integers(1, 4, n_rows), 'lat': rng.normal(12.97, 0.03, n_rows).round(5),
+        'lng': rng.normal(77.59, 0.03, n_rows).round(5), 'notes': 'x',
+    })
+    return frame
+
+
+def read_results(jobs, job_id, **kwargs):
+    return pd.read_csv(io.BytesIO(b''.join(jobs.results(job_id, **kwargs))))
+
+
+class TestScoringJobs:
+
+    def test_job_scores_every_chunk(self, tmp_path, artifacts_dir):
+        """Test a multi-chunk CSV is scored in order, with per-row validation errors"""
+        frame = make_csv(10)
+        frame.loc[3, 'sqft'] = 50
+        frame.loc[7, 'lat'] = None
+        jobs = ScoringJobs(str(tmp_path / 'jobs'), artifacts_dir, workers=0, chunksize=4)
+
+        job = jobs.create(io.BytesIO(frame.to_csv(index=False).encode()), 'portfolio.csv')
+
+        assert job['status'] == COMPLETED and job['progress'] == 1.0
+        assert (job['rows_total'], job['rows_done'], job['rows_failed'], job['chunks_done']) == (10, 10, 2, 3)
+        results = read_results(jobs, job['id'])
+        assert results['row'].tolist() == list(range(10))
+        assert results.loc[3, 'error'] == 'Square feet must be between 100 and 10000'
+        assert results.loc[7, 'error'].startswith('Invalid field types')
+        valid_rows = frame.drop(index=[3, 7]).to_dict('records')
+        expected = RealEstatePricePredictor(artifacts_dir).predict_batch(valid_rows)
+        np.testing.assert_allclose(results['price_crore'].dropna(), expected['price_crore'])
+
+    def test_rejects_bad_uploads(self, tmp_path, artifacts_dir):
+        """Test missing columns, empty and oversized uploads leave no job behind"""
+        jobs = ScoringJobs(str(tmp_path / 'jobs'), artifacts_dir, workers=0, max_upload_bytes=1000)
+
+        with pytest.raises(ValueError, match='Missing required columns'):
+            jobs.create(io.BytesIO(b'bhk,sqft\n3,1200\n'))
+        with pytest.raises(ValueError, match='empty'):
+            jobs.create(io.BytesIO(b''))
+        with pytest.raises(UploadTooLarge):
+            jobs.create(io.BytesIO(make_csv(100).to_csv(index=False).encode()))
+        assert os.listdir(tmp_path / 'jobs') == []
+        assert jobs.get('../../etc') is None
+
+    def test_interrupted_job_resumes_at_first_missing_part(self, tmp_path, artifacts_dir):
+        """Test a restart keeps finished parts and scores only the rest"""
+        jobs = ScoringJobs(str(tmp_path / 'jobs'), artifacts_dir, workers=0, chunksize=4)
+        job = jobs.create(io.BytesIO(make_csv(10).to_csv(index=False).encode()))
+        complete = read_results(jobs, job['id'])
+
+        # Simulate a crash after the first chunk
+        job_dir = str(tmp_path / 'jobs' / job['id'])
+        state = read_job(job_dir)
+        state.update(status=RUNNING, rows_done=4, chunks_done=1, finished_at=None)
+        write_job(job_dir, state)
+        for index in (1, 2):
+            os.remove(part_path(job_dir, index))
+        first_part = os.stat(part_path(job_dir, 0)).st_mtime_ns
+
+        assert jobs.resume() == 1
+        assert read_job(job_dir)['status'] == COMPLETED
+        assert os.stat(part_path(job_dir, 0)).st_mtime_ns == first_part
+        pd.testing.assert_frame_equal(read_results(jobs, job['id']), complete)
+
+    def test_lock_keeps_a_job_with_one_process(self, tmp_path, artifacts_dir, monkeypatch):
+        """Test a job being scored elsewhere is not run twice, resumed or deleted"""
+        jobs = ScoringJobs(str(tmp_path / 'jobs'), artifacts_dir, workers=0)
+        monkeypatch.setattr(jobs, '_submit', lambda job_dir: None)
+        job = jobs.create(io.BytesIO(make_csv(5).to_csv(index=False).encode()))
+        job_dir = str(tmp_path / 'jobs' / job['id'])
+        assert job['status'] == QUEUED
+        assert read_results(jobs, job['id']).empty
+
+        lock = _try_lock(job_dir)
+        try:
+            assert run_job(job_dir, artifacts_dir) is None
+            assert jobs.delete(job['id']) is False
+        finally:
+            _unlock(lock)
+        assert run_job(job_dir, artifacts_dir) == COMPLETED
+        assert jobs.delete(job['id']) is True
+        assert jobs.get(job['id']) is None
+
+    def test_process_pool_and_follow(self, tmp_path, artifacts_dir):
+        """Test a job runs in a spawned scoring process and a following stream gets every row"""
+        jobs = ScoringJobs(str(tmp_path / 'jobs'), artifacts_dir, workers=1, chunksize=50)
+        try:
+            job = jobs.create(io.BytesIO(make_csv(200).to_csv(index=False).encode()))
+            results = read_results(jobs, job['id'], follow=True, timeout=60)
+
+            assert results['row'].tolist() == list(range(200))
+            assert results['price_crore'].notna().all()
+            assert jobs.get(job['id'])['status'] == COMPLETED
+        finally:
+            jobs.shutdown()
+
+    def test_parquet_upload(self, tmp_path, artifacts_dir):
+        """Test Parquet uploads are read in record batches"""
+        pytest.importorskip('pyarrow')
+        buffer = io.BytesIO()
+        make_csv(10).to_parquet(buffer)
+        buffer.seek(0)
+        jobs = ScoringJobs(str(tmp_path / 'jobs'), artifacts_dir, workers=0, chunksize=4)
+
+        job = jobs.create(buffer, 'portfolio.parquet')
+
+        assert job['format'] == 'parquet' and job['status'] == COMPLETED
+        assert len(read_results(jobs, job['id'])) == 10
@@ -0,0 +1,166 @@
+"""
+Tests for per-segment models and request routing
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ml.inference import RealEstatePricePredictor
+from ml.segments import NO_SEGMENT, SegmentModels, normalize_area_type
+from ml.train_model import save_artifacts, train_model, train_segments
+
+FEATURE_NAMES = ['bhk', 'total_sqft', 'bath', 'lat', 'lng', 'location_encoded']
+FEATURES = {'bhk': 3, 'sqft': 1400, 'bath': 2, 'lat': 12.95, 'lng': 77.61}
+
+# Price per sqft (lakhs) differs by area type; carpet area is too rare for its own model
+SQFT_RATE = {'Super built-up  Area': 0.05, 'Plot  Area': 0.12, 'Carpet  Area': 0.08}
+
+
+def make_data(n, seed):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(1, 5, n), rng.uniform(500, 3000, n), rng.integers(1, 4, n),
+        rng.normal(12.97, 0.1, n), rng.normal(77.59, 0.1, n), np.zeros(n)
+    ]).astype(float)
+    area_type = rng.choice(list(SQFT_RATE), n, p=[0.6, 0.39, 0.01]).astype(object)
+    rate = np.array([SQFT_RATE[a] for a in area_type])
+    y = X[:, 1] * rate + X[:, 0] * 8 + rng.normal(0, 2, n)
+    return X, y, area_type
+
+
+@pytest.fixture
+def segments():
+    X, y, area_type = make_data(4000, seed=5)
+    return SegmentModels.fit(X, y, area_type, X[:, 3], X[:, 4])
+
+
+@pytest.fixture
+def predictor(tmp_path):
+    """A bundle with a global linear model and area_type segment models"""
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    X, y, area_type = make_data(4000, seed=5)
+    scaler = StandardScaler().fit(X)
+    model = LinearRegression().fit(scaler.transform(X), y)
+    encoder = LabelEncoder().fit(['Whitefield'])
+    save_artifacts(model, scaler, encoder, FEATURE_NAMES, str(tmp_path),
+                   segment_models=SegmentModels.fit(X, y, area_type, X[:, 3], X[:, 4]))
+    return RealEstatePricePredictor(str(tmp_path))
+
+
+class TestSegmentModels:
+
+    def test_fit_and_route(self, segments):
+        """Test each common area type gets its own model and rare or unknown ones fall back"""
+        assert normalize_area_type('Super built-up  Area') == 'super built-up'
+        assert [segments.label(i) for i in range(len(segments))] == ['plot', 'super built-up']
+
+        routed = segments.route(['Plot Area', 'super built-up', 'Carpet  Area', 'Penthouse', None],
+                                [12.97] * 5, [77.59] * 5)
+        assert routed[:2].tolist() == [0, 1]
+        assert (routed[2:] == NO_SEGMENT).all()
+        assert (segments.route(None, [12.97], [77.59]) == NO_SEGMENT).all()
+
+        # Recovered per-segment price per sqft
+        sqft_column = FEATURE_NAMES.index('total_sqft')
+        assert segments.weights[0, sqft_column] == pytest.approx(0.12, abs=0.005)
+        assert segments.weights[1, sqft_column] == pytest.approx(0.05, abs=0.005)
+
+    def test_grouped_predict_matches_per_row(self, segments, tmp_path):
+        """Test the per-segment grouped pass equals row-by-row predictions, after a mmap round trip"""
+        segments.save(str(tmp_path))
+        loaded = SegmentModels.load(str(tmp_path))
+        assert isinstance(loaded.weights.base, np.memmap)
+
+        X, _, area_type = make_data(500, seed=9)
+        routed = loaded.route(area_type, X[:, 3], X[:, 4])
+        rows = routed >= 0
+        expected = [X[i] @ segments.weights[s] + segments.bias[s]
+                    for i, s in zip(np.flatnonzero(rows), routed[rows])]
+
+        np.testing.assert_allclose(loaded.predict(X[rows], routed[rows]), expected)
+
+    def test_cell_segments(self):
+        """Test segmenting by grid cell routes on coordinates alone"""
+        rng = np.random.default_rng(2)
+        n = 2000
+        lat = np.where(np.arange(n) % 2 == 0, 12.90, 13.05) + rng.uniform(0, 0.002, n)
+        lng = np.full(n, 77.60)
+        X = np.column_stack([rng.uniform(500, 3000, n), lat, lng])
+        y = X[:, 0] * np.where(lat > 13, 0.1, 0.04)
+
+        segments = SegmentModels.fit(X, y, None, lat, lng, by=('cell',), cell_size_m=5000)
+        routed = segments.route(None, [12.905, 13.055, 14.0], [77.60, 77.60, 77.60])
+
+        assert len(segments) == 2
+        assert routed[0] != routed[1] and routed[2] == NO_SEGMENT
+        assert segments.predict(X[:2], routed[:2]) == pytest.approx([X[0, 0] * 0.04, X[1, 0] * 0.1])
+
+
+class TestSegmentRouting:
+
+    def test_predict_routes_by_area_type(self, predictor):
+        """Test single predictions use the segment model named by area_type"""
+        plot = predictor.predict(dict(FEATURES, area_type='Plot  Area'))
+        flat = predictor.predict(dict(FEATURES, area_type='Super built-up Area'))
+        unrouted = predictor.predict(dict(FEATURES))
+
+        assert plot['features_used']['segment'] == 'plot'
+        assert flat['features_used']['segment'] == 'super built-up'
+        assert unrouted['features_used']['segment'] is None
+        assert plot['price_crore'] == pytest.approx((1400 * 0.12 + 24) / 100, abs=0.02)
+        assert flat['price_crore'] == pytest.approx((1400 * 0.05 + 24) / 100, abs=0.02)
+        assert sum(plot['contributions_crore'].values()) == pytest.approx(plot['price_crore'], abs=0.01)
+
+    def test_mixed_batch_matches_single_predictions(self, predictor):
+        """Test a batch spanning segments and the global model matches per-row predictions"""
+        area_types = ['Plot  Area', None, 'Super built-up  Area', 'Carpet  Area', 'Plot  Area']
+        rows = [dict(FEATURES, sqft=1000 + 300 * i, area_type=a) for i, a in enumerate(area_types)]
+
+        batch = predictor.predict_batch(rows, explain=True)
+
+        singles = [predictor.predict(dict(row))['price_crore'] for row in rows]
+        np.testing.assert_allclose(batch['price_crore'], singles, atol=0.01)
+        totals = batch['contributions_crore'].sum(axis=1) + batch['baseline_crore']
+        np.testing.assert_allclose(totals, batch['price_crore'], atol=0.01)
+
+    def test_routed_ranges_use_segment_stats(self, tmp_path):
+        """Test routed rows get ranges sized by their segment model's errors, and none without them"""
+        from sklearn.preprocessing import LabelEncoder
+
+        X, y, area_type = make_data(4000, seed=5)
+        X, y = pd.DataFrame(X, columns=FEATURE_NAMES), pd.Series(y)
+        model, scaler, _, _, prediction_stats = train_model(X, y)
+        segments, _ = train_segments(X, y, area_type, model, scaler)
+        encoder = LabelEncoder().fit(['Whitefield'])
+        save_artifacts(model, scaler, encoder, FEATURE_NAMES, str(tmp_path / 'stats'),
+                       prediction_stats=prediction_stats, segment_models=segments)
+        predictor = RealEstatePricePredictor(str(tmp_path / 'stats'))
+
+        plot = predictor.predict(dict(FEATURES, area_type='Plot  Area'))
+        unrouted = predictor.predict(dict(FEATURES))
+        batch = predictor.predict_batch([dict(FEATURES, area_type='Plot  Area'), dict(FEATURES)])
+
+        def width(result):
+            return result['price_range_crore']['high'] - result['price_range_crore']['low']
+        # The segment model only sees the 2 lakh noise; the global one also mixes two price rates
+        assert width(plot) < width(unrouted) / 2
+        assert batch['price_low_crore'].tolist() == [plot['price_range_crore']['low'],
+                                                     unrouted['price_range_crore']['low']]
+
+        segments.prediction_stats = None
+        save_artifacts(model, scaler, encoder, FEATURE_NAMES, str(tmp_path / 'no_stats'),
+                       prediction_stats=prediction_stats, segment_models=segments)
+        predictor = RealEstatePricePredictor(str(tmp_path / 'no_stats'))
+
+        assert 'price_range_crore' not in predictor.predict(dict(FEATURES, area_type='Plot  Area'))
+        assert 'price_range_crore' in predictor.predict(dict(FEATURES))
+        assert np.isnan(predictor.predict_batch([dict(FEATURES, area_type='Plot  Area')])['price_low_crore'][0])
@@ -0,0 +1,101 @@
+"""
+Tests for the locality autosuggest index
+"""
+
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.suggest import SuggestIndex, here_suggestions
+
+LOCALITIES = {
+    'Whitefield': 540, 'Whitefield Main Road': 12, 'Koramangala': 72, '1st Block Koramangala': 10,
+    'Electronic City': 300, 'Electronic City Phase II': 130, 'Hebbal': 180, 'HSR Layout': 90
+}
+
+
+def labels(suggestions):
+    return [s['label'] for s in suggestions]
+
+
+class TestSuggestIndex:
+
+    def test_prefix_matches_ranked_by_popularity(self):
+        """Test full-name prefixes come first, most frequent locality first"""
+        index = SuggestIndex.from_names(LOCALITIES)
+
+        assert labels(index.suggest('whi')) == ['Whitefield', 'Whitefield Main Road']
+        assert labels(index.suggest('Electronic', limit=1)) == ['Electronic City']
+        assert not any(s.get('fuzzy') for s in index.suggest('whi'))
+
+    def test_word_start_matches(self):
+        """Test a later word of a name matches after full-name prefixes"""
+        index = SuggestIndex.from_names(LOCALITIES)
+
+        assert labels(index.suggest('kora')) == ['Koramangala', '1st Block Koramangala']
+        assert labels(index.suggest('main ro')) == ['Whitefield Main Road']
+
+    def test_typos_are_tolerated(self):
+        """Test substitutions, transpositions, insertions and omissions within one edit"""
+        index = SuggestIndex.from_names(LOCALITIES)
+
+        assert labels(index.suggest('kormangala'))[0] == 'Koramangala'
+        assert labels(index.suggest('whitfield'))[0] == 'Whitefield'
+        assert labels(index.suggest('electornic city'))[0] == 'Electronic City'
+        assert labels(index.suggest('hebbbal')) == ['Hebbal']
+        assert index.suggest('kormangala')[0]['fuzzy'] is True
+        assert index.suggest('xyzzy') == []
+
+    def test_geocode_merges_coordinates(self):
+        """Test a geocoded locality gains coordinates and new places become suggestible"""
+        index = SuggestIndex.from_names(LOCALITIES)
+        index.add_geocode('Bangalore Hebbal', {'lat': 13.0358, 'lng': 77.597, 'label': 'Hebbal, Bengaluru'})
+        index.add_geocode('Indiranagar', {'lat': 12.9719, 'lng': 77.6412, 'label': 'Indiranagar, Bengaluru'})
+        index.add_geocode('Nowhere', {'not_found': True})
+
+        assert index.suggest('hebb')[0] == {'label': 'Hebbal', 'source': 'locality', 'lat': 13.0358, 'lng': 77.597}
+        assert index.suggest('indira')[0]['source'] == 'geocode'
+        assert index.stats()['entries'] == len(LOCALITIES) + 1
+        assert index.stats()['with_coordinates'] == 2
+        assert index.lookup('hebbal, bengaluru') == {'label': 'Hebbal', 'lat': 13.0358, 'lng': 77.597,
+                                                     'source': 'locality'}
+        assert index.lookup('indira') is None
+
+    def test_geocodes_are_buffered_until_merged(self):
+        """Test a new geocode leaves the main table alone but is found, typos included, before and after a merge"""
+        index = SuggestIndex.from_names(LOCALITIES)
+        main = index._tables[0]
+        index.add_geocode('Sadashivanagar', {'lat': 13.007, 'lng': 77.58, 'label': 'Sadashivanagar'})
+
+        assert index._tables[0] is main
+        assert index.stats()['pending_variants'] > 0
+        for query in ('sadash', 'sadashvanagar'):
+            assert labels(index.suggest(query))[0] == 'Sadashivanagar'
+
+        index.merge()
+
+        assert index.stats()['pending_variants'] == 0
+        assert labels(index.suggest('sadashvanagar'))[0] == 'Sadashivanagar'
+        assert labels(index.suggest('whi')) == ['Whitefield', 'Whitefield Main Road']
+
+    def test_from_csv_counts_rows(self, tmp_path):
+        """Test locations are weighted by how often they occur in the data"""
+        path = tmp_path / 'household.csv'
+        path.write_text('location,bhk\nHebbal,2\nHebbal Kempapura,3\nHebbal Kempapura,2\n,1\n')
+
+        index = SuggestIndex.from_csv(str(path))
+
+        assert len(index) == 2
+        assert labels(index.suggest('hebbal')) == ['Hebbal Kempapura', 'Hebbal']
+
+    def test_here_suggestions_skip_items_without_position(self):
+        """Test HERE query-completion items without coordinates are dropped"""
+        response = {'items': [
+            {'title': 'Whitefield', 'resultType': 'categoryQuery'},
+            {'title': 'Whitefield, Bengaluru', 'position': {'lat': 12.97, 'lng': 77.75}},
+        ]}
+
+        assert here_suggestions(response, 5) == [
+            {'label': 'Whitefield, Bengaluru', 'lat': 12.97, 'lng': 77.75, 'source': 'here'}]
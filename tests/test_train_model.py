@@ -0,0 +1,154 @@
+"""
+Tests for the vectorized, chunked preprocessing in train_model
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ml.train_model import (StreamingTrainer, _quantile_from_counts, build_comparables, build_locality_index,
+                            extract_bhk, geocoded_rows, holdout_mask, load_and_preprocess_data, parse_total_sqft,
+                            prepare_features, read_coordinates)
+from ml.uncertainty import PredictionStats
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'Data', 'household.csv')
+
+
+class TestParsing:
+    
+    def test_parse_total_sqft(self):
+        """Test plain values, ranges, unit suffixes and garbage"""
+        values = pd.Series(['1056', ' 1133 - 1384 ', '34.46Sq. Meter', '5.31Acres', 'abc', None, '-5'])
+        
+        parsed = parse_total_sqft(values)
+        converted = parse_total_sqft(values, convert_units=True)
+        
+        assert parsed[0] == 1056.0
+        assert parsed[1] == (1133 + 1384) / 2
+        assert parsed[2:].isna().all()
+        assert converted[2] == pytest.approx(34.46 * 10.7639)
+        assert converted[3] == pytest.approx(5.31 * 43560)
+        assert converted[4:].isna().all()
+    
+    def test_extract_bhk(self):
+        """Test bedroom counts are read once per category"""
+        size = pd.Series(['2 BHK', '4 Bedroom', None, '2 BHK', 'Studio'], dtype='category')
+        
+        bhk = extract_bhk(size)
+        
+        assert bhk[:2].tolist() == [2.0, 4.0]
+        assert bhk[3] == 2.0
+        assert np.isnan(bhk[2]) and np.isnan(bhk[4])
+
+
+class TestLoadAndPreprocess:
+    
+    def test_chunked_matches_single_read(self):
+        """Test chunk boundaries do not change rows, values or the location encoding"""
+        whole, whole_encoder = load_and_preprocess_data(DATA_PATH)
+        chunked, chunked_encoder = load_and_preprocess_data(DATA_PATH, chunksize=1000)
+        
+        pd.testing.assert_frame_equal(whole, chunked, check_categorical=False)
+        assert list(whole_encoder.classes_) == list(chunked_encoder.classes_)
+        assert isinstance(chunked['location'].dtype, pd.CategoricalDtype)
+    
+    def test_location_encoding_matches_label_encoder(self):
+        """Test location_encoded equals a fresh LabelEncoder fit on the same column"""
+        from sklearn.preprocessing import LabelEncoder
+        
+        df, encoder = load_and_preprocess_data(DATA_PATH)
+        expected = LabelEncoder().fit(df['location'].astype(object).fillna('Unknown'))
+        
+        assert list(encoder.classes_) == list(expected.classes_)
+        assert (df['location_encoded'].to_numpy() ==
+                expected.transform(df['location'].astype(object).fillna('Unknown'))).all()
+    
+    def test_convert_units_keeps_suffixed_rows(self):
+        """Test unit-suffixed rows are only kept when conversion is enabled"""
+        df, _ = load_and_preprocess_data(DATA_PATH)
+        converted, _ = load_and_preprocess_data(DATA_PATH, convert_units=True)
+        
+        assert len(converted) > len(df)
+        assert converted['total_sqft'].notna().all()
+
+
+class TestStreamingTraining:
+    
+    def test_quantile_from_counts_matches_pandas(self):
+        """Test quantiles from value tallies equal Series.quantile"""
+        values = pd.Series(np.random.RandomState(0).randint(0, 50, 1001).astype(float))
+        
+        for q in (0.25, 0.5, 0.75):
+            assert _quantile_from_counts(values.value_counts(), q) == pytest.approx(values.quantile(q))
+    
+    def test_holdout_mask_is_deterministic(self):
+        """Test hold-out assignment depends only on row ordinal and seed"""
+        ordinals = np.arange(100000)
+        
+        mask = holdout_mask(ordinals, seed=42)
+        
+        assert (holdout_mask(ordinals[5000:6000], seed=42) == mask[5000:6000]).all()
+        assert (holdout_mask(ordinals, seed=7) != mask).any()
+        assert abs(mask.mean() - 0.2) < 0.01
+    
+    def test_streaming_matches_in_memory_fit(self):
+        """Test chunked training reproduces an in-memory fit on the same split"""
+        from sklearn.linear_model import LinearRegression
+        from sklearn.metrics import mean_absolute_error, r2_score
+        from sklearn.preprocessing import StandardScaler
+        
+        df, encoder = load_and_preprocess_data(DATA_PATH)
+        X, y = prepare_features(df)
+        is_test = holdout_mask(df.index.get_indexer(X.index), seed=42)
+        scaler = StandardScaler().fit(X[~is_test])
+        model = LinearRegression().fit(scaler.transform(X[~is_test]), y[~is_test])
+        pred = model.predict(scaler.transform(X[is_test]))
+        
+        trainer = StreamingTrainer(DATA_PATH, seed=42, chunksize=1000)
+        s_model, s_scaler, s_encoder, mae, r2 = trainer.run()
+        
+        assert trainer.feature_names == list(X.columns)
+        assert list(s_encoder.classes_) == list(encoder.classes_)
+        np.testing.assert_allclose(s_scaler.mean_, scaler.mean_)
+        np.testing.assert_allclose(s_scaler.scale_, scaler.scale_)
+        np.testing.assert_allclose(s_model.coef_, model.coef_, rtol=1e-6)
+        assert s_model.intercept_ == pytest.approx(model.intercept_)
+        assert mae == pytest.approx(mean_absolute_error(y[is_test], pred))
+        assert r2 == pytest.approx(r2_score(y[is_test], pred))
+        
+        stats = PredictionStats.from_training(X[~is_test], y[is_test] - pred)
+        np.testing.assert_allclose(trainer.prediction_stats.precision, stats.precision, rtol=1e-6)
+        np.testing.assert_allclose(trainer.prediction_stats.residual_quantiles, stats.residual_quantiles, atol=0.01)
+        assert len(trainer.comparables) == len(X)
+        in_memory = build_comparables(X, y, encoder.classes_)
+        for name, values in in_memory.columns.items():
+            np.testing.assert_array_equal(trainer.comparables.columns[name], values)
+        np.testing.assert_array_equal(trainer.comparables.index.cell_starts, in_memory.index.cell_starts)
+
+    def test_locality_index_uses_geocoded_rows_only(self, tmp_path):
+        """Test localities with jittered fallback coordinates are matched by name only"""
+        coordinates_path = str(tmp_path / 'coords.csv')
+        pd.DataFrame({'location': ['Whitefield'], 'lat': [12.9698], 'lng': [77.75]}).to_csv(coordinates_path)
+        df, encoder = load_and_preprocess_data(DATA_PATH, coordinates_path=coordinates_path)
+        X, _ = prepare_features(df)
+        
+        geocoded = geocoded_rows(df.loc[X.index], read_coordinates(coordinates_path))
+        index = build_locality_index(encoder.classes_, X, geocoded)
+        
+        classes = list(encoder.classes_)
+        # " Whitefield" and "Whitefield" both join the table row
+        assert {classes[code].strip() for code in index.codes} == {'Whitefield'}
+        assert index.centroid('Whitefield') == pytest.approx((12.9698, 77.75))
+        # The city centre is beyond max_distance_m of Whitefield: the old constant encoding
+        assert index.resolve([12.9716], [77.5946]).tolist() == [0]
+        assert index.resolve([12.9716], [77.5946], ['Hebbal']).tolist() == [classes.index('Hebbal')]
+        
+        trainer = StreamingTrainer(DATA_PATH, seed=42, coordinates_path=coordinates_path, chunksize=5000)
+        trainer.run()
+        assert trainer.locality_index.codes.tolist() == index.codes.tolist()
@@ -0,0 +1,99 @@
+"""
+Tests for closed-form prediction intervals and feature contributions
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ml.inference import RealEstatePricePredictor
+from ml.train_model import save_artifacts
+from ml.uncertainty import PredictionStats
+
+FEATURE_NAMES = ['bhk', 'total_sqft', 'bath', 'lat', 'lng', 'location_encoded']
+FEATURES = {'bhk': 3, 'sqft': 1400, 'bath': 2, 'lat': 12.95, 'lng': 77.61}
+
+
+def make_data(n, seed):
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([
+        rng.integers(1, 5, n), rng.uniform(500, 3000, n), rng.integers(1, 4, n),
+        rng.normal(12.97, 0.1, n), rng.normal(77.59, 0.1, n), np.zeros(n)
+    ]).astype(float)
+    y = X[:, 1] * 0.06 + X[:, 0] * 8 + rng.normal(0, 6, n)
+    return X, y
+
+
+@pytest.fixture
+def predictor(tmp_path):
+    """A bundle with interval stats from a fit on 800 rows and 200 hold-out residuals"""
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    X, y = make_data(1000, seed=3)
+    scaler = StandardScaler().fit(X[:800])
+    model = LinearRegression().fit(scaler.transform(X[:800]), y[:800])
+    stats = PredictionStats.from_training(X[:800], y[800:] - model.predict(scaler.transform(X[800:])))
+    encoder = LabelEncoder().fit(['Whitefield'])
+    save_artifacts(model, scaler, encoder, FEATURE_NAMES, str(tmp_path), prediction_stats=stats)
+    return RealEstatePricePredictor(str(tmp_path))
+
+
+class TestPredictionIntervals:
+
+    def test_interval_brackets_prediction_and_covers_new_data(self, predictor):
+        """Test the 90% range contains the point estimate and ~90% of unseen prices"""
+        result = predictor.predict(dict(FEATURES))
+        price_range = result['price_range_crore']
+
+        assert price_range['low'] < result['price_crore'] < price_range['high']
+        assert price_range['level'] == 0.9
+
+        X, y = make_data(5000, seed=11)
+        batch = predictor.predict_batch({'bhk': X[:, 0], 'sqft': X[:, 1], 'bath': X[:, 2],
+                                         'lat': X[:, 3], 'lng': X[:, 4]})
+        covered = (y / 100 >= batch['price_low_crore']) & (y / 100 <= batch['price_high_crore'])
+        assert 0.85 < covered.mean() < 0.95
+
+    def test_interval_widens_away_from_training_data(self, predictor):
+        """Test leverage widens the range for properties unlike the training rows"""
+        typical = predictor.predict(dict(FEATURES))['price_range_crore']
+        unusual = predictor.predict(dict(FEATURES, sqft=20000, bhk=12))['price_range_crore']
+
+        assert unusual['high'] - unusual['low'] > typical['high'] - typical['low']
+
+    def test_contributions_sum_to_price(self, predictor):
+        """Test the baseline plus per-feature terms reproduce the prediction, single and batch"""
+        result = predictor.predict(dict(FEATURES))
+        contributions = result['contributions_crore']
+
+        assert set(contributions) == {'baseline', *FEATURE_NAMES}
+        assert sum(contributions.values()) == pytest.approx(result['price_crore'], abs=0.01)
+        assert contributions['total_sqft'] < 0  # 1400 sqft is below the training average
+
+        batch = predictor.predict_batch([dict(FEATURES), dict(FEATURES, sqft=2500)], explain=True)
+        totals = batch['contributions_crore'].sum(axis=1) + batch['baseline_crore']
+        np.testing.assert_allclose(totals, batch['price_crore'], atol=0.01)
+        assert batch['feature_names'] == FEATURE_NAMES
+        assert 'contributions_crore' not in predictor.predict_batch([dict(FEATURES)])
+
+    def test_stats_survive_pickle_artifacts(self, predictor, tmp_path):
+        """Test the legacy pickle format also carries the interval stats"""
+        from sklearn.linear_model import LinearRegression
+        from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+        X, y = make_data(200, seed=4)
+        scaler = StandardScaler().fit(X)
+        model = LinearRegression().fit(scaler.transform(X), y)
+        stats = PredictionStats.from_training(X, y - model.predict(scaler.transform(X)))
+        save_artifacts(model, scaler, LabelEncoder().fit(['a']), FEATURE_NAMES, str(tmp_path / 'pkl'),
+                       artifact_format='pickle', prediction_stats=stats)
+
+        loaded = RealEstatePricePredictor(str(tmp_path / 'pkl')).prediction_stats
+        np.testing.assert_allclose(loaded.precision, stats.precision)
+        np.testing.assert_allclose(loaded.residual_quantiles, stats.residual_quantiles)